@@ -3,6 +3,8 @@ from pathlib import Path
 import pandas as pd
 import numpy as np
 
+from team_names import canonicalize
+
 REPO_ROOT = Path(__file__).resolve().parent.parent.parent
 
 PLAYER_BASE = REPO_ROOT / "data" / "players" / "cleaned" / "cpl_players_all_seasons_cleaned.csv"
@@ -18,32 +20,14 @@ TEAM_TOTAL_MINUTES = 990
 CAP_MINUTES = 90.0
 EPS = 1e-9
 
-TEAM_NAME_MAP = {
-    "HFX Wanderers": "Wanderers",
-    "Halifax Wanderers": "Wanderers",
-    "HFX Wanderers FC": "Wanderers",
-    "York United": "York",
-    "York United FC": "York",
-    "Atlético Ottawa": "Atlético",
-    "Atletico Ottawa": "Atlético",
-    "Pacific": "Pacific",
-    "Pacific FC": "Pacific",
-    "Valour": "Valour",
-    "Valour FC": "Valour",
-    "Forge": "Forge",
-    "Forge FC": "Forge",
-    "Cavalry": "Cavalry",
-    "Cavalry FC": "Cavalry",
-    "Edmonton": "Edmonton",
-    "FC Edmonton": "Edmonton"
-}
-
-def make_match_id(row: pd.Series) -> str:
-    season = str(row.get("Season", "")).strip()
-    date = str(row.get("Date", "")).strip()[:10]
-    home = str(row.get("Hometeam", "")).strip().replace(" ", "_")
-    away = str(row.get("Awayteam", "")).strip().replace(" ", "_")
-    return f"{season}_{date}_{home}_vs_{away}"
+
+def make_match_id(matches: pd.DataFrame) -> pd.Series:
+    """season_date_Home_vs_Away from canonical team names (spaces -> underscores)."""
+    season = matches["Season"].astype(str).str.strip()
+    date = matches["Date"].astype(str).str.strip().str[:10]
+    home = canonicalize(matches["Hometeam"].astype(str)).str.replace(" ", "_")
+    away = canonicalize(matches["Awayteam"].astype(str)).str.replace(" ", "_")
+    return season + "_" + date + "_" + home + "_vs_" + away
 
 def redistribute_with_cap(minutes: pd.Series, cap: float, total: float) -> pd.Series:
     m = minutes.astype(float).copy().clip(lower=0.0)
@@ -101,7 +85,7 @@ def read_all_matches(matches_dir: Path) -> pd.DataFrame:
     allm = allm.fillna("")
     if "Status" in allm.columns:
         allm = allm[allm["Status"].astype(str).str.upper() == "FINISHED"].copy()
-    allm["match_id"] = allm.apply(make_match_id, axis=1)
+    allm["match_id"] = make_match_id(allm)
     allm["Season"] = pd.to_numeric(allm["Season"], errors="coerce").fillna(0).astype(int)
     return allm
 
@@ -138,7 +122,7 @@ def main() -> None:
     matches = read_all_matches(MATCHES_RAW_DIR)
 
     players["season"] = pd.to_numeric(players["season"], errors="coerce").fillna(0).astype(int)
-    players["team"] = players["team"].astype(str).str.strip().replace(TEAM_NAME_MAP)
+    players["team"] = canonicalize(players["team"].astype(str))
     players["playerName"] = players["playerName"].astype(str).str.strip()
     
     # Ensure playerId exists and is clean
@@ -150,7 +134,7 @@ def main() -> None:
 
     matches["Season"] = pd.to_numeric(matches["Season"], errors="coerce").fillna(0).astype(int)
     for col in ["Hometeam", "Awayteam"]:
-        matches[col] = matches[col].astype(str).str.strip().replace(TEAM_NAME_MAP)
+        matches[col] = canonicalize(matches[col].astype(str))
 
     out_rows = []
     
@@ -161,9 +145,8 @@ def main() -> None:
         
         for team_col in ["Hometeam", "Awayteam"]:
             t_raw = str(m[team_col]).strip()
-            t_mapped = TEAM_NAME_MAP.get(t_raw, t_raw)
             
-            tp = players[(players["season"] == s_val) & (players["team"] == t_mapped)].copy()
+            tp = players[(players["season"] == s_val) & (players["team"] == t_raw)].copy()
             
             if tp.empty:
                 out_rows.append({
@@ -3,13 +3,21 @@ from pathlib import Path
 import pandas as pd
 import numpy as np
 import os
+import sys
+
+from build_assumed_lineups import MATCHES_RAW_DIR, read_all_matches
+from team_names import canonicalize
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "james_elo"))
+from rating_history import DELTA_FILE, load_rating_snapshots
 
 # Detects REPO_ROOT 
 cwd = Path(os.getcwd())
 REPO_ROOT = cwd if cwd.name == "canpl-bet" else Path(__file__).resolve().parent.parent.parent
 
 LINEUP_FILE = REPO_ROOT / "data" / "lineups" / "assumed_lineup.csv"
-# NEW: Point to the rolling ratings
+# Rolling ratings: the delta history, or the old snapshot CSV if that is all there is
+ROLLING_DELTAS = REPO_ROOT / "data" / "players" / "derived" / DELTA_FILE.name
 ROLLING_RATINGS = REPO_ROOT / "data" / "players" / "derived" / "player_ratings_rolling.csv"
 
 OUT_DIR = REPO_ROOT / "data" / "matches" / "derived"
@@ -18,77 +26,110 @@ OUT_FILE = OUT_DIR / "match_team_strength.csv"
 
 COVERAGE_THRESHOLD = 0.80
 
+def _match_sides(team_rows: pd.DataFrame) -> pd.Series:
+    """home/away per (match_id, team) row, joined from the raw match table.
+
+    Lineup teams carry canonical names (team_names), so the match table is
+    canonicalized the same way before the join. Rows whose match is missing
+    from the table fall back to checking whether the team name appears in the
+    home half of match_id.
+    """
+    matches = read_all_matches(MATCHES_RAW_DIR)[["match_id", "Hometeam", "Awayteam"]]
+    for col in ["Hometeam", "Awayteam"]:
+        matches[col] = canonicalize(matches[col])
+    matches = matches.drop_duplicates("match_id")
+
+    joined = team_rows[["match_id", "team"]].merge(matches, on="match_id", how="left")
+    side = pd.Series(
+        np.select(
+            [joined["team"] == joined["Hometeam"], joined["team"] == joined["Awayteam"]],
+            ["home", "away"],
+            default="",
+        ),
+        index=team_rows.index,
+    )
+
+    unresolved = side == ""
+    if unresolved.any():
+        legacy = [
+            "home" if str(t).replace(" ", "_") in str(m).split("_vs_")[0] else "away"
+            for m, t in zip(team_rows.loc[unresolved, "match_id"], team_rows.loc[unresolved, "team"])
+        ]
+        side[unresolved] = legacy
+    return side
+
 def main():
     print("--- Starting Match Team Strength (Rolling) Calculation ---")
     
-    if not LINEUP_FILE.exists() or not ROLLING_RATINGS.exists():
+    ratings = load_rating_snapshots(ROLLING_DELTAS, ROLLING_RATINGS)
+    if not LINEUP_FILE.exists() or ratings is None:
         print("Missing required files.")
-        print(f"Check: {ROLLING_RATINGS}")
+        print(f"Check: {ROLLING_DELTAS}")
         return
 
     lineups = pd.read_csv(LINEUP_FILE)
-    ratings = pd.read_csv(ROLLING_RATINGS) # Load the rolling file
 
     # Merge Rolling Ratings into Lineups
     # Matches strictly on match_id so we get the rating AS OF that specific game
+    # A player listed twice (e.g. several slots without a playerId) has one
+    # rating per match; keep one row so the join doesn't multiply the slots
+    rating_cols = [c for c in ['Rating', 'Attack', 'Defense'] if c in ratings.columns]
+    ratings = ratings.drop_duplicates(['match_id', 'playerId'])
     df = lineups.merge(
-        ratings[['match_id', 'playerId', 'Rating']], 
+        ratings[['match_id', 'playerId'] + rating_cols], 
         on=['match_id', 'playerId'], 
         how='left'
     )
     
-    # Fill missing ratings (New players/First games) with default 5.0
-    df['Rating'] = df['Rating'].fillna(5.0)
+    # Older rolling files have no attack/defense split: fall back to the total
+    for col in ['Attack', 'Defense']:
+        if col not in df.columns:
+            df[col] = df['Rating']
 
-    out_rows = []
-    
-    for match_id, match_df in df.groupby("match_id"):
-        teams = match_df["team"].unique()
-        if len(teams) != 2: continue
-            
-        parts = str(match_id).split("_vs_")
-        
-        for team in teams:
-            t_df = match_df[match_df["team"] == team].copy()
-            opp = [t for t in teams if t != team][0]
-            
-            # Determine Home/Away
-            # Logic: If team name is in the first part of filename, they are Home
-            clean_team = team.replace(" ", "_")
-            side = "home" if clean_team in parts[0] else "away"
-            
-            # Weighting: Expected Minutes / 90
-            t_df["w"] = t_df["expected_minutes"] / 90.0
-            
-            # Coverage Quality
-            mins_sum = t_df["expected_minutes"].sum()
-            # In rolling logic, everyone effectively has a rating (default 5.0), so coverage is high
-            
-            # Calculate Total Strength
-            # (Note: Rolling script currently only outputs Total Rating, not Attack/Defense splits yet)
-            team_total = (t_df["Rating"] * t_df["w"]).sum()
-            
-            # Placeholder for Attack/Defense until we add splits to rolling script
-            team_attack = team_total 
-            team_defense = team_total
-
-            out_rows.append({
-                "match_id": match_id, 
-                "season": t_df["season"].iloc[0], 
-                "date": t_df["date"].iloc[0],
-                "team": team, 
-                "side": side, 
-                "opponent": opp,
-                "team_attack": round(team_attack, 4),
-                "team_defense": round(team_defense, 4),
-                "team_total": round(team_total, 4),
-                "coverage_rate": 1.0, # Rolling logic fills gaps automatically
-                "coverage_ok": True
-            })
-
-    out_df = pd.DataFrame(out_rows)
+    # Weighting: Expected Minutes / 90
+    w = df["expected_minutes"] / 90.0
+    for col, out_col in [('Rating', 'team_total'), ('Attack', 'team_attack'), ('Defense', 'team_defense')]:
+        # Fill missing ratings (New players/First games) with default 5.0
+        df[out_col] = df[col].fillna(5.0) * w
+
+    # One row per (match, team) in lineup order: weighted rating sums
+    out_df = (
+        df.groupby(["match_id", "team"], sort=False)
+          .agg(
+              season=("season", "first"),
+              date=("date", "first"),
+              team_attack=("team_attack", "sum"),
+              team_defense=("team_defense", "sum"),
+              team_total=("team_total", "sum"),
+          )
+          .reset_index()
+    )
+
+    # Only matches with exactly two sides
+    n_teams = out_df.groupby("match_id")["team"].transform("size")
+    out_df = out_df[n_teams == 2].reset_index(drop=True)
+
+    # Opponent = the other row of the same match
+    first = out_df.groupby("match_id").cumcount() == 0
+    out_df["opponent"] = np.where(
+        first,
+        out_df.groupby("match_id")["team"].shift(-1),
+        out_df.groupby("match_id")["team"].shift(1),
+    )
+
+    out_df["side"] = _match_sides(out_df)
+
+    for col in ["team_attack", "team_defense", "team_total"]:
+        out_df[col] = out_df[col].round(4)
+    out_df["coverage_rate"] = 1.0 # Rolling logic fills gaps automatically
+    out_df["coverage_ok"] = True
+
+    out_df = out_df[[
+        "match_id", "season", "date", "team", "side", "opponent",
+        "team_attack", "team_defense", "team_total", "coverage_rate", "coverage_ok",
+    ]]
     # Sort for cleanliness
-    out_df = out_df.sort_values(['date', 'match_id'])
+    out_df = out_df.sort_values(['date', 'match_id'], kind="stable")
     
     out_df.to_csv(OUT_FILE, index=False)
     print(f"Success! Rolling Team strengths saved to: {OUT_FILE}")
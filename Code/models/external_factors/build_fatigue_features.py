@@ -1,13 +1,18 @@
 from __future__ import annotations
 
 import os
-from math import radians, cos, sin, asin, sqrt
+import sys
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
-from cpl_stadiums import STADIUMS, TEAM_MAP
-from fetch_weather import get_weather_estimate
+from cpl_stadiums import DISTANCE_KM, TZ_DELTA, venue_codes
+from fetch_weather import get_weather_estimates
+from weather_archive import load_archive
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from team_names import canonicalize, match_key
 
 
 cwd = Path(os.getcwd())
@@ -17,50 +22,114 @@ MATCH_FILE = REPO_ROOT / "data" / "matches" / "processed" / "all_matches_with_ba
 OUT_FILE = REPO_ROOT / "data" / "matches" / "derived" / "external_factors.csv"
 
 
-_TZ_ORDER = {
-    "Pacific": 0,
-    "Mountain": 1,
-    "Central": 2,
-    "Eastern": 3,
-    "Atlantic": 4,
-}
-
-
-def haversine(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
-    """Great-circle distance in kilometers between two (lon, lat) points."""
-    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-
-    a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
-    c = 2 * asin(sqrt(a))
-    r = 6371.0  # Earth radius (km)
-    return c * r
+REST_DEFAULT_DAYS = 7  # assumed rest before a team's first match
+GOALS_WINDOW = 5
+GOALS_DEFAULT = 1.2    # league-ish default before a team has scored history
 
 
-def tz_index(tz_name: str) -> int:
-    return _TZ_ORDER.get(str(tz_name), _TZ_ORDER["Eastern"])
-
-
-def get_fatigue_score(days_rest: int, distance_traveled_km: float, timezone_change: int) -> float:
-    """Simple heuristic fatigue score (higher = more fatigue)."""
-    fatigue = 0.0
+def get_fatigue_score(days_rest, distance_traveled_km, timezone_change):
+    """Simple heuristic fatigue score (higher = more fatigue); element-wise over arrays."""
+    days_rest = np.asarray(days_rest)
 
     # 1) Rest
-    if days_rest <= 3:
-        fatigue += 3.0
-    elif days_rest == 4:
-        fatigue += 1.5
-    elif days_rest == 5:
-        fatigue += 0.5
+    fatigue = np.select([days_rest <= 3, days_rest == 4, days_rest == 5], [3.0, 1.5, 0.5], default=0.0)
 
     # 2) Travel: 1000 km => +0.5
-    fatigue += (distance_traveled_km / 1000.0) * 0.5
+    fatigue = fatigue + (np.asarray(distance_traveled_km) / 1000.0) * 0.5
 
     # 3) Time-zone change: 1 zone => +0.5
-    fatigue += abs(timezone_change) * 0.5
-
-    return float(fatigue)
+    fatigue = fatigue + np.abs(np.asarray(timezone_change)) * 0.5
+
+    return fatigue.astype(float)
+
+
+def _team_match_table(df: pd.DataFrame) -> pd.DataFrame:
+    """One row per (match, team), time-ordered within each team.
+
+    Both sides play at the home team's venue. prev_* columns describe the
+    team's previous fixture (NaN/-1 before its first one).
+    """
+    venue = venue_codes(df["home_team"])
+    base = {"match_row": np.arange(len(df)), "date": df["date"].to_numpy(), "venue": venue}
+    long_df = pd.concat([
+        pd.DataFrame({**base, "side": "home", "team": df["home_team"].to_numpy(),
+                      "goals": df["HomeScore"].to_numpy(dtype=float)}),
+        pd.DataFrame({**base, "side": "away", "team": df["away_team"].to_numpy(),
+                      "goals": df["AwayScore"].to_numpy(dtype=float)}),
+    ], ignore_index=True)
+    long_df = long_df.sort_values(["team", "date", "match_row"], kind="stable").reset_index(drop=True)
+
+    g = long_df.groupby("team", sort=False)
+    long_df["prev_date"] = g["date"].shift(1)
+    long_df["prev_venue"] = g["venue"].shift(1).fillna(-1).astype(np.int64)
+
+    # Mean goals over the last GOALS_WINDOW played matches, as of kickoff
+    played = long_df[long_df["goals"].notna()]
+    post = (
+        played.groupby("team", sort=False)["goals"]
+              .rolling(GOALS_WINDOW, min_periods=1).mean()
+              .reset_index(level=0, drop=True)
+              .reindex(long_df.index)
+    )
+    prev = post.groupby(long_df["team"]).shift(1)
+    long_df["avg_goals"] = prev.groupby(long_df["team"]).ffill().fillna(GOALS_DEFAULT)
+    return long_df
+
+
+def build_external_factors(df: pd.DataFrame, archive=None) -> pd.DataFrame:
+    """Fatigue, travel, weather and scoring features for date-sorted matches.
+
+    With a WeatherArchive, observed kickoff temperature/precipitation are
+    added as weather_obs_* next to the climate-normal columns.
+    """
+    long_df = _team_match_table(df)
+    first = long_df["prev_venue"].to_numpy() < 0
+    venue = long_df["venue"].to_numpy()
+    is_away = (long_df["side"] == "away").to_numpy()
+
+    # Where each team is travelling from: its previous venue, or for an away
+    # team's first match its home base (home teams start with no travel)
+    origin = np.where(first, venue_codes(long_df["team"]), long_df["prev_venue"].to_numpy())
+    moves = ~first | is_away
+
+    rest = (long_df["date"] - long_df["prev_date"]).dt.days.fillna(REST_DEFAULT_DAYS).to_numpy(dtype=np.int64)
+    dist = np.where(moves, DISTANCE_KM[origin, venue], 0.0)
+    tz_change = np.where(moves, TZ_DELTA[origin, venue], 0)
+    long_df["fatigue"] = get_fatigue_score(rest, dist, tz_change)
+    long_df["dist"] = dist
+    long_df["tz_change"] = tz_change
+
+    home = long_df[~is_away].set_index("match_row").sort_index()
+    away = long_df[is_away].set_index("match_row").sort_index()
+
+    # --- WEATHER --- (climate normals at the home venue, one gather)
+    avg_temp, rain_prob = get_weather_estimates(home["venue"].to_numpy(), df["date"].dt.month.to_numpy())
+
+    mid = df["match_id"] if "match_id" in df.columns else pd.Series(np.nan, index=df.index)
+    fallback = df["date"].dt.strftime("%Y-%m-%d") + "_" + df["home_team"] + "_vs_" + df["away_team"]
+
+    h_goals = home["avg_goals"].to_numpy()
+    a_goals = away["avg_goals"].to_numpy()
+    out = pd.DataFrame({
+        "match_id": mid.fillna(fallback).to_numpy(),
+        "match_key": match_key(df["Date"], df["home_team"], df["away_team"]).to_numpy(),
+        "fatigue_home": home["fatigue"].round(4).to_numpy(),
+        "fatigue_away": away["fatigue"].round(4).to_numpy(),
+        "travel_km_away": away["dist"].round(1).to_numpy(),
+        "tz_change_away": away["tz_change"].astype(int).to_numpy(),
+        "weather_temp": avg_temp,
+        "weather_rain_prob": rain_prob,
+        "avg_goals_home": np.round(h_goals, 4),
+        "avg_goals_away": np.round(a_goals, 4),
+        "rain_impact_home": rain_prob * h_goals,
+        "rain_impact_away": rain_prob * a_goals,
+    })
+
+    if archive is not None:
+        obs_temp, obs_precip = archive.lookup(home["venue"].to_numpy(), df["date"])
+        out["weather_obs_temp"] = np.round(obs_temp, 1)
+        out["weather_obs_precip_mm"] = np.round(obs_precip, 1)
+    return out
 
 
 def main():
@@ -72,111 +141,17 @@ def main():
 
     df = pd.read_csv(MATCH_FILE)
     df["date"] = pd.to_datetime(df["Date"])
-    df["home_team"] = df["HomeTeam"].map(TEAM_MAP).fillna(df["HomeTeam"])
-    df["away_team"] = df["AwayTeam"].map(TEAM_MAP).fillna(df["AwayTeam"])
-    df = df.sort_values("date").reset_index(drop=True)
-
-    # Track history per team
-    last_played: dict[str, pd.Timestamp] = {}
-    last_location: dict[str, str] = {}  # last venue key 
+    df["home_team"] = canonicalize(df["HomeTeam"])
+    df["away_team"] = canonicalize(df["AwayTeam"])
+    df = df.sort_values("date", kind="stable").reset_index(drop=True)
 
-    # Track goal history {team: [g1, g2, ...]}
-    team_goals_history: dict[str, list[float]] = {}
+    archive = load_archive()
+    if archive is not None:
+        print(f"   Using weather archive ({len(archive)} observations)")
 
-    features = []
     print(f"   Processing {len(df)} matches...")
+    out_df = build_external_factors(df, archive)
 
-    for _, row in df.iterrows():
-        mid = row.get("match_id")
-        if pd.isna(mid):
-            mid = f"{row['date'].strftime('%Y-%m-%d')}_{row['home_team']}_vs_{row['away_team']}"
-
-        h_team = row["home_team"]
-        a_team = row["away_team"]
-        match_date = row["date"]
-
-        # Venue is home team's stadium
-        h_stad_info = STADIUMS.get(h_team, STADIUMS.get("York"))
-        current_loc_info = h_stad_info
-
-        # --- HOME TEAM ---
-        h_days_rest = 7
-        h_dist = 0.0
-        h_tz_change = 0
-
-        if h_team in last_played:
-            h_days_rest = int((match_date - last_played[h_team]).days)
-            prev_loc_name = last_location.get(h_team, h_team)
-            prev_loc = STADIUMS.get(prev_loc_name, h_stad_info)
-
-            h_dist = haversine(prev_loc["lon"], prev_loc["lat"], h_stad_info["lon"], h_stad_info["lat"])
-            h_tz_change = tz_index(h_stad_info.get("tz")) - tz_index(prev_loc.get("tz"))
-
-        h_fatigue = get_fatigue_score(h_days_rest, h_dist, h_tz_change)
-
-        # --- AWAY TEAM ---
-        a_days_rest = 7
-        a_dist = 0.0
-        a_tz_change = 0
-
-        if a_team in last_played:
-            a_days_rest = int((match_date - last_played[a_team]).days)
-            prev_loc_name = last_location.get(a_team, a_team)
-            prev_loc = STADIUMS.get(prev_loc_name, STADIUMS.get("York"))
-
-            a_dist = haversine(prev_loc["lon"], prev_loc["lat"], current_loc_info["lon"], current_loc_info["lat"])
-            a_tz_change = tz_index(current_loc_info.get("tz")) - tz_index(prev_loc.get("tz"))
-        else:
-            # If no prior match, approximate travel as home-base -> venue
-            a_home_base = STADIUMS.get(a_team, STADIUMS.get("York"))
-            a_dist = haversine(a_home_base["lon"], a_home_base["lat"], current_loc_info["lon"], current_loc_info["lat"])
-            a_tz_change = tz_index(current_loc_info.get("tz")) - tz_index(a_home_base.get("tz"))
-
-        a_fatigue = get_fatigue_score(a_days_rest, a_dist, a_tz_change)
-
-        # --- WEATHER ---
-        month = int(match_date.month)
-        avg_temp, rain_prob = get_weather_estimate(h_stad_info["name"], month)
-
-        # --- SCORING FORM (rolling avg goals for last 5 matches, before today) ---
-        def get_avg_goals(team: str) -> float:
-            hist = team_goals_history.get(team, [])
-            if not hist:
-                return 1.2  # league-ish default
-            recent = hist[-5:]
-            return float(sum(recent) / len(recent))
-
-        h_avg_goals = get_avg_goals(h_team)
-        a_avg_goals = get_avg_goals(a_team)
-
-        # --- UPDATE HISTORY ---
-        last_played[h_team] = match_date
-        last_played[a_team] = match_date
-        last_location[h_team] = h_team  # venue key for this match
-        last_location[a_team] = h_team  # away team also played at home team's venue
-
-        # Add actual goals from today to history (if present)
-        if pd.notna(row.get("HomeScore")):
-            team_goals_history.setdefault(h_team, []).append(float(row["HomeScore"]))
-            team_goals_history.setdefault(a_team, []).append(float(row["AwayScore"]))
-
-        features.append(
-            {
-                "match_id": mid,
-                "fatigue_home": round(h_fatigue, 4),
-                "fatigue_away": round(a_fatigue, 4),
-                "travel_km_away": round(a_dist, 1),
-                "tz_change_away": int(a_tz_change),
-                "weather_temp": float(avg_temp),
-                "weather_rain_prob": float(rain_prob),
-                "avg_goals_home": round(h_avg_goals, 4),
-                "avg_goals_away": round(a_avg_goals, 4),
-                "rain_impact_home": float(rain_prob) * float(h_avg_goals),
-                "rain_impact_away": float(rain_prob) * float(a_avg_goals),
-            }
-        )
-
-    out_df = pd.DataFrame(features)
     OUT_FILE.parent.mkdir(parents=True, exist_ok=True)
     out_df.to_csv(OUT_FILE, index=False)
 
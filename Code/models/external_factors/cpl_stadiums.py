@@ -1,3 +1,6 @@
+import numpy as np
+import pandas as pd
+
 STADIUMS = {
     "Pacific":   {"name": "Starlight Stadium",        "lat": 48.4429, "lon": -123.5042, "tz": "Pacific"},
     "Vancouver": {"name": "Willoughby Park",          "lat": 49.1440, "lon": -122.6656, "tz": "Pacific"},
@@ -10,17 +13,39 @@ STADIUMS = {
     "Edmonton":  {"name": "Clarke Stadium",           "lat": 53.5574, "lon": -113.4764, "tz": "Mountain"},
 }
 
-TEAM_MAP = {
-    "Pacific FC": "Pacific",
-    "Vancouver FC": "Vancouver",
-    "Cavalry FC": "Cavalry",
-    "Valour FC": "Valour",
-    "Forge FC": "Forge",
-    "York United": "York",
-    "York United FC": "York",
-    "Atlético Ottawa": "Atlético",
-    "Atletico Ottawa": "Atlético",
-    "HFX Wanderers": "Wanderers",
-    "HFX Wanderers FC": "Wanderers",
-    "FC Edmonton": "Edmonton",
+# Venue codes: the row/column order of the matrices below
+VENUES = tuple(STADIUMS)
+VENUE_CODE = {team: i for i, team in enumerate(VENUES)}
+DEFAULT_VENUE = "York"  # used for teams without a stadium entry
+
+TZ_ORDER = {
+    "Pacific": 0,
+    "Mountain": 1,
+    "Central": 2,
+    "Eastern": 3,
+    "Atlantic": 4,
 }
+
+
+def haversine(lon1, lat1, lon2, lat2):
+    """Great-circle distance in kilometers; accepts scalars or broadcastable arrays."""
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * np.arcsin(np.sqrt(a)) * 6371.0
+
+
+_LAT = np.array([STADIUMS[v]["lat"] for v in VENUES])
+_LON = np.array([STADIUMS[v]["lon"] for v in VENUES])
+
+# DISTANCE_KM[i, j]: km from venue i to venue j
+DISTANCE_KM = haversine(_LON[:, None], _LAT[:, None], _LON[None, :], _LAT[None, :])
+
+# TZ_DELTA[i, j]: time zones crossed going from venue i to venue j (east positive)
+TZ_INDEX = np.array([TZ_ORDER.get(STADIUMS[v]["tz"], TZ_ORDER["Eastern"]) for v in VENUES])
+TZ_DELTA = TZ_INDEX[None, :] - TZ_INDEX[:, None]
+
+
+def venue_codes(teams) -> np.ndarray:
+    """Home-venue code per (canonical) team name, DEFAULT_VENUE if unknown."""
+    codes = pd.Series(np.asarray(teams, dtype=object)).map(VENUE_CODE)
+    return codes.fillna(VENUE_CODE[DEFAULT_VENUE]).to_numpy(dtype=np.int64)
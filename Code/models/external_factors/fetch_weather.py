@@ -1,5 +1,7 @@
 from __future__ import annotations
-from cpl_stadiums import STADIUMS
+import numpy as np
+
+from cpl_stadiums import STADIUMS, VENUES
 
 # (avg_temp_celsius, rain_probability)
 CLIMATE_DATA = {
@@ -28,23 +30,47 @@ CLIMATE_DATA = {
 DEFAULT_ESTIMATE = (15, 0.25)
 
 
+SEASON_MONTHS = (4, 10)  # Apr-Oct; other months clamp to the nearest end
+
+
+def _climate_table() -> np.ndarray:
+    """CLIMATE_TABLE[venue code, month] -> (avg_temp_c, rain_prob).
+
+    The extra last row (venue code -1) is the Eastern fallback for unknown
+    stadiums, and months outside the season are pre-clamped, so a lookup
+    is a plain gather with no branching.
+    """
+    regions = [STADIUMS[v].get("tz", "Eastern") for v in VENUES] + ["Eastern"]
+    lo, hi = SEASON_MONTHS
+    table = np.empty((len(regions), 13, 2), dtype=np.float64)
+    for i, region in enumerate(regions):
+        months = CLIMATE_DATA.get(region, CLIMATE_DATA["Eastern"])
+        for m in range(13):
+            table[i, m] = months.get(min(hi, max(lo, m)), DEFAULT_ESTIMATE)
+    return table
+
+
+CLIMATE_TABLE = _climate_table()
+STADIUM_CODE = {data["name"]: i for i, data in enumerate(STADIUMS[v] for v in VENUES)}
+
+
+def get_weather_estimates(venue_codes, months):
+    """Vectorized lookup: arrays of venue codes (cpl_stadiums.VENUES order, -1 =
+    unknown) and months -> (avg_temp_c, rain_prob) arrays."""
+    codes = np.asarray(venue_codes, dtype=np.int64)
+    months = np.clip(np.asarray(months, dtype=np.int64), 0, 12)
+    est = CLIMATE_TABLE[codes, months]
+    return est[..., 0], est[..., 1]
+
+
 def get_weather_estimate(stadium_name: str, month: int):
     """Return (avg_temp_c, rain_prob) for a given stadium and month.
 
     Stadium lookup is by exact stadium_name match against STADIUMS[*]['name'].
     If the stadium is unknown, defaults to Eastern.
     """
-    region = "Eastern"
-    for _, data in STADIUMS.items():
-        if data.get("name") == stadium_name:
-            region = data.get("tz", "Eastern")
-            break
-
-    # Apr-Oct
-    month = int(month)
-    month = max(4, min(10, month))
-
-    return CLIMATE_DATA.get(region, CLIMATE_DATA["Eastern"]).get(month, DEFAULT_ESTIMATE)
+    temp, rain = get_weather_estimates(STADIUM_CODE.get(stadium_name, -1), int(month))
+    return float(temp), float(rain)
 
 
 def main():
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from cpl_stadiums import STADIUMS, VENUE_CODE, VENUES
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from team_names import canonical_team
+
+
+cwd = Path(os.getcwd())
+REPO_ROOT = cwd if cwd.name == "canpl-bet-3" else Path(__file__).resolve().parent.parent.parent.parent
+
+# One folder per venue, named after its team (data/weather/raw/Forge/*.csv),
+# holding station CSV dumps (Environment Canada hourly or daily layout).
+RAW_DIR = REPO_ROOT / "data" / "weather" / "raw"
+STORE_FILE = REPO_ROOT / "data" / "weather" / "weather_archive.npz"
+
+# Station timestamps are local standard time (no DST), i.e. a fixed UTC offset
+LST_UTC_OFFSET_HOURS = {
+    "Pacific": -8,
+    "Mountain": -7,
+    "Central": -6,
+    "Eastern": -5,
+    "Atlantic": -4,
+}
+
+# An observation older than this at kickoff is treated as missing
+MAX_STALENESS_HOURS = 24
+
+_TIME_COLS = ["Date/Time (LST)", "Date/Time", "datetime", "date"]
+_TEMP_COLS = ["Temp (°C)", "Temp (C)", "Mean Temp (°C)", "Mean Temp (C)", "temp_c", "temp"]
+_PRECIP_COLS = ["Precip. Amount (mm)", "Total Precip (mm)", "precip_mm", "precip"]
+# Columns that only appear in the daily layout (one row per calendar day)
+_DAILY_COLS = {"Mean Temp (°C)", "Mean Temp (C)", "Total Precip (mm)"}
+
+# Packed lookup key: venue code in the high bits, unix seconds in the low 32
+_KEY_SHIFT = np.int64(1) << np.int64(32)
+
+
+def _pick(columns, candidates):
+    for c in candidates:
+        if c in columns:
+            return c
+    return None
+
+
+def _is_daily(local: pd.Series, columns) -> bool:
+    """Daily layout: a daily-only column, or every timestamp at midnight at least a day apart."""
+    if _DAILY_COLS & set(columns):
+        return True
+    t = local.dropna()
+    if len(t) < 2:
+        return False
+    return bool((t == t.dt.normalize()).all() and t.sort_values().diff().dropna().min() >= pd.Timedelta(days=1))
+
+
+def read_station_csv(path: Path, venue: str) -> pd.DataFrame:
+    """(ts, temp, precip) from one station dump; ts is UTC unix seconds.
+
+    A daily dump summarizes the whole day but is stamped at its local
+    midnight, so its rows are moved to the end of the day; otherwise a
+    kickoff would see that evening's mean temperature and total rain.
+    """
+    head = pd.read_csv(path, nrows=0, encoding="utf-8-sig").columns
+    t_col, temp_col, p_col = _pick(head, _TIME_COLS), _pick(head, _TEMP_COLS), _pick(head, _PRECIP_COLS)
+    if t_col is None or temp_col is None:
+        raise ValueError(f"{path.name}: need a date/time and a temperature column, got {list(head)}")
+
+    usecols = [c for c in (t_col, temp_col, p_col) if c is not None]
+    raw = pd.read_csv(path, usecols=usecols, encoding="utf-8-sig")
+
+    local = pd.to_datetime(raw[t_col], errors="coerce")
+    if _is_daily(local, usecols):
+        local = local + pd.Timedelta(days=1)
+    if local.dt.tz is not None:
+        utc = local.dt.tz_convert("UTC").dt.tz_localize(None)
+    else:
+        offset = LST_UTC_OFFSET_HOURS.get(STADIUMS[venue].get("tz"), LST_UTC_OFFSET_HOURS["Eastern"])
+        utc = local - pd.Timedelta(hours=offset)
+
+    out = pd.DataFrame({
+        "ts": utc.astype("int64") // 10**9,
+        "temp": pd.to_numeric(raw[temp_col], errors="coerce"),
+        "precip": pd.to_numeric(raw[p_col], errors="coerce") if p_col else np.nan,
+    })
+    return out[local.notna() & out["temp"].notna()]
+
+
+def ingest(raw_dir: Path = RAW_DIR, store_file: Path = STORE_FILE) -> int:
+    """Load every venue folder under raw_dir into one sorted store; returns row count."""
+    frames = []
+    for folder in sorted(p for p in Path(raw_dir).iterdir() if p.is_dir()):
+        venue = canonical_team(folder.name)
+        if venue not in VENUE_CODE:
+            print(f"   Skipping {folder.name}: not a known venue")
+            continue
+        for f in sorted(folder.glob("*.csv")):
+            obs = read_station_csv(f, venue)
+            obs["venue"] = VENUE_CODE[venue]
+            frames.append(obs)
+            print(f"   {venue:<10s} {f.name}: {len(obs)} observations")
+
+    if not frames:
+        raise FileNotFoundError(f"No station CSVs found under {raw_dir}/<venue>/")
+
+    obs = pd.concat(frames, ignore_index=True)
+    # Overlapping dumps: keep the last file's reading for a (venue, ts)
+    obs = obs.drop_duplicates(["venue", "ts"], keep="last").sort_values(["venue", "ts"])
+
+    store_file = Path(store_file)
+    store_file.parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(
+        store_file,
+        venues=np.array(VENUES, dtype=str),
+        venue=obs["venue"].to_numpy(dtype=np.int16),
+        ts=obs["ts"].to_numpy(dtype=np.int64),
+        temp=obs["temp"].to_numpy(dtype=np.float32),
+        precip=obs["precip"].to_numpy(dtype=np.float32),
+    )
+    return len(obs)
+
+
+class WeatherArchive:
+    """As-of reader over the ingested store.
+
+    Rows are sorted by (venue, ts), so one searchsorted on packed
+    (venue, ts) keys finds the latest observation at or before each
+    kickoff for a whole batch of fixtures.
+    """
+
+    def __init__(self, path: Path = STORE_FILE):
+        with np.load(path, allow_pickle=False) as data:
+            stored = list(data["venues"])
+            remap = np.array([VENUE_CODE.get(v, -1) for v in stored], dtype=np.int64)
+            self.venue = remap[data["venue"]]
+            self.ts = data["ts"]
+            self.temp = data["temp"]
+            self.precip = data["precip"]
+        order = np.lexsort((self.ts, self.venue))
+        self.venue, self.ts = self.venue[order], self.ts[order]
+        self.temp, self.precip = self.temp[order], self.precip[order]
+        self.keys = self.venue * _KEY_SHIFT + self.ts
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def lookup(self, venue_codes, kickoffs, max_staleness_hours: float = MAX_STALENESS_HOURS):
+        """(temp_c, precip_mm) arrays for each (venue code, kickoff), NaN where
+        the venue has no observation within max_staleness_hours before kickoff."""
+        codes = np.asarray(venue_codes, dtype=np.int64)
+        secs = pd.to_datetime(pd.Series(np.atleast_1d(kickoffs)), utc=True).astype("int64").to_numpy() // 10**9
+        if not len(self.keys):
+            return np.full(len(secs), np.nan), np.full(len(secs), np.nan)
+
+        k = np.searchsorted(self.keys, codes * _KEY_SHIFT + secs, side="right") - 1
+        hit = k >= 0
+        kk = np.where(hit, k, 0)
+        hit &= (self.venue[kk] == codes) & (secs - self.ts[kk] <= max_staleness_hours * 3600)
+
+        temp = np.where(hit, self.temp[kk], np.nan)
+        precip = np.where(hit, self.precip[kk], np.nan)
+        return temp, precip
+
+
+def load_archive(path: Path = STORE_FILE):
+    """WeatherArchive if the store has been built, else None."""
+    return WeatherArchive(path) if Path(path).exists() else None
+
+
+def main():
+    print("--- INGESTING WEATHER ARCHIVE ---")
+    n = ingest()
+    print(f"Saved {n} observations to: {STORE_FILE}")
+
+
+if __name__ == "__main__":
+    main()
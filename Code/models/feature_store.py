@@ -0,0 +1,378 @@
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from team_names import canonicalize, check_match_keys, match_key
+
+
+# --- PATH SETUP ---
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+MODELS_DIR = Path(__file__).resolve().parent
+
+DERIVED_DIR = REPO_ROOT / "data" / "matches" / "derived"
+BASELINE_FILE = REPO_ROOT / "data" / "matches" / "processed" / "all_matches_with_baseline.csv"
+WEATHER_ARCHIVE_FILE = REPO_ROOT / "data" / "weather" / "weather_archive.npz"
+
+# data/matches/feature_store/<group>/{match_key.npy, <column>.npy}; manifest.json
+# records each group's columns and the fingerprint of the inputs it was built from
+STORE_DIR = REPO_ROOT / "data" / "matches" / "feature_store"
+MANIFEST_FILE = STORE_DIR / "manifest.json"
+
+KEY = "match_key"
+
+# Every group keys its rows with team_names (canonicalize, match_key), so
+# a change to the team table makes all of them stale
+TEAM_NAMES_SRC = MODELS_DIR / "team_names.py"
+
+
+class FeatureGroup:
+    """Columns produced together by one generator from a fixed set of inputs.
+
+    `generate()` returns a frame with match_key plus the group's columns.
+    `inputs` are the data and code files it depends on; a change to any of
+    them, or to the module defining the generator (which also holds the
+    helpers it calls, such as _keyed), makes the group stale. `columns` may
+    be None when the group's width is only known after a build.
+    """
+
+    def __init__(self, name, generate, inputs, columns=None):
+        self.name = name
+        self.generate = generate
+        self.inputs = [Path(p) for p in inputs]
+        self.columns = list(columns) if columns is not None else None
+
+    def fingerprint(self) -> str:
+        h = hashlib.sha256(inspect.getsource(self.generate).encode("utf-8"))
+        h.update(Path(inspect.getsourcefile(self.generate)).read_bytes())
+        for path in self.inputs:
+            h.update(path.name.encode("utf-8"))
+            h.update(hashlib.sha256(path.read_bytes()).digest() if path.exists() else b"<missing>")
+        return h.hexdigest()[:16]
+
+
+FEATURE_GROUPS = {}
+
+
+def feature_group(name, inputs, columns=None):
+    """Decorator registering a generator as the feature group `name`."""
+    def wrap(fn):
+        FEATURE_GROUPS[name] = FeatureGroup(name, fn, inputs, columns)
+        return fn
+    return wrap
+
+
+def _keyed(df: pd.DataFrame, dates, home, away, labelled=None) -> pd.DataFrame:
+    """Prepend match_key; rows without one are dropped, re-listed matches keep their last row.
+
+    Rows lost to an unknown team are reported (see team_names.check_match_keys);
+    `labelled` marks rows whose loss raises instead.
+    """
+    df = df.copy()
+    df.insert(0, KEY, match_key(dates, home, away).to_numpy())
+    check_match_keys(df[KEY], home, away, labelled=labelled, source="rows")
+    df = df.dropna(subset=[KEY])
+    return df.drop_duplicates(subset=KEY, keep="last").reset_index(drop=True)
+
+
+# --- FEATURE GROUPS ---
+@feature_group(
+    "match",
+    inputs=[DERIVED_DIR / "match_features.csv", TEAM_NAMES_SRC],
+    columns=["match_id", "season", "date", "home_team", "away_team"],
+)
+def _match_group():
+    df = pd.read_csv(DERIVED_DIR / "match_features.csv")
+    df["date"] = pd.to_datetime(df["date"], errors="coerce", utc=True)
+    df["home_team"] = canonicalize(df["home_team"])
+    df["away_team"] = canonicalize(df["away_team"])
+    cols = ["match_id", "season", "date", "home_team", "away_team"]
+    return _keyed(df[cols], df["date"], df["home_team"], df["away_team"])
+
+
+@feature_group(
+    "strength",
+    inputs=[DERIVED_DIR / "match_features.csv", TEAM_NAMES_SRC],
+    columns=["diff_total", "diff_attack", "diff_defense", "home_team_total", "away_team_total", "both_coverage_ok"],
+)
+def _strength_group():
+    df = pd.read_csv(DERIVED_DIR / "match_features.csv")
+    cols = ["diff_total", "diff_attack", "diff_defense", "home_team_total", "away_team_total", "both_coverage_ok"]
+    return _keyed(df[cols], df["date"], df["home_team"], df["away_team"])
+
+
+@feature_group(
+    "form",
+    inputs=[DERIVED_DIR / "match_model_with_form.csv", TEAM_NAMES_SRC],
+    columns=["home_form_pts", "away_form_pts", "home_form_gd", "away_form_gd", "diff_form_pts", "diff_form_gd"],
+)
+def _form_group():
+    # FormState is a sequential pass over the whole history, so the form
+    # columns stay owned by build_rolling_features and are only projected here
+    df = pd.read_csv(DERIVED_DIR / "match_model_with_form.csv")
+    cols = ["home_form_pts", "away_form_pts", "home_form_gd", "away_form_gd", "diff_form_pts", "diff_form_gd"]
+    return _keyed(df[cols], df["date"], df["home_team"], df["away_team"])
+
+
+@feature_group(
+    "form_bank",
+    inputs=[
+        DERIVED_DIR / "match_model_with_form.csv",
+        TEAM_NAMES_SRC,
+        MODELS_DIR / "james_elo" / "build_form_feature_bank.py",
+    ],
+)
+def _form_bank_group():
+    sys.path.insert(0, str(MODELS_DIR / "james_elo"))
+    from build_form_feature_bank import build_feature_bank
+
+    df = pd.read_csv(DERIVED_DIR / "match_model_with_form.csv")
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    df = df.dropna(subset=["date"]).sort_values("date", kind="stable").reset_index(drop=True)
+    bank = build_feature_bank(df)
+    feats = bank.drop(columns=["match_id", "season", "date", "home_team", "away_team"])
+    return _keyed(feats, df["date"], df["home_team"], df["away_team"])
+
+
+@feature_group(
+    "targets",
+    inputs=[BASELINE_FILE, TEAM_NAMES_SRC],
+    columns=["HomeScore", "AwayScore", "label"],
+)
+def _targets_group():
+    df = pd.read_csv(BASELINE_FILE)
+    out = pd.DataFrame({
+        "HomeScore": df["HomeScore"],
+        "AwayScore": df["AwayScore"],
+        "label": df["Result"].str.upper().map({"H": 2, "D": 1, "A": 0}),  # as in build_targets
+    })
+    return _keyed(out, df["Date"], df["HomeTeam"], df["AwayTeam"], labelled=out["label"].notna())
+
+
+@feature_group(
+    "external",
+    inputs=[
+        BASELINE_FILE,
+        WEATHER_ARCHIVE_FILE,
+        TEAM_NAMES_SRC,
+        MODELS_DIR / "external_factors" / "build_fatigue_features.py",
+        MODELS_DIR / "external_factors" / "cpl_stadiums.py",
+        MODELS_DIR / "external_factors" / "fetch_weather.py",
+        MODELS_DIR / "external_factors" / "weather_archive.py",
+    ],
+)
+def _external_group():
+    sys.path.insert(0, str(MODELS_DIR / "external_factors"))
+    from build_fatigue_features import build_external_factors
+    from weather_archive import load_archive
+
+    # Same preparation as build_fatigue_features.main
+    df = pd.read_csv(BASELINE_FILE)
+    df["date"] = pd.to_datetime(df["Date"])
+    df["home_team"] = canonicalize(df["HomeTeam"])
+    df["away_team"] = canonicalize(df["AwayTeam"])
+    df = df.sort_values("date", kind="stable").reset_index(drop=True)
+
+    ext = build_external_factors(df, load_archive(WEATHER_ARCHIVE_FILE))
+    ext = ext.dropna(subset=[KEY]).drop_duplicates(subset=KEY, keep="last")
+    return ext.drop(columns=["match_id"]).reset_index(drop=True)
+
+
+# --- STORAGE ---
+def _to_array(s: pd.Series):
+    """Column -> (array np.save can write without pickle, manifest entry)."""
+    if isinstance(s.dtype, pd.DatetimeTZDtype):
+        return s.dt.tz_convert("UTC").dt.tz_localize(None).to_numpy(), {"tz": "UTC"}
+    if pd.api.types.is_bool_dtype(s.dtype) or pd.api.types.is_numeric_dtype(s.dtype):
+        if isinstance(s.dtype, pd.api.extensions.ExtensionDtype):
+            s = s.astype("float64")  # nullable ints/floats -> NaN for missing
+        return s.to_numpy(), {}
+    return s.where(s.notna(), "").astype(str).to_numpy(dtype=str), {}
+
+
+def _from_array(arr: np.ndarray, meta: dict):
+    if meta.get("tz"):
+        return pd.DatetimeIndex(arr).tz_localize(meta["tz"])
+    return arr
+
+
+def _write_json_atomic(path: Path, payload: dict):
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class FeatureStore:
+    """Per-match feature columns, materialized lazily and read by projection.
+
+    Each group's columns live as one .npy per column next to the group's
+    sorted match_key array. `load` works out which groups own the requested
+    columns, rebuilds only those that are missing or stale, memory-maps just
+    the requested columns and aligns them on match_key with one indexer per
+    group - no CSV is re-read and no frame is merged.
+    """
+
+    def __init__(self, root: Path = STORE_DIR, groups: dict = None):
+        self.root = Path(root)
+        self.groups = FEATURE_GROUPS if groups is None else groups
+        self.manifest_path = self.root / MANIFEST_FILE.name
+        self.manifest = (
+            json.loads(self.manifest_path.read_text(encoding="utf-8"))
+            if self.manifest_path.exists() else {"groups": {}}
+        )
+
+    # - bookkeeping -
+    def _entry(self, name):
+        return self.manifest["groups"].get(name)
+
+    def is_stale(self, name) -> bool:
+        entry = self._entry(name)
+        return entry is None or entry["fingerprint"] != self.groups[name].fingerprint()
+
+    def group_columns(self, name) -> list:
+        group = self.groups[name]
+        if group.columns is not None:
+            return group.columns
+        if self._entry(name) is None:
+            self.materialize([name])
+        return list(self._entry(name)["columns"])
+
+    def columns(self) -> dict:
+        """{column: group} for every column the store can serve."""
+        owners = {}
+        for name in self.groups:
+            for col in self.group_columns(name):
+                owners.setdefault(col, name)
+        return owners
+
+    def _owners(self, columns) -> dict:
+        owners = {}
+        for col in columns:
+            name = next((g for g in self.groups if self.groups[g].columns and col in self.groups[g].columns), None)
+            if name is None:
+                name = self.columns().get(col)
+            if name is None:
+                raise KeyError(f"No feature group provides {col!r}")
+            owners.setdefault(name, []).append(col)
+        return owners
+
+    # - building -
+    def materialize(self, names=None, force: bool = False) -> list:
+        """Build every named group (default: all) that is missing or stale; returns the rebuilt names."""
+        built = []
+        for name in names or list(self.groups):
+            group = self.groups[name]
+            fingerprint = group.fingerprint()
+            entry = self._entry(name)
+            if not force and entry is not None and entry["fingerprint"] == fingerprint:
+                continue
+
+            t0 = time.perf_counter()
+            df = group.generate()
+            df[KEY] = df[KEY].astype("int64")
+            df = df.sort_values(KEY, kind="mergesort").reset_index(drop=True)
+            if group.columns is not None:
+                missing = [c for c in group.columns if c not in df.columns]
+                if missing:
+                    raise ValueError(f"Feature group {name!r} did not produce {missing}")
+                df = df[[KEY] + group.columns]
+            self._write_group(name, df, fingerprint, time.perf_counter() - t0)
+            built.append(name)
+        return built
+
+    def _write_group(self, name, df: pd.DataFrame, fingerprint: str, seconds: float):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / f".{name}.{os.getpid()}.tmp"
+        if tmp.exists():
+            shutil.rmtree(tmp)
+        tmp.mkdir()
+
+        columns = {}
+        np.save(tmp / f"{KEY}.npy", df[KEY].to_numpy(dtype=np.int64), allow_pickle=False)
+        for col in df.columns.drop(KEY):
+            arr, meta = _to_array(df[col])
+            np.save(tmp / f"{col}.npy", arr, allow_pickle=False)
+            columns[col] = {"dtype": arr.dtype.str, **meta}
+
+        target = self.root / name
+        if target.exists():
+            shutil.rmtree(target)
+        os.rename(tmp, target)
+
+        self.manifest["groups"][name] = {
+            "fingerprint": fingerprint,
+            "rows": int(len(df)),
+            "columns": columns,
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "build_seconds": round(seconds, 3),
+        }
+        _write_json_atomic(self.manifest_path, self.manifest)
+
+    # - reading -
+    def _column(self, name, col):
+        return np.load(self.root / name / f"{col}.npy", mmap_mode="r", allow_pickle=False)
+
+    def load(self, columns, keys=None) -> pd.DataFrame:
+        """match_key plus `columns`, one row per match.
+
+        Without `keys`, rows are the matches every involved group has
+        (ordered by match_key, i.e. by date); with `keys`, rows follow them
+        and columns a group lacks for a key come back missing.
+        """
+        columns = list(dict.fromkeys(columns))
+        owners = self._owners(columns)
+        self.materialize(list(owners))
+
+        group_keys = {name: np.asarray(self._column(name, KEY)) for name in owners}
+        if keys is None:
+            target = None
+            for k in group_keys.values():
+                target = k if target is None else np.intersect1d(target, k, assume_unique=True)
+        else:
+            target = np.asarray(pd.array(keys, dtype="Int64").astype("int64"))
+
+        out = {KEY: target}
+        for name, cols in owners.items():
+            pos = pd.Index(group_keys[name]).get_indexer(target)
+            hit = pos >= 0
+            meta = self._entry(name)["columns"]
+            for col in cols:
+                arr = self._column(name, col)
+                if hit.all():
+                    values = arr[pos]
+                else:
+                    values = pd.Series(arr[np.where(hit, pos, 0)]).where(hit).to_numpy()
+                out[col] = _from_array(values, meta[col])
+        return pd.DataFrame(out)[[KEY] + columns]
+
+
+def training_frame(features, label: str = "label", extra=(), store: FeatureStore = None) -> pd.DataFrame:
+    """Rows with a label and every feature, in date order: the projection models train on."""
+    store = store or FeatureStore()
+    df = store.load(list(extra) + list(features) + [label])
+    return df.dropna(subset=list(features) + [label]).reset_index(drop=True)
+
+
+def main():
+    # python feature_store.py          -> build missing/stale groups, show status
+    # python feature_store.py --force  -> rebuild every group
+    store = FeatureStore()
+    built = store.materialize(force="--force" in sys.argv)
+    print(f"--- FEATURE STORE ({store.root}) ---")
+    for name, entry in store.manifest["groups"].items():
+        tag = "built" if name in built else "cached"
+        print(f"   {name:<10s} {tag:<6s} {entry['rows']:>5d} rows x {len(entry['columns']):>3d} cols "
+              f"| {entry['fingerprint']} | {entry['build_seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import pandas as pd
+import numpy as np
+from pathlib import Path
+
+
+# --- PATH SETUP ---
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent.parent
+
+MATCHES_FILE = REPO_ROOT / "data" / "matches" / "derived" / "match_model_with_form.csv"
+OUT_FILE = REPO_ROOT / "data" / "matches" / "derived" / "form_feature_bank.csv"
+
+# Feature bank configuration
+WINDOWS = [3, 5, 10]          # rolling means over the last N played matches
+EMA_ALPHAS = [0.2, 0.35, 0.5]  # running EMAs seeded at 0 (as in form_state)
+SEASON_TO_DATE = True          # expanding mean within the season
+STATS = ["pts", "gd", "gf", "ga"]
+
+
+def _long_table(df: pd.DataFrame) -> pd.DataFrame:
+    """One row per (match, team) with that team's result from the match."""
+    played = df["HomeScore"].notna() & df["AwayScore"].notna()
+    hs = df["HomeScore"].astype(float)
+    as_ = df["AwayScore"].astype(float)
+    h_pts = np.select([hs > as_, hs == as_], [3.0, 1.0], default=0.0)
+    a_pts = np.select([as_ > hs, hs == as_], [3.0, 1.0], default=0.0)
+
+    base = {"match_row": df.index.to_numpy(), "date": df["date"], "season": df["season"], "played": played}
+    home = pd.DataFrame({**base, "side": "home", "team": df["home_team"],
+                         "pts": h_pts, "gd": hs - as_, "gf": hs, "ga": as_})
+    away = pd.DataFrame({**base, "side": "away", "team": df["away_team"],
+                         "pts": a_pts, "gd": as_ - hs, "gf": as_, "ga": hs})
+
+    long_df = pd.concat([home, away], ignore_index=True)
+    return long_df.sort_values(["team", "date", "match_row"], kind="stable").reset_index(drop=True)
+
+
+def _pre_match(long_df: pd.DataFrame, post: pd.DataFrame) -> pd.DataFrame:
+    """Turn per-played-row 'after this match' stats into 'before this match' features.
+
+    `post` is indexed like the played rows of long_df. Each row takes the
+    value from the team's most recent played row strictly before it; teams
+    with no history yet get 0 (the convention of build_rolling_features).
+    """
+    post = post.reindex(long_df.index)
+    prev = post.groupby(long_df["team"]).shift(1)
+    return prev.groupby(long_df["team"]).ffill().fillna(0.0)
+
+
+def build_feature_bank(df: pd.DataFrame) -> pd.DataFrame:
+    long_df = _long_table(df)
+    played = long_df[long_df["played"]]
+    g = played.groupby("team")[STATS]
+
+    blocks = []
+    for w in WINDOWS:
+        post = g.rolling(w, min_periods=1).mean().reset_index(level=0, drop=True)
+        blocks.append(_pre_match(long_df, post).add_suffix(f"_w{w}"))
+
+    n = g.cumcount() + 1
+    for alpha in EMA_ALPHAS:
+        # adjust=True is the bias-corrected mean; rescaling by 1-(1-a)^n gives
+        # the zero-seeded recursion ema = a*x + (1-a)*ema
+        post = g.ewm(alpha=alpha, adjust=True).mean().reset_index(level=0, drop=True)
+        post = post.mul(1.0 - (1.0 - alpha) ** n, axis=0)
+        blocks.append(_pre_match(long_df, post).add_suffix(f"_ema{int(round(alpha * 100)):02d}"))
+
+    if SEASON_TO_DATE:
+        team_season = long_df["team"].astype(str) + "|" + long_df["season"].astype(str)
+        post = (
+            played.groupby(team_season[played.index])[STATS]
+                  .expanding().mean().reset_index(level=0, drop=True)
+                  .reindex(long_df.index)
+        )
+        prev = post.groupby(team_season).shift(1)
+        blocks.append(prev.groupby(team_season).ffill().fillna(0.0).add_suffix("_std"))
+
+    feats = pd.concat(blocks, axis=1).astype(np.float32).add_prefix("form_")
+    feats["match_row"] = long_df["match_row"]
+    feats["side"] = long_df["side"]
+
+    home = feats[feats["side"] == "home"].drop(columns="side").set_index("match_row")
+    away = feats[feats["side"] == "away"].drop(columns="side").set_index("match_row")
+    diff = (home - away.reindex(home.index)).add_prefix("diff_")
+
+    wide = pd.concat(
+        [home.add_prefix("home_"), away.add_prefix("away_"), diff], axis=1
+    ).reindex(df.index)
+    return pd.concat([df[["match_id", "season", "date", "home_team", "away_team"]], wide], axis=1)
+
+
+def main():
+    print("--- BUILDING FORM FEATURE BANK ---")
+
+    if not MATCHES_FILE.exists():
+        print(f"Missing {MATCHES_FILE}. Run build_rolling_features.py first.")
+        return
+
+    df = pd.read_csv(MATCHES_FILE)
+    for col in ["HomeScore", "AwayScore"]:
+        if col not in df.columns:
+            raise ValueError(f"{MATCHES_FILE.name} is missing {col}.")
+
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    df = df.dropna(subset=["date"]).sort_values("date", kind="stable").reset_index(drop=True)
+
+    bank = build_feature_bank(df)
+    n_feats = bank.shape[1] - 5
+
+    OUT_FILE.parent.mkdir(parents=True, exist_ok=True)
+    bank.to_csv(OUT_FILE, index=False)
+    print(f"   Windows: {WINDOWS} | EMA alphas: {EMA_ALPHAS} | season-to-date: {SEASON_TO_DATE}")
+    print(f"   {len(bank)} matches x {n_feats} form features")
+    print(f"Saved feature bank to: {OUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
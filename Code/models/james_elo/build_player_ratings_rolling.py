@@ -1,7 +1,20 @@
 import pandas as pd
 import numpy as np
 from pathlib import Path
-import re
+import sys
+
+from rating_engine import EloRatingEngine
+from rating_history import DELTA_FILE, DeltaHistory, save_delta_history
+from rating_state import (
+    NO_TIMESTAMP,
+    RatingState,
+    load_latest_state,
+    matchday_checkpoint_path,
+    season_checkpoint_path,
+)
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from team_names import canonicalize
 
 # --- PATH SETUP ---
 REPO_ROOT = Path(__file__).resolve().parent.parent.parent.parent
@@ -10,6 +23,9 @@ MATCHES_FILE = REPO_ROOT / "data" / "matches" / "processed" / "all_matches_with_
 LINEUPS_FILE = REPO_ROOT / "data" / "lineups" / "assumed_lineup.csv"
 OUT_FILE = REPO_ROOT / "data" / "players" / "derived" / "player_ratings_rolling.csv"
 
+# Rows per chunk when replaying the match/lineup CSVs
+REPLAY_CHUNKSIZE = 5000
+
 # SETTINGS
 K_FACTOR = 20.0
 HOME_ADVANTAGE = 50.0
@@ -19,45 +35,20 @@ USE_MARGIN_SCALING = True
 MARGIN_CAP = 3
 MARGIN_SCALE = 0.10  # +10% per goal up to cap
 
-TEAM_NAME_MAP = {
-    "HFX Wanderers": "Wanderers",
-    "Halifax Wanderers": "Wanderers",
-    "HFX Wanderers FC": "Wanderers",
-    "York United": "York",
-    "York United FC": "York",
-    "Atlético Ottawa": "Atlético",
-    "Atletico Ottawa": "Atlético",
-    "Pacific": "Pacific",
-    "Pacific FC": "Pacific",
-    "Valour": "Valour",
-    "Valour FC": "Valour",
-    "Forge": "Forge",
-    "Forge FC": "Forge",
-    "Cavalry": "Cavalry",
-    "Cavalry FC": "Cavalry",
-    "Edmonton": "Edmonton",
-    "FC Edmonton": "Edmonton",
-}
-
-def clean_team_name(name) -> str:
-    name = str(name).strip()
-    name = name.replace(" FC", "").replace("FC ", "FC ").replace("FC", "").strip()
-    return TEAM_NAME_MAP.get(name, name)
-
-def norm_key(s: str) -> str:
-    """Aggressive normalize for comparisons (lowercase, no spaces)."""
-    return re.sub(r"[^a-z0-9]+", "", str(s).lower())
-
-def main():
-    print("--- BUILDING PLAYER ELO RATINGS (IMPROVED) ---")
+# Attack/defense ratings (updated from goals scored/conceded in the same pass)
+LEAGUE_GOALS = 1.33  # expected goals per team between evenly rated sides
+GOAL_K = 10.0        # rating points per goal above/below expectation
 
-    if not MATCHES_FILE.exists():
-        raise FileNotFoundError(f"Match file not found: {MATCHES_FILE}")
-    if not LINEUPS_FILE.exists():
-        raise FileNotFoundError(f"Lineups file not found: {LINEUPS_FILE}")
+# The delta-encoded history (DELTA_FILE) is always written and consumers
+# read it through DeltaHistory.to_frame(); set True to also write the old
+# full per-player-per-match CSV.
+WRITE_SNAPSHOT_CSV = False
 
-    matches = pd.read_csv(MATCHES_FILE)
+# Pass --resume to continue from the latest checkpoint and append only new matches
+RESUME = "--resume" in sys.argv
 
+def _prepare_matches(matches: pd.DataFrame) -> pd.DataFrame:
+    """Clean names, parse dates and build match_id for a block of match rows."""
     # Scores
     if "HomeScore" not in matches.columns and "home_score" in matches.columns:
         matches = matches.rename(columns={"home_score": "HomeScore", "away_score": "AwayScore"})
@@ -68,13 +59,13 @@ def main():
         raise ValueError("Match file missing date column (expected Date or date).")
 
     matches["date"] = pd.to_datetime(matches[date_col], errors="coerce")
-    matches = matches.dropna(subset=["date"]).sort_values("date").reset_index(drop=True)
+    matches = matches.dropna(subset=["date"]).reset_index(drop=True)
 
     # Generate match_id (must match other parts of your pipeline)
     matches["season_id"] = matches["date"].dt.year.astype(str)
     matches["date_id"] = matches["date"].dt.strftime("%Y-%m-%d")
-    matches["h_clean"] = matches["HomeTeam"].apply(clean_team_name)
-    matches["a_clean"] = matches["AwayTeam"].apply(clean_team_name)
+    matches["h_clean"] = canonicalize(matches["HomeTeam"])
+    matches["a_clean"] = canonicalize(matches["AwayTeam"])
 
     matches["match_id"] = (
         matches["season_id"] + "_" +
@@ -82,102 +73,236 @@ def main():
         matches["h_clean"] + "_vs_" +
         matches["a_clean"]
     )
-
-    # Index lineups by match_id
-    lineups = pd.read_csv(LINEUPS_FILE)
-
+    return matches
+
+def _iter_lineup_groups(lineups_file: Path, chunksize: int):
+    """Yield (match_id, day, records) per match from a match_id-contiguous lineup CSV."""
+    carry = None
+    for chunk in pd.read_csv(lineups_file, chunksize=chunksize):
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        if chunk.empty:
+            continue
+        # the last match in a chunk may continue into the next one
+        tail = chunk["match_id"] == chunk["match_id"].iloc[-1]
+        carry = chunk[tail]
+        yield from _lineup_records(chunk[~tail])
+    if carry is not None:
+        yield from _lineup_records(carry)
+
+def _lineup_records(block: pd.DataFrame):
     # Optional: if lineups have a team column with FC suffixes etc, clean it.
-    lineups["team_clean"] = lineups["team"].apply(clean_team_name)
-
-    lineup_map = {}
-    for mid, group in lineups.groupby("match_id"):
-        lineup_map[mid] = group[["playerId", "team", "team_clean"]].to_dict("records")
-
-    player_ratings = {}  # playerId -> rating
-    history_records = []
+    block = block.assign(team_clean=canonicalize(block["team"]))
+    for mid, group in block.groupby("match_id", sort=False):
+        day = str(group["date"].iloc[0])[:10]
+        yield mid, day, group[["playerId", "team", "team_clean"]].to_dict("records")
+
+def iter_replay_matches(matches_file: Path = MATCHES_FILE, lineups_file: Path = LINEUPS_FILE,
+                        chunksize: int = REPLAY_CHUNKSIZE):
+    """Yield engine-ready matches (see EloRatingEngine) from the replay CSVs.
+
+    Both files are read a chunk at a time and must be in kickoff order, as
+    the pipeline writes them. Lineups are held only until their matchday has
+    passed, so memory stays flat however long the history gets; a lineup
+    that turns up after its matchday was flushed raises rather than being
+    dropped.
+    """
+    lineups = _iter_lineup_groups(lineups_file, chunksize)
+    nxt = next(lineups, None)
+    pending = {}  # match_id -> (day, records)
+    last_ts = None
+    last_lineup_day = None
+
+    for chunk in pd.read_csv(matches_file, chunksize=chunksize):
+        for m in _prepare_matches(chunk).to_dict("records"):
+            if last_ts is not None and m["date"] < last_ts:
+                raise ValueError(f"Replay file is not in kickoff order at {m['match_id']}")
+            last_ts = m["date"]
+            day = m["date_id"]
+
+            while nxt is not None and nxt[1] <= day:
+                if last_lineup_day is not None and nxt[1] < last_lineup_day:
+                    raise ValueError(f"Lineup file is not in kickoff order at {nxt[0]}")
+                last_lineup_day = nxt[1]
+                pending[nxt[0]] = (nxt[1], nxt[2])
+                nxt = next(lineups, None)
+            lineup = pending.pop(m["match_id"], (day, []))[1]
+            pending = {k: v for k, v in pending.items() if v[0] >= day}
+
+            yield {
+                "match_id": m["match_id"],
+                "date": m["date"],
+                "season": m["season_id"],
+                "home_team": m["h_clean"],
+                "away_team": m["a_clean"],
+                "home_score": m["HomeScore"],
+                "away_score": m["AwayScore"],
+                "lineup": lineup,
+            }
+
+def _trim_snapshot_csv(path: Path, absorbed: set) -> int:
+    """Drop CSV rows for matches not in `absorbed`; returns how many.
+
+    The CSV is only written at the end of a run, so one that crashed after
+    checkpointing leaves rows the resumed run is about to append again.
+    """
+    keep = pd.read_csv(path, usecols=["match_id"])["match_id"].isin(absorbed).to_numpy()
+    if keep.all():
+        return 0
+    pd.read_csv(path, float_precision="round_trip")[keep].to_csv(path, index=False)
+    return int((~keep).sum())
 
-    print(f"   Processing {len(matches)} matches chronologically...")
+def main():
+    print("--- BUILDING PLAYER ELO RATINGS (IMPROVED) ---")
 
-    for _, row in matches.iterrows():
-        mid = row["match_id"]
-        players = lineup_map.get(mid, [])
-        if not players:
-            continue
+    if not MATCHES_FILE.exists():
+        raise FileNotFoundError(f"Match file not found: {MATCHES_FILE}")
+    if not LINEUPS_FILE.exists():
+        raise FileNotFoundError(f"Lineups file not found: {LINEUPS_FILE}")
 
-        h_team = row["h_clean"]
-        a_team = row["a_clean"]
-
-        h_norm = norm_key(h_team)
-        a_norm = norm_key(a_team)
-
-        h_ratings, a_ratings = [], []
-        active_home, active_away = [], []
-
-        for p in players:
-            pid = p["playerId"]
-            p_team = p.get("team_clean", p.get("team", ""))
-
-            p_norm = norm_key(p_team)
-            rating = float(player_ratings.get(pid, 1500.0))
-
-            # Save pre-match rating (compatible output)
-            history_records.append({
-                "match_id": mid,
-                "playerId": pid,
-                "team": p.get("team", ""),
-                "date": row["date"],
-                "Rating": rating,
-            })
-
-            # Strict assignment to home/away
-            if p_norm == h_norm:
-                h_ratings.append(rating)
-                active_home.append(pid)
-            elif p_norm == a_norm:
-                a_ratings.append(rating)
-                active_away.append(pid)
-            else:
-                # unknown team mapping -> ignore this player for strength + updates
-                continue
+    state = None
+    if RESUME:
+        state = load_latest_state()
+        if state is None:
+            print("   No checkpoint found; rebuilding from scratch.")
+    if state is not None and DELTA_FILE.exists():
+        # History files are written at the end of a run; if a crashed run
+        # checkpointed matches they don't hold, step back to an earlier
+        # checkpoint until every match it absorbed is in the file
+        written = set(DeltaHistory(DELTA_FILE)["match_ids"].tolist())
+        if not state.absorbed <= written:
+            print(f"   Latest checkpoint is ahead of {DELTA_FILE.name}; falling back")
+        while state is not None and not state.absorbed <= written:
+            day = pd.Timestamp(state.last_match_ts, unit="ns", tz="UTC") - pd.Timedelta(days=1)
+            state = load_latest_state(through_day=day.strftime("%Y-%m-%d"))
+    resumed = state is not None
+    if resumed:
+        print(f"   Resuming with {len(state.absorbed)} matches absorbed ({len(state)} players in state)")
+        resumed_ids = set(state.absorbed)
+    else:
+        state = RatingState()
+
+    engine = EloRatingEngine(
+        state,
+        k_factor=K_FACTOR,
+        home_advantage=HOME_ADVANTAGE,
+        use_margin_scaling=USE_MARGIN_SCALING,
+        margin_cap=MARGIN_CAP,
+        margin_scale=MARGIN_SCALE,
+        league_goals=LEAGUE_GOALS,
+        goal_k=GOAL_K,
+    )
 
-        if not h_ratings or not a_ratings:
-            continue
+    boundary = {"day": None, "season": None}
 
-        h_elo = float(np.mean(h_ratings) + HOME_ADVANTAGE)
-        a_elo = float(np.mean(a_ratings))
+    def checkpointed(matches):
+        """Pass new matches through, checkpointing when a matchday/season closes.
 
-        # Elo expected score for home (win=1, draw=0.5, loss=0)
-        ea_h = 1.0 / (1.0 + 10.0 ** ((a_elo - h_elo) / 400.0))
-        ea_a = 1.0 - ea_h
+        The engine only pulls the next match once the previous one is fully
+        applied, so the state saved here is exactly the end of that day. A
+        late result that kicked off before the state's latest match counts
+        toward that latest day, so checkpoint names never go backwards.
+        """
+        for m in matches:
+            if m["match_id"] in state.absorbed:
+                continue
+            day = m["date"].strftime("%Y-%m-%d")
+            if state.last_match_ts != NO_TIMESTAMP:
+                day = max(day, pd.Timestamp(state.last_match_ts, unit="ns", tz="UTC").strftime("%Y-%m-%d"))
+            season = day[:4]  # season_id is the kickoff year (_prepare_matches)
+            if boundary["day"] is not None and day != boundary["day"]:
+                state.save(matchday_checkpoint_path(boundary["day"]))
+            if boundary["season"] is not None and season != boundary["season"]:
+                state.save(season_checkpoint_path(boundary["season"]))
+            boundary.update(day=day, season=season)
+            yield m
 
-        # Actual score
-        hs = float(row["HomeScore"])
-        as_ = float(row["AwayScore"])
+    history_records = []
 
-        if hs > as_:
-            sa_h, sa_a = 1.0, 0.0
-        elif hs == as_:
-            sa_h, sa_a = 0.5, 0.5
+    # Delta-encoded history: match/team tables + one row per lineup appearance
+    d_match_ids, d_match_ts, d_team_names = [], [], []
+    d_match_idx, d_player_idx, d_team_idx, d_delta = [], [], [], []
+    d_delta_att, d_delta_def, d_repeat = [], [], []
+    if resumed and DELTA_FILE.exists():
+        prev = DeltaHistory(DELTA_FILE)
+        # keep only what the checkpoint has already absorbed (a prefix of the file)
+        in_state = np.isin(prev["match_ids"], list(state.absorbed))
+        n_keep = len(in_state) if in_state.all() else int(np.argmin(in_state))
+        keep = prev["match_idx"] < n_keep
+        d_match_ids, d_match_ts = prev["match_ids"][:n_keep].tolist(), prev["match_ts"][:n_keep].tolist()
+        d_team_names = prev["team_names"].tolist()
+        d_match_idx, d_player_idx = prev["match_idx"][keep].tolist(), prev["player_idx"][keep].tolist()
+        d_team_idx, d_delta = prev["team_idx"][keep].tolist(), prev["delta"][keep].tolist()
+        d_delta_att, d_delta_def = prev["delta_attack"][keep].tolist(), prev["delta_defense"][keep].tolist()
+        d_repeat = prev["repeat"][keep].tolist()
+    team_code = {t: i for i, t in enumerate(d_team_names)}
+
+    def record_deltas(mid, ts, appearances):
+        """One row per appearance, in lineup order; a player's repeat rows carry zero deltas."""
+        m = len(d_match_ids)
+        d_match_ids.append(mid)
+        d_match_ts.append(ts // 10**9)
+        seen = set()
+        for _pid, team, idx, pre, pre_att, pre_def, _side in appearances:
+            team = str(team)
+            if team not in team_code:
+                team_code[team] = len(d_team_names)
+                d_team_names.append(team)
+            repeat = idx in seen
+            seen.add(idx)
+            d_match_idx.append(m)
+            d_player_idx.append(idx)
+            d_team_idx.append(team_code[team])
+            d_repeat.append(repeat)
+            d_delta.append(0.0 if repeat else float(state.ratings[idx]) - pre)
+            d_delta_att.append(0.0 if repeat else float(state.attack[idx]) - pre_att)
+            d_delta_def.append(0.0 if repeat else float(state.defense[idx]) - pre_def)
+
+    print("   Replaying matches chronologically...")
+
+    n_matches = 0
+    for event in engine.stream(checkpointed(iter_replay_matches())):
+        n_matches += 1
+        if WRITE_SNAPSHOT_CSV:
+            for pid, team, idx, pre, pre_att, pre_def, _side in event["appearances"]:
+                # Save pre-match rating (compatible output)
+                history_records.append({
+                    "match_id": event["match_id"],
+                    "playerId": pid,
+                    "team": team,
+                    "date": event["date"],
+                    "Rating": pre,
+                    "Attack": pre_att,
+                    "Defense": pre_def,
+                })
+        record_deltas(event["match_id"], event["date"].value, event["appearances"])
+
+    if boundary["day"] is not None:
+        state.save(matchday_checkpoint_path(boundary["day"]))
+        state.save(season_checkpoint_path(boundary["season"]))
+    print(f"   Processed {n_matches} matches")
+
+    save_delta_history(
+        DELTA_FILE, state.player_ids, d_match_ids, d_match_ts, d_team_names,
+        d_match_idx, d_player_idx, d_team_idx, d_delta,
+        delta_attack=d_delta_att, delta_defense=d_delta_def, repeat=d_repeat,
+    )
+    print(f"✅ Saved rating deltas to: {DELTA_FILE} ({len(d_delta)} rows)")
+
+    if WRITE_SNAPSHOT_CSV:
+        out_df = pd.DataFrame(history_records, columns=["match_id", "playerId", "team", "date", "Rating", "Attack", "Defense"])
+        OUT_FILE.parent.mkdir(parents=True, exist_ok=True)
+        if resumed and OUT_FILE.exists():
+            dropped = _trim_snapshot_csv(OUT_FILE, resumed_ids)
+            if dropped:
+                print(f"   Dropped {dropped} rows after the checkpoint from {OUT_FILE.name}")
+            out_df.to_csv(OUT_FILE, mode="a", header=False, index=False)
         else:
-            sa_h, sa_a = 0.0, 1.0
-
-        # Margin-of-victory scaling 
-        k_eff = K_FACTOR
-        if USE_MARGIN_SCALING:
-            margin = min(abs(hs - as_), MARGIN_CAP)
-            k_eff = K_FACTOR * (1.0 + (margin * MARGIN_SCALE))
-
-        for pid in active_home:
-            player_ratings[pid] = float(player_ratings.get(pid, 1500.0) + k_eff * (sa_h - ea_h))
-        for pid in active_away:
-            player_ratings[pid] = float(player_ratings.get(pid, 1500.0) + k_eff * (sa_a - ea_a))
-
-    out_df = pd.DataFrame(history_records)
-    OUT_FILE.parent.mkdir(parents=True, exist_ok=True)
-    out_df.to_csv(OUT_FILE, index=False)
+            out_df.to_csv(OUT_FILE, index=False)
 
-    print(f"✅ Saved ELO ratings to: {OUT_FILE}")
-    print(f"   Total Player-Match Records: {len(out_df)}")
+        print(f"✅ Saved ELO ratings to: {OUT_FILE}")
+        print(f"   Total Player-Match Records: {len(out_df)}")
+    print(f"   Checkpointed {len(state)} players through {state.last_match_id}")
 
 if __name__ == "__main__":
     main()
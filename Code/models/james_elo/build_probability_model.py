@@ -7,8 +7,13 @@ from sklearn.metrics import log_loss, accuracy_score
 import joblib
 from pathlib import Path
 import os
+import sys
 import json
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from logistic_export import export_logistic, logistic_arrays
+from model_registry import data_fingerprint, register
+
 
 # --- PATH SETUP ---
 REPO_ROOT = Path(__file__).resolve().parent.parent.parent.parent
@@ -159,12 +164,27 @@ def main():
     joblib.dump(pipe.named_steps["clf"], MODEL_DIR / "logistic_model.pkl")
     joblib.dump(pipe.named_steps["scaler"], MODEL_DIR / "scaler.pkl")
 
+    # NumPy-only export for prediction processes (see logistic_export.py)
+    npz_path = export_logistic(MODEL_DIR / "logistic_model.npz", pipe.named_steps["clf"],
+                               pipe.named_steps["scaler"], features)
+
+    sha = register(
+        "logistic",
+        logistic_arrays(pipe.named_steps["clf"], pipe.named_steps["scaler"], features),
+        {k: artifact[k] for k in ["features", "classes", "cutoff_date", "metrics"]}
+        | {"data_fingerprint": data_fingerprint(df_model[[date_col, label_col] + features]),
+           "source": Path(__file__).name},
+        alias="logistic",
+    )
+
     meta_path = MODEL_DIR / "probability_model_meta.json"
     meta_path.write_text(json.dumps({k: artifact[k] for k in ["features","classes","date_col","label_col","cutoff_date","metrics"]}, indent=2))
 
     print(f"Saved model artifact to: {out_path}")
     print(f"Saved meta to: {meta_path}")
     print(f"Saved logistic_model.pkl + scaler.pkl to: {MODEL_DIR}")
+    print(f"Saved NumPy export to: {npz_path}")
+    print(f"Registered as logistic -> {sha}")
 
 if __name__ == "__main__":
     main()
@@ -1,7 +1,13 @@
 import pandas as pd
 import numpy as np
 from pathlib import Path
+import hashlib
+import sys
 
+from form_state import FormState
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from team_names import canonicalize
 
 # --- PATH SETUP ---
 REPO_ROOT = Path(__file__).resolve().parent.parent.parent.parent
@@ -9,40 +15,22 @@ REPO_ROOT = Path(__file__).resolve().parent.parent.parent.parent
 FEATURES_FILE = REPO_ROOT / "data" / "matches" / "derived" / "match_features.csv"
 BASELINE_FILE = REPO_ROOT / "data" / "matches" / "processed" / "all_matches_with_baseline.csv"
 OUT_FILE = REPO_ROOT / "data" / "matches" / "derived" / "match_model_with_form.csv"
-
-TEAM_NAME_MAP = {
-    "HFX Wanderers": "Wanderers",
-    "Halifax Wanderers": "Wanderers",
-    "HFX Wanderers FC": "Wanderers",
-    "York United": "York",
-    "York United FC": "York",
-    "Atlético Ottawa": "Atlético",
-    "Atletico Ottawa": "Atlético",
-    "Pacific": "Pacific",
-    "Pacific FC": "Pacific",
-    "Valour": "Valour",
-    "Valour FC": "Valour",
-    "Forge": "Forge",
-    "Forge FC": "Forge",
-    "Cavalry": "Cavalry",
-    "Cavalry FC": "Cavalry",
-    "Edmonton": "Edmonton",
-    "FC Edmonton": "Edmonton",
-}
+FORM_STATE_FILE = REPO_ROOT / "data" / "matches" / "derived" / "form_state.json"
 
 WINDOW = 5
 USE_EMA = False
-EMA_ALPHA = 0.35  # used only if USE_EMA=True
+EMA_ALPHA = 0.35  # used only if USE_EMA=True (running EMA over each team's full history)
 
-def clean_team(name: str) -> str:
-    return TEAM_NAME_MAP.get(str(name).strip(), str(name).strip())
+FORM_COLS = ["home_form_pts", "away_form_pts", "home_form_gd", "away_form_gd"]
 
-def _normalize_match_key(date_val, home, away):
+# Pass --resume to continue from FORM_STATE_FILE and process only matches after it
+RESUME = "--resume" in sys.argv
+
+def _normalize_match_key(dates: pd.Series, home: pd.Series, away: pd.Series) -> pd.Series:
     """YYYY-MM-DD_Home_vs_Away (consistent with your external_factors builder fallback)."""
-    d = pd.to_datetime(date_val, errors="coerce")
-    if pd.isna(d):
-        return None
-    return f"{d.strftime('%Y-%m-%d')}_{clean_team(home)}_vs_{clean_team(away)}"
+    d = pd.to_datetime(dates, errors="coerce").dt.strftime("%Y-%m-%d")
+    key = d + "_" + canonicalize(home.astype(str)) + "_vs_" + canonicalize(away.astype(str))
+    return key.where(d.notna())
 
 def _merge_scores(df_features: pd.DataFrame) -> pd.DataFrame:
     """Ensures HomeScore/AwayScore exist by merging from baseline."""
@@ -80,13 +68,11 @@ def _merge_scores(df_features: pd.DataFrame) -> pd.DataFrame:
     df_features = df_features.copy()
     df_base = df_base.copy()
 
-    df_features["_join_key"] = df_features.apply(
-        lambda r: _normalize_match_key(r.get("date"), r.get("home_team"), r.get("away_team")),
-        axis=1,
+    df_features["_join_key"] = _normalize_match_key(
+        df_features["date"], df_features["home_team"], df_features["away_team"]
     )
-    df_base["_join_key"] = df_base.apply(
-        lambda r: _normalize_match_key(r.get(date_col), r.get("HomeTeam"), r.get("AwayTeam")),
-        axis=1,
+    df_base["_join_key"] = _normalize_match_key(
+        df_base[date_col], df_base["HomeTeam"], df_base["AwayTeam"]
     )
 
     merged = df_features.merge(
@@ -98,6 +84,37 @@ def _merge_scores(df_features: pd.DataFrame) -> pd.DataFrame:
     merged = merged.drop(columns=["_join_key"])
     return merged
 
+def _results_hash(df: pd.DataFrame) -> str:
+    """Digest of (match_id, HomeScore, AwayScore) over the played rows of df, in match_id order."""
+    played = df[df["HomeScore"].notna() & df["AwayScore"].notna()]
+    rows = played[["match_id", "HomeScore", "AwayScore"]].sort_values("match_id")
+    rows = rows.astype({"HomeScore": float, "AwayScore": float})
+    return hashlib.sha256(pd.util.hash_pandas_object(rows, index=False).to_numpy().tobytes()).hexdigest()[:16]
+
+def _resume_form(df: pd.DataFrame):
+    """(form state, rows it covers, their form columns from OUT_FILE), or None to rebuild.
+
+    The saved state is only reused when it was built with the same settings
+    and the results on or before its cursor hash to what it absorbed; a
+    late or corrected result earlier in the history means a full rebuild.
+    """
+    if not (FORM_STATE_FILE.exists() and OUT_FILE.exists()) or "match_id" not in df.columns:
+        return None
+    form = FormState.load(FORM_STATE_FILE)
+    if (form.window, form.alpha) != (WINDOW, EMA_ALPHA) or form.last_date is None:
+        return None
+
+    done = (df["date"] <= pd.Timestamp(form.last_date)).to_numpy()
+    if form.results_hash != _results_hash(df[done]):
+        return None
+
+    prev = pd.read_csv(OUT_FILE, usecols=["match_id"] + FORM_COLS).drop_duplicates("match_id")
+    prev = prev.set_index("match_id")
+    ids = df.loc[done, "match_id"]
+    if not ids.isin(prev.index).all():
+        return None
+    return form, done, prev.loc[ids, FORM_COLS].to_numpy()
+
 def main():
     print("--- CALCULATING ROLLING FORM (IMPROVED) ---")
 
@@ -114,50 +131,37 @@ def main():
     df = _merge_scores(df_features)
 
     # Normalize teams
-    df["home_team"] = df["home_team"].apply(clean_team)
-    df["away_team"] = df["away_team"].apply(clean_team)
+    df["home_team"] = canonicalize(df["home_team"])
+    df["away_team"] = canonicalize(df["away_team"])
 
     df["date"] = pd.to_datetime(df["date"], errors="coerce")
     df = df.dropna(subset=["date"]).sort_values("date").reset_index(drop=True)
 
-    # team_stats: list of dicts per team
-    team_hist = {}  # {team: [{"pts":..., "gd":...}, ...]}
+    # Per-team ring buffers + running EMA; each lookup/update is O(1)
+    form = FormState(WINDOW, EMA_ALPHA)
+    done = np.zeros(len(df), dtype=bool)
+    df[FORM_COLS] = np.nan
+    resumed = _resume_form(df) if RESUME else None
+    if resumed is not None:
+        form, done, prev_form = resumed
+        df.loc[done, FORM_COLS] = prev_form
+        print(f"   Resuming from form state through {form.last_date}")
+    elif RESUME:
+        print("   Form state does not match the history; rebuilding from scratch")
 
     home_form_pts, away_form_pts, home_form_gd, away_form_gd = [], [], [], []
 
-    def _recent_stats(team: str):
-        hist = team_hist.get(team, [])
-        if not hist:
-            return 0.0, 0.0
-        recent = hist[-WINDOW:]
-        pts = sum(x["pts"] for x in recent) / len(recent)
-        gd = sum(x["gd"] for x in recent) / len(recent)
-        return pts, gd
-
-    def _ema_stats(team: str):
-        hist = team_hist.get(team, [])
-        if not hist:
-            return 0.0, 0.0
-        pts_ema = 0.0
-        gd_ema = 0.0
-        # Iterate from oldest to newest
-        for x in hist[-max(WINDOW * 3, WINDOW):]:
-            pts_ema = EMA_ALPHA * x["pts"] + (1 - EMA_ALPHA) * pts_ema
-            gd_ema = EMA_ALPHA * x["gd"] + (1 - EMA_ALPHA) * gd_ema
-        return pts_ema, gd_ema
-
-    print(f"   Processing {len(df)} matches...")
-
-    for _, row in df.iterrows():
-        h = clean_team(row["home_team"])
-        a = clean_team(row["away_team"])
+    print(f"   Processing {int((~done).sum())} matches...")
+
+    for row in df[~done].itertuples(index=False):
+        h, a = row.home_team, row.away_team
 
         if USE_EMA:
-            h_pts, h_gd = _ema_stats(h)
-            a_pts, a_gd = _ema_stats(a)
+            h_pts, h_gd = form.ema(h)
+            a_pts, a_gd = form.ema(a)
         else:
-            h_pts, h_gd = _recent_stats(h)
-            a_pts, a_gd = _recent_stats(a)
+            h_pts, h_gd = form.recent(h)
+            a_pts, a_gd = form.recent(a)
 
         home_form_pts.append(h_pts)
         home_form_gd.append(h_gd)
@@ -165,27 +169,13 @@ def main():
         away_form_gd.append(a_gd)
 
         # Update only if played (score exists)
-        if pd.notna(row.get("HomeScore")) and pd.notna(row.get("AwayScore")):
-            hs = float(row["HomeScore"])
-            as_ = float(row["AwayScore"])
+        if pd.notna(row.HomeScore) and pd.notna(row.AwayScore):
+            form.update(h, a, row.HomeScore, row.AwayScore, date=row.date)
 
-            if hs > as_:
-                hp, ap = 3, 0
-            elif hs == as_:
-                hp, ap = 1, 1
-            else:
-                hp, ap = 0, 3
-
-            h_gdiff = hs - as_
-            a_gdiff = as_ - hs
-
-            team_hist.setdefault(h, []).append({"pts": hp, "gd": h_gdiff})
-            team_hist.setdefault(a, []).append({"pts": ap, "gd": a_gdiff})
-
-    df["home_form_pts"] = home_form_pts
-    df["away_form_pts"] = away_form_pts
-    df["home_form_gd"] = home_form_gd
-    df["away_form_gd"] = away_form_gd
+    df.loc[~done, "home_form_pts"] = home_form_pts
+    df.loc[~done, "away_form_pts"] = away_form_pts
+    df.loc[~done, "home_form_gd"] = home_form_gd
+    df.loc[~done, "away_form_gd"] = away_form_gd
 
     df["diff_form_pts"] = df["home_form_pts"] - df["away_form_pts"]
     df["diff_form_gd"] = df["home_form_gd"] - df["away_form_gd"]
@@ -194,5 +184,10 @@ def main():
     df.to_csv(OUT_FILE, index=False)
     print(f"Saved rolling features to: {OUT_FILE}")
 
+    # Persist form so a --resume run only applies matches after it
+    form.results_hash = _results_hash(df)
+    form.save(FORM_STATE_FILE)
+    print(f"Saved form state to: {FORM_STATE_FILE}")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+
+class TeamForm:
+    """Rolling form for one team with O(1) update and lookup.
+
+    The last `window` (points, goal difference) results sit in a fixed-size
+    ring buffer alongside their running sums, so the rolling mean never
+    re-reads history. The EMA is a true running state seeded at 0.
+    """
+
+    def __init__(self, window: int, alpha: float):
+        self.window = int(window)
+        self.alpha = float(alpha)
+        self.pts = [0.0] * self.window
+        self.gd = [0.0] * self.window
+        self.head = 0  # slot the next result overwrites
+        self.count = 0
+        self.sum_pts = 0.0
+        self.sum_gd = 0.0
+        self.ema_pts = 0.0
+        self.ema_gd = 0.0
+
+    def push(self, pts: float, gd: float):
+        if self.count == self.window:
+            self.sum_pts -= self.pts[self.head]
+            self.sum_gd -= self.gd[self.head]
+        else:
+            self.count += 1
+        self.pts[self.head] = float(pts)
+        self.gd[self.head] = float(gd)
+        self.sum_pts += pts
+        self.sum_gd += gd
+        self.head = (self.head + 1) % self.window
+
+        self.ema_pts = self.alpha * pts + (1 - self.alpha) * self.ema_pts
+        self.ema_gd = self.alpha * gd + (1 - self.alpha) * self.ema_gd
+
+    def recent(self):
+        """(mean pts, mean gd) over the last `window` results; (0, 0) if none."""
+        if not self.count:
+            return 0.0, 0.0
+        return self.sum_pts / self.count, self.sum_gd / self.count
+
+    def ema(self):
+        return self.ema_pts, self.ema_gd
+
+    def to_dict(self) -> dict:
+        return {k: getattr(self, k) for k in (
+            "window", "alpha", "pts", "gd", "head", "count",
+            "sum_pts", "sum_gd", "ema_pts", "ema_gd",
+        )}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "TeamForm":
+        form = cls(d["window"], d["alpha"])
+        for k, v in d.items():
+            setattr(form, k, v)
+        return form
+
+
+class FormState:
+    """TeamForm per team, plus the kickoff of the last result absorbed.
+
+    `results_hash` is left to the caller: a digest of the results absorbed,
+    so a later run can tell whether they still match its data.
+    """
+
+    def __init__(self, window: int, alpha: float):
+        self.window = int(window)
+        self.alpha = float(alpha)
+        self.teams: dict[str, TeamForm] = {}
+        self.last_date = None  # ISO string
+        self.results_hash = None
+
+    def recent(self, team: str):
+        form = self.teams.get(team)
+        return form.recent() if form else (0.0, 0.0)
+
+    def ema(self, team: str):
+        form = self.teams.get(team)
+        return form.ema() if form else (0.0, 0.0)
+
+    def update(self, home: str, away: str, home_score: float, away_score: float, date=None):
+        hs, as_ = float(home_score), float(away_score)
+        if hs > as_:
+            hp, ap = 3, 0
+        elif hs == as_:
+            hp, ap = 1, 1
+        else:
+            hp, ap = 0, 3
+
+        for team, pts, gd in [(home, hp, hs - as_), (away, ap, as_ - hs)]:
+            if team not in self.teams:
+                self.teams[team] = TeamForm(self.window, self.alpha)
+            self.teams[team].push(pts, gd)
+        if date is not None:
+            self.last_date = str(date)
+
+    def save(self, path: Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({
+            "window": self.window,
+            "alpha": self.alpha,
+            "last_date": self.last_date,
+            "results_hash": self.results_hash,
+            "teams": {t: f.to_dict() for t, f in self.teams.items()},
+        }, indent=2), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path) -> "FormState":
+        d = json.loads(Path(path).read_text(encoding="utf-8"))
+        state = cls(d["window"], d["alpha"])
+        state.last_date = d.get("last_date")
+        state.results_hash = d.get("results_hash")
+        state.teams = {t: TeamForm.from_dict(f) for t, f in d["teams"].items()}
+        return state
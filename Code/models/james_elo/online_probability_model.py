@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from build_probability_model import RECOMMENDED_FEATURES
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from model_registry import register
+
+
+# --- PATH SETUP ---
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent.parent
+
+DATA_FILE = REPO_ROOT / "data" / "matches" / "derived" / "match_model_ready.csv"
+STATE_FILE = REPO_ROOT / "models" / "online_probability_state.json"
+PREQUENTIAL_FILE = REPO_ROOT / "data" / "matches" / "derived" / "online_prequential_predictions.csv"
+
+CLASSES = [0, 1, 2]  # 0=away, 1=draw, 2=home (same labels as build_probability_model)
+
+# SGD step size eta_t = LEARNING_RATE / sqrt(1 + t / DECAY_MATCHES), plus a
+# small L2 pull towards zero so early noisy steps fade
+LEARNING_RATE = 0.02
+DECAY_MATCHES = 100.0
+L2 = 1e-3
+
+REGISTRY_ALIAS = "logistic_online"
+
+
+class RunningScaler:
+    """StandardScaler whose mean/variance are updated one row at a time (Welford)."""
+
+    def __init__(self, n_features: int):
+        self.n = 0
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+
+    def update(self, x: np.ndarray):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    @property
+    def scale(self) -> np.ndarray:
+        if self.n == 0:
+            return np.ones_like(self.mean)
+        scale = np.sqrt(self.m2 / self.n)
+        scale[scale == 0.0] = 1.0  # same guard as StandardScaler
+        return scale
+
+    def transform(self, X) -> np.ndarray:
+        return (np.asarray(X, dtype=np.float64) - self.mean) / self.scale
+
+
+class OnlineLogistic:
+    """Multinomial logistic regression trained by per-match SGD on the log loss."""
+
+    def __init__(self, n_features: int, n_classes: int = len(CLASSES)):
+        self.coef = np.zeros((n_classes, n_features))
+        self.intercept = np.zeros(n_classes)
+        self.t = 0
+
+    def predict_proba(self, Z: np.ndarray) -> np.ndarray:
+        s = np.atleast_2d(Z) @ self.coef.T + self.intercept
+        s -= s.max(axis=1, keepdims=True)
+        e = np.exp(s)
+        return e / e.sum(axis=1, keepdims=True)
+
+    def partial_fit(self, z: np.ndarray, label: int):
+        eta = LEARNING_RATE / np.sqrt(1.0 + self.t / DECAY_MATCHES)
+        grad = self.predict_proba(z)[0]
+        grad[label] -= 1.0
+        self.coef -= eta * (np.outer(grad, z) + L2 * self.coef)
+        self.intercept -= eta * grad
+        self.t += 1
+
+
+class OnlineProbabilityModel:
+    """Running scaler + online logistic + which matches it has absorbed.
+
+    `learn` is prequential: a kickoff's matches are all scored with the
+    current state before any of their results is absorbed, so every
+    returned probability is out of sample. Absorbed match ids are kept, so
+    each run only pays for matches it has not seen, including results that
+    arrive after later matches were already learned.
+    """
+
+    def __init__(self, features):
+        self.features = list(features)
+        self.scaler = RunningScaler(len(self.features))
+        self.model = OnlineLogistic(len(self.features))
+        self.seen = set()
+        self.last_date = None
+        self.loss_sum = 0.0
+        self.n_scored = 0
+
+    def predict_proba(self, X) -> np.ndarray:
+        """(n, 3) probabilities in CLASSES order for raw feature rows."""
+        return self.model.predict_proba(self.scaler.transform(X))
+
+    def learn(self, X, labels) -> np.ndarray:
+        """Score rows that kick off together, then absorb their results."""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        labels = np.asarray(labels, dtype=np.int64)
+        probs = self.predict_proba(X)
+        self.loss_sum -= np.log(np.clip(probs[np.arange(len(labels)), labels], 1e-15, None)).sum()
+        self.n_scored += len(labels)
+
+        for x, label in zip(X, labels):
+            self.scaler.update(x)
+            self.model.partial_fit(self.scaler.transform(x), label)
+        return probs
+
+    def is_new(self, match_id: str) -> bool:
+        return match_id not in self.seen
+
+    @property
+    def log_loss(self) -> float:
+        return self.loss_sum / self.n_scored if self.n_scored else float("nan")
+
+    def to_arrays(self) -> dict:
+        """logistic_export layout, so the registry and NumPy scorers can serve it."""
+        return {
+            "mean": self.scaler.mean.copy(),
+            "scale": self.scaler.scale,
+            "coef": self.model.coef.copy(),
+            "intercept": self.model.intercept.copy(),
+            "classes": np.asarray(CLASSES),
+            "features": np.asarray(self.features, dtype=str),
+        }
+
+    def save(self, path: Path = STATE_FILE):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({
+            "features": self.features,
+            "scaler": {"n": self.scaler.n, "mean": self.scaler.mean.tolist(), "m2": self.scaler.m2.tolist()},
+            "model": {"coef": self.model.coef.tolist(), "intercept": self.model.intercept.tolist(), "t": self.model.t},
+            "seen": sorted(self.seen),
+            "last_date": self.last_date,
+            "loss_sum": self.loss_sum,
+            "n_scored": self.n_scored,
+        }, indent=2), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path = STATE_FILE) -> "OnlineProbabilityModel":
+        d = json.loads(Path(path).read_text(encoding="utf-8"))
+        state = cls(d["features"])
+        state.scaler.n = d["scaler"]["n"]
+        state.scaler.mean = np.array(d["scaler"]["mean"])
+        state.scaler.m2 = np.array(d["scaler"]["m2"])
+        state.model.coef = np.array(d["model"]["coef"])
+        state.model.intercept = np.array(d["model"]["intercept"])
+        state.model.t = d["model"]["t"]
+        state.seen = set(d["seen"])
+        state.last_date = d["last_date"]
+        state.loss_sum = d["loss_sum"]
+        state.n_scored = d["n_scored"]
+        return state
+
+
+def main():
+    print("--- UPDATING ONLINE PROBABILITY MODEL ---")
+
+    if not DATA_FILE.exists():
+        raise FileNotFoundError(f"Input file not found at: {DATA_FILE}")
+
+    df = pd.read_csv(DATA_FILE).dropna(subset=["label"])
+    df["date"] = pd.to_datetime(df["date"], errors="coerce", utc=True)
+    df = df.dropna(subset=["date"])
+    df["date_key"] = df["date"].dt.strftime("%Y-%m-%dT%H:%M:%S")
+    df = df.sort_values(["date_key", "match_id"]).reset_index(drop=True)
+
+    if STATE_FILE.exists():
+        state = OnlineProbabilityModel.load(STATE_FILE)
+        print(f"   Resuming with {len(state.seen)} matches absorbed (last kickoff {state.last_date})")
+    else:
+        state = OnlineProbabilityModel([c for c in RECOMMENDED_FEATURES if c in df.columns])
+        print(f"   New state, features: {state.features}")
+
+    df = df.dropna(subset=state.features)
+    new = df[[state.is_new(m) for m in df["match_id"]]]
+    if new.empty:
+        print("   No new finished matches.")
+        return
+
+    X = new[state.features].to_numpy(dtype=np.float64)
+    y = new["label"].astype(int).to_numpy()
+    kickoffs = new["date_key"].to_numpy()
+    starts = np.flatnonzero(np.r_[True, kickoffs[1:] != kickoffs[:-1]])
+    stops = np.r_[starts[1:], len(new)]
+    probs = np.vstack([state.learn(X[a:b], y[a:b]) for a, b in zip(starts, stops)])
+    state.seen.update(new["match_id"])
+    state.last_date = max(state.last_date or "", kickoffs[-1])
+
+    preq = pd.DataFrame({
+        "match_id": new["match_id"].to_numpy(),
+        "date": new["date"].to_numpy(),
+        "p_home": probs[:, 2],
+        "p_draw": probs[:, 1],
+        "p_away": probs[:, 0],
+        "label": y,
+    })
+    batch_loss = -np.mean(np.log(np.clip(probs[np.arange(len(y)), y], 1e-15, None)))
+    print(f"   Absorbed {len(new)} matches | prequential log loss {batch_loss:.4f} "
+          f"(all {state.n_scored}: {state.log_loss:.4f})")
+
+    # State first: a crash before the append can lose these rows but never
+    # makes the next run score (and append) the same matches twice
+    state.save(STATE_FILE)
+    PREQUENTIAL_FILE.parent.mkdir(parents=True, exist_ok=True)
+    preq.to_csv(PREQUENTIAL_FILE, mode="a", header=not PREQUENTIAL_FILE.exists(), index=False)
+    sha = register(
+        "logistic",
+        state.to_arrays(),
+        {"features": state.features, "classes": CLASSES, "cutoff_date": state.last_date,
+         "metrics": {"prequential_log_loss": state.log_loss, "n_seen": state.n_scored},
+         "source": Path(__file__).name},
+        alias=REGISTRY_ALIAS,
+    )
+    print(f"Saved state to: {STATE_FILE}")
+    print(f"Appended prequential predictions to: {PREQUENTIAL_FILE}")
+    print(f"Registered as {REGISTRY_ALIAS} -> {sha}")
+
+
+if __name__ == "__main__":
+    main()
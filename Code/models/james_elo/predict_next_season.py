@@ -3,8 +3,16 @@ import numpy as np
 import joblib
 from pathlib import Path
 import os
+import sys
 import json
 
+from rating_state import load_latest_state
+from rating_history import load_rating_snapshots
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from logistic_export import load_logistic
+from model_registry import resolve
+
 
 def find_repo_root(start: Path) -> Path:
     start = start.resolve()
@@ -17,35 +25,49 @@ def find_repo_root(start: Path) -> Path:
 REPO_ROOT = find_repo_root(Path(__file__).resolve())
 
 # Inputs
+DELTA_FILE = REPO_ROOT / "data" / "players" / "derived" / "player_rating_deltas.npz"
 ROLLING_FILE = REPO_ROOT / "data" / "players" / "derived" / "player_ratings_rolling.csv"
 LINEUPS_FILE = REPO_ROOT / "data" / "lineups" / "assumed_lineup.csv"
 MODEL_DIR = REPO_ROOT / "models"
 
 # Output
 OUT_FILE = REPO_ROOT / "data" / "matches" / "derived" / "2026_season_predictions.csv"
-
-
-def get_latest_rosters():
-    """Determines who is on which team based on late-2025 data."""
-    print("   Building 2026 rosters from 2025 data...")
-
-    if not ROLLING_FILE.exists():
+GRID_FILE = REPO_ROOT / "data" / "matches" / "derived" / "2026_season_prediction_grid.csv"
+
+# Team strength: the best STARTERS ratings plus BENCH_WEIGHT of the next BENCH
+STARTERS, BENCH, BENCH_WEIGHT = 11, 3, 0.3
+# A per-player Elo shift moves team strength (and so diff_total) by this much
+STRENGTH_PER_ELO = STARTERS + BENCH * BENCH_WEIGHT
+
+# Scenario axes for the matchup grid. HFA is given in per-player Elo points
+# and added to diff_total scaled to team-strength units; form scenarios set
+# the form diffs. The first entry of each is the baseline written to OUT_FILE.
+HFA_ELO_SCENARIOS = [0.0, -50.0, 50.0]
+FORM_SCENARIOS = {
+    "neutral": {"diff_form_pts": 0.0, "diff_form_gd": 0.0},
+    "home_hot": {"diff_form_pts": 1.0, "diff_form_gd": 1.0},
+    "away_hot": {"diff_form_pts": -1.0, "diff_form_gd": -1.0},
+}
+
+
+def _latest_ratings_from_history():
+    """Fallback when no checkpoint exists: rescan the rolling rating history."""
+    ratings = load_rating_snapshots(DELTA_FILE, ROLLING_FILE)
+    if ratings is None:
         print("Missing rolling ratings file.")
-        print(f"Looked for: {ROLLING_FILE}")
+        print(f"Looked for: {DELTA_FILE}")
         return None
 
-    ratings = pd.read_csv(ROLLING_FILE)
-    ratings["date"] = pd.to_datetime(ratings["date"], errors="coerce", utc=True)
     ratings = ratings.dropna(subset=["date"])
 
     # Required columns in ratings
     required = {"playerId", "team", "Rating"}
     missing = required - set(ratings.columns)
     if missing:
-        raise ValueError(f"player_ratings_rolling.csv missing columns: {sorted(missing)}")
+        raise ValueError(f"rolling ratings missing columns: {sorted(missing)}")
 
     # Latest row per player = last known team + last rating
-    latest_ratings = (
+    return (
         ratings.sort_values("date")
                .groupby("playerId", as_index=False)
                .tail(1)
@@ -53,6 +75,25 @@ def get_latest_rosters():
                .rename(columns={"team": "team_latest"})
     )
 
+
+def get_latest_rosters():
+    """Determines who is on which team based on late-2025 data."""
+    print("   Building 2026 rosters from 2025 data...")
+
+    # Prefer the latest Elo checkpoint: it already holds one row per player
+    state = load_latest_state()
+    if state is not None:
+        print(f"   Using rating checkpoint through {state.last_match_id}")
+        latest_ratings = (
+            state.to_frame()
+                 .dropna(subset=["date"])
+                 .rename(columns={"team": "team_latest"})
+        )
+    else:
+        latest_ratings = _latest_ratings_from_history()
+        if latest_ratings is None:
+            return None
+
     # Optional: enrich with playerName from lineups if available
     if LINEUPS_FILE.exists():
         lineups = pd.read_csv(LINEUPS_FILE)
@@ -83,10 +124,10 @@ def calculate_team_strength(roster_df):
     print("-" * 55)
 
     for team, group in roster_df.groupby("team"):
-        top_players = group.sort_values("Rating", ascending=False).head(14)
+        top_players = group.sort_values("Rating", ascending=False).head(STARTERS + BENCH)
 
-        starters = top_players.iloc[:11]["Rating"].sum()
-        subs = top_players.iloc[11:]["Rating"].sum() * 0.3
+        starters = top_players.iloc[:STARTERS]["Rating"].sum()
+        subs = top_players.iloc[STARTERS:]["Rating"].sum() * BENCH_WEIGHT
         total_strength = starters + subs
 
         team_strengths[team] = float(total_strength)
@@ -98,69 +139,115 @@ def calculate_team_strength(roster_df):
     return team_strengths
 
 
+def predict_matchup_grid(team_strengths, model, scaler, feat_order,
+                         hfa_elo_scenarios=(0.0,), form_scenarios=None):
+    """Score every (home, away) pair under every scenario in one pass.
+
+    The feature tensor has shape (n_hfa, n_form, N*(N-1), k); it is flattened
+    for a single scaler.transform + predict_proba call. Returns a tidy frame
+    with one row per (hfa, form, home, away). HFA scenarios are per-player
+    Elo; the grid carries both that (HFA_Elo) and the diff_total offset it
+    becomes (HFA_Strength).
+    """
+    if form_scenarios is None:
+        form_scenarios = {"neutral": {"diff_form_pts": 0.0, "diff_form_gd": 0.0}}
+
+    teams = np.array(list(team_strengths.keys()))
+    strength = np.array([team_strengths[t] for t in teams], dtype=float)
+    home_idx, away_idx = np.nonzero(~np.eye(len(teams), dtype=bool))
+
+    hfa_elo = np.asarray(hfa_elo_scenarios, dtype=float)
+    hfa = hfa_elo * STRENGTH_PER_ELO
+    form_names = list(form_scenarios)
+    n_h, n_f, n_p, k = len(hfa), len(form_names), len(home_idx), len(feat_order)
+
+    X = np.zeros((n_h, n_f, n_p, k), dtype=float)
+    for j, f in enumerate(feat_order):
+        if f == "diff_total":
+            X[..., j] = (strength[home_idx] - strength[away_idx])[None, None, :] + hfa[:, None, None]
+        else:
+            vals = np.array([form_scenarios[name].get(f, 0.0) for name in form_names], dtype=float)
+            X[..., j] = vals[None, :, None]
+
+    probs = model.predict_proba(scaler.transform(X.reshape(-1, k)))
+    col = {c: i for i, c in enumerate(model.classes_)}
+    zeros = np.zeros(len(probs))
+
+    # Your labels are [0, 1, 2] where 2=Home win, 1=Draw, 0=Away win
+    p_home = probs[:, col[2]] if 2 in col else zeros
+    p_draw = probs[:, col[1]] if 1 in col else zeros
+    p_away = probs[:, col[0]] if 0 in col else zeros
+
+    eps = 1e-9
+    return pd.DataFrame({
+        "HFA_Elo": np.repeat(hfa_elo, n_f * n_p),
+        "HFA_Strength": np.repeat(hfa, n_f * n_p),
+        "Form_Scenario": np.tile(np.repeat(form_names, n_p), n_h),
+        "Home": np.tile(teams[home_idx], n_h * n_f),
+        "Away": np.tile(teams[away_idx], n_h * n_f),
+        "Prob_Home": p_home,
+        "Prob_Draw": p_draw,
+        "Prob_Away": p_away,
+        "Odds_Home": 1.0 / np.maximum(eps, p_home),
+        "Odds_Draw": 1.0 / np.maximum(eps, p_draw),
+        "Odds_Away": 1.0 / np.maximum(eps, p_away),
+    })
+
+
 def predict_opening_matchups(team_strengths):
     """Uses your trained probability model to produce H/D/A probabilities for hypothetical matchups."""
+    export_path = MODEL_DIR / "logistic_model.npz"
     model_path = MODEL_DIR / "logistic_model.pkl"
     scaler_path = MODEL_DIR / "scaler.pkl"
     meta_path = MODEL_DIR / "probability_model_meta.json"
 
-    if not model_path.exists() or not scaler_path.exists():
-        print("\nModel files not found. Run build_probability_model.py first.")
-        return
-    if not meta_path.exists():
-        print("\nMissing probability_model_meta.json. Re-run build_probability_model.py.")
-        return
-
-    model = joblib.load(model_path)
-    scaler = joblib.load(scaler_path)
-
-    meta = json.loads(meta_path.read_text(encoding="utf-8"))
-    feat_order = meta.get("features", [])
+    # Prefer the registry's "logistic" alias, then the NumPy export: neither imports sklearn
+    try:
+        registered = resolve("logistic")
+        print(f"\n   Using registered logistic model {registered.sha}")
+        exported = registered.scorer()
+    except KeyError:
+        exported = load_logistic(export_path) if export_path.exists() else None
+
+    if exported is not None:
+        model, scaler, feat_order = exported.model, exported.scaler, exported.features
+    else:
+        if not model_path.exists() or not scaler_path.exists():
+            print("\nModel files not found. Run build_probability_model.py first.")
+            return
+        if not meta_path.exists():
+            print("\nMissing probability_model_meta.json. Re-run build_probability_model.py.")
+            return
+
+        model = joblib.load(model_path)
+        scaler = joblib.load(scaler_path)
+
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        feat_order = meta.get("features", [])
     if not feat_order:
         raise ValueError("Meta file has no 'features' list; cannot construct feature vectors.")
 
+    # We don't have 2026 form yet: the baseline scenario uses neutral (0) form diffs
+    grid = predict_matchup_grid(team_strengths, model, scaler, feat_order,
+                                HFA_ELO_SCENARIOS, FORM_SCENARIOS)
+    base = grid[(grid["HFA_Elo"] == HFA_ELO_SCENARIOS[0])
+                & (grid["Form_Scenario"] == next(iter(FORM_SCENARIOS)))]
+
     print("\n--- 2026 OPENING MATCHUP PROJECTIONS ---")
     print(f"{'Home':<15} vs {'Away':<15} | {'Home Win':<8} | {'Draw':<8} | {'Away Win':<8} | {'Fair Odds (H/D/A)'}")
     print("-" * 95)
-
-    teams = list(team_strengths.keys())
-    eps = 1e-9
-
-    # We don't have 2026 form yet. Use neutral defaults (0) for form diffs.
-    # If later you simulate early-season form, this is where you'd plug it in.
-    for home in teams:
-        for away in teams:
-            if home == away:
-                continue
-
-            feature_map = {
-                "diff_total": team_strengths[home] - team_strengths[away],
-                "diff_form_pts": 0.0,
-                "diff_form_gd": 0.0,
-            }
-
-            # Build vector in trained feature order
-            x = np.array([[feature_map.get(f, 0.0) for f in feat_order]], dtype=float)
-
-            features_scaled = scaler.transform(x)
-            probs = model.predict_proba(features_scaled)[0]
-            class_to_prob = dict(zip(model.classes_, probs))
-
-            # Your labels are [0, 1, 2] where 2=Home win, 1=Draw, 0=Away win
-            p_away = float(class_to_prob.get(0, 0.0))
-            p_draw = float(class_to_prob.get(1, 0.0))
-            p_home = float(class_to_prob.get(2, 0.0))
-
-            odds_h = 1.0 / max(eps, p_home)
-            odds_d = 1.0 / max(eps, p_draw)
-            odds_a = 1.0 / max(eps, p_away)
-
-            print(
-                f"{home:<15} vs {away:<15} | "
-                f"{p_home:>7.1%} | {p_draw:>7.1%} | {p_away:>7.1%} | "
-                f"{odds_h:>5.2f}/{odds_d:>5.2f}/{odds_a:>5.2f}"
-            )
-
+    for r in base.itertuples(index=False):
+        print(
+            f"{r.Home:<15} vs {r.Away:<15} | "
+            f"{r.Prob_Home:>7.1%} | {r.Prob_Draw:>7.1%} | {r.Prob_Away:>7.1%} | "
+            f"{r.Odds_Home:>5.2f}/{r.Odds_Draw:>5.2f}/{r.Odds_Away:>5.2f}"
+        )
+
+    OUT_FILE.parent.mkdir(parents=True, exist_ok=True)
+    base.drop(columns=["HFA_Elo", "HFA_Strength", "Form_Scenario"]).to_csv(OUT_FILE, index=False)
+    grid.to_csv(GRID_FILE, index=False)
+    print(f"\nSaved opening projections to: {OUT_FILE}")
+    print(f"Saved {len(grid)} scenario rows ({len(HFA_ELO_SCENARIOS)} HFA x {len(FORM_SCENARIOS)} form) to: {GRID_FILE}")
 
 
 def main():
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import re
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from rating_state import RatingState
+
+
+# Defaults mirror build_player_ratings_rolling's SETTINGS
+K_FACTOR = 20.0
+HOME_ADVANTAGE = 50.0
+USE_MARGIN_SCALING = True
+MARGIN_CAP = 3
+MARGIN_SCALE = 0.10
+
+# Attack/defense: expected goals = LEAGUE_GOALS * 10^((attack - defense +/- HFA/2) / GOAL_SCALE)
+LEAGUE_GOALS = 1.33  # goals per team per match, 2022-2025
+GOAL_SCALE = 400.0
+GOAL_K = 10.0  # rating points per goal above/below expectation
+
+
+def norm_key(s: str) -> str:
+    """Aggressive normalize for comparisons (lowercase, no spaces)."""
+    return re.sub(r"[^a-z0-9]+", "", str(s).lower())
+
+
+class EloRatingEngine:
+    """Player Elo as a stream consumer.
+
+    Feed finished matches in chronological order; each one is rated against
+    the current RatingState and the state is updated in place, so memory is
+    bounded by the number of players rather than the length of history.
+
+    A match is a dict with match_id, date (tz-aware Timestamp), season,
+    home_team, away_team (clean names), home_score, away_score and lineup:
+    a list of {"playerId", "team", "team_clean"} dicts.
+    """
+
+    def __init__(self, state: RatingState = None, k_factor: float = K_FACTOR,
+                 home_advantage: float = HOME_ADVANTAGE,
+                 use_margin_scaling: bool = USE_MARGIN_SCALING,
+                 margin_cap: float = MARGIN_CAP, margin_scale: float = MARGIN_SCALE,
+                 league_goals: float = LEAGUE_GOALS, goal_scale: float = GOAL_SCALE,
+                 goal_k: float = GOAL_K):
+        self.state = state if state is not None else RatingState()
+        self.k_factor = k_factor
+        self.home_advantage = home_advantage
+        self.use_margin_scaling = use_margin_scaling
+        self.margin_cap = margin_cap
+        self.margin_scale = margin_scale
+        self.league_goals = league_goals
+        self.goal_scale = goal_scale
+        self.goal_k = goal_k
+
+    def process(self, match: dict) -> dict:
+        """Rate one match and return its update event.
+
+        The event carries the pre-match team strengths (mean player Elo, home
+        side including HFA), the home expected score, the expected goals from
+        the attack/defense ratings, the rating change applied to each home/away
+        player (home_delta/away_delta), and per appearance (playerId, team,
+        state row, pre rating, pre attack, pre defense, side) with side +1
+        home, -1 away, 0 unassigned. `rated` is False when the lineup did not give
+        both sides a player, in which case no ratings move.
+        """
+        state = self.state
+        ts = match["date"].value
+        state.absorbed.add(match["match_id"])
+        if ts >= state.last_match_ts:
+            state.last_match_ts = ts
+            state.last_match_id = match["match_id"]
+
+        h_norm = norm_key(match["home_team"])
+        a_norm = norm_key(match["away_team"])
+
+        appearances = []
+        h_ratings, a_ratings = [], []
+        active_home, active_away = [], []
+
+        for p in match.get("lineup", []):
+            idx = state.index_of(p["playerId"])
+            team = p.get("team", "")
+            p_norm = norm_key(p.get("team_clean", team))
+            rating = float(state.ratings[idx])
+            attack = float(state.attack[idx])
+            defense = float(state.defense[idx])
+
+            state.last_team[idx] = team
+            state.last_seen[idx] = ts
+
+            # Strict assignment to home/away
+            if p_norm == h_norm:
+                side = 1
+                h_ratings.append(rating)
+                active_home.append(idx)
+            elif p_norm == a_norm:
+                side = -1
+                a_ratings.append(rating)
+                active_away.append(idx)
+            else:
+                # unknown team mapping -> ignore this player for strength + updates
+                side = 0
+            appearances.append((p["playerId"], team, idx, rating, attack, defense, side))
+
+        event = {
+            "match_id": match["match_id"],
+            "date": match["date"],
+            "season": match.get("season"),
+            "appearances": appearances,
+            "rated": bool(h_ratings and a_ratings),
+            "home_elo": None,
+            "away_elo": None,
+            "expected_home": None,
+            "home_xg": None,
+            "away_xg": None,
+            "home_delta": 0.0,
+            "away_delta": 0.0,
+        }
+        if not event["rated"]:
+            return event
+
+        h_elo = float(np.mean(h_ratings) + self.home_advantage)
+        a_elo = float(np.mean(a_ratings))
+
+        # Elo expected score for home (win=1, draw=0.5, loss=0)
+        ea_h = 1.0 / (1.0 + 10.0 ** ((a_elo - h_elo) / 400.0))
+        ea_a = 1.0 - ea_h
+
+        # Actual score
+        hs = float(match["home_score"])
+        as_ = float(match["away_score"])
+
+        if hs > as_:
+            sa_h, sa_a = 1.0, 0.0
+        elif hs == as_:
+            sa_h, sa_a = 0.5, 0.5
+        else:
+            sa_h, sa_a = 0.0, 1.0
+
+        # Margin-of-victory scaling
+        k_eff = self.k_factor
+        if self.use_margin_scaling:
+            margin = min(abs(hs - as_), self.margin_cap)
+            k_eff = self.k_factor * (1.0 + (margin * self.margin_scale))
+
+        # Attack/defense: read before any update so both sides see pre-match values
+        h_att, h_def = state.attack[active_home].mean(), state.defense[active_home].mean()
+        a_att, a_def = state.attack[active_away].mean(), state.defense[active_away].mean()
+        half_hfa = self.home_advantage / 2.0
+        xg_h = self.league_goals * 10.0 ** ((h_att - a_def + half_hfa) / self.goal_scale)
+        xg_a = self.league_goals * 10.0 ** ((a_att - h_def - half_hfa) / self.goal_scale)
+
+        np.add.at(state.ratings, active_home, k_eff * (sa_h - ea_h))
+        np.add.at(state.ratings, active_away, k_eff * (sa_a - ea_a))
+
+        # Scoring more than expected lifts attack; the conceding side's defense drops
+        np.add.at(state.attack, active_home, self.goal_k * (hs - xg_h))
+        np.add.at(state.defense, active_away, -self.goal_k * (hs - xg_h))
+        np.add.at(state.attack, active_away, self.goal_k * (as_ - xg_a))
+        np.add.at(state.defense, active_home, -self.goal_k * (as_ - xg_a))
+
+        event.update(
+            home_elo=h_elo,
+            away_elo=a_elo,
+            expected_home=ea_h,
+            home_xg=float(xg_h),
+            away_xg=float(xg_a),
+            home_delta=k_eff * (sa_h - ea_h),
+            away_delta=k_eff * (sa_a - ea_a),
+        )
+        return event
+
+    def stream(self, matches: Iterable[dict]) -> Iterator[dict]:
+        """Yield one event per match, skipping matches the state already holds.
+
+        Matches are skipped by match_id (RatingState.absorbed), not by
+        kickoff, so a result added after a checkpoint is rated on the next
+        run even if it kicked off before the checkpoint. The next match is
+        only pulled from `matches` after the previous event has been
+        consumed, so a wrapper around the input sees a fully updated state at
+        every boundary (this is how checkpoints are taken).
+        """
+        for match in matches:
+            if match["match_id"] in self.state.absorbed:
+                continue
+            yield self.process(match)
+
+
+def stream_ratings(matches: Iterable[dict], state: RatingState = None, **params) -> Iterator[dict]:
+    """Convenience wrapper: EloRatingEngine(state, **params).stream(matches)."""
+    return EloRatingEngine(state, **params).stream(matches)
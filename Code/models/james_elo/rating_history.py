@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from rating_state import DEFAULT_RATING, MISSING_PLAYER_ID, RatingState, load_latest_state
+
+
+# --- PATH SETUP ---
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent.parent
+
+ROLLING_FILE = REPO_ROOT / "data" / "players" / "derived" / "player_ratings_rolling.csv"
+DELTA_FILE = REPO_ROOT / "data" / "players" / "derived" / "player_rating_deltas.npz"
+
+# Query keys pack (player row, unix seconds) into one int64 so a single
+# searchsorted over the whole history answers a batch of lookups.
+_KEY_SHIFT = np.int64(1) << np.int64(32)
+
+
+def _to_unix_seconds(when) -> np.ndarray:
+    ts = pd.to_datetime(pd.Series(np.atleast_1d(when)), utc=True)
+    return (ts.astype("int64") // 10**9).to_numpy(dtype=np.int64)
+
+
+class RatingHistory:
+    """Point-in-time player ratings.
+
+    Appearances are stored player-major and time-sorted in flat arrays, with
+    `offsets[i]:offsets[i + 1]` slicing player i's timeline. `post[k]` is the
+    rating after appearance k, so the rating "as of" a kickoff is the post
+    rating of the player's last appearance strictly before it.
+    """
+
+    def __init__(self, player_ids, times, post, default: float = DEFAULT_RATING):
+        """player_ids/times (unix seconds)/post are parallel per-appearance arrays."""
+        player_ids = np.asarray(player_ids, dtype=str)
+        times = np.asarray(times, dtype=np.int64)
+        post = np.asarray(post, dtype=np.float64)
+
+        codes, uniques = pd.factorize(player_ids, sort=True)
+        order = np.lexsort((times, codes))
+
+        self.player_ids = pd.Index(uniques)
+        self.codes = codes[order].astype(np.int64)
+        self.times = times[order]
+        self.post = post[order]
+        self.offsets = np.searchsorted(self.codes, np.arange(len(uniques) + 1))
+        self.keys = self.codes * _KEY_SHIFT + self.times
+        self.default = float(default)
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def player_timeline(self, player_id):
+        """(times, post ratings) views for one player; empty if unknown."""
+        i = self.player_ids.get_indexer([str(player_id)])[0]
+        if i < 0:
+            return self.times[:0], self.post[:0]
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        return self.times[lo:hi], self.post[lo:hi]
+
+    def rating_as_of(self, player_id, when) -> float:
+        """Rating player_id would carry into a match kicking off at `when`."""
+        times, post = self.player_timeline(player_id)
+        k = np.searchsorted(times, _to_unix_seconds(when)[0], side="left")
+        return float(post[k - 1]) if k > 0 else self.default
+
+    def ratings_as_of(self, player_ids, whens) -> np.ndarray:
+        """Vectorized rating_as_of over parallel arrays of players and dates.
+
+        `whens` may also be a single date applied to every player.
+        """
+        player_ids = np.asarray(player_ids, dtype=str)
+        secs = _to_unix_seconds(whens)
+        if len(secs) == 1 and len(player_ids) != 1:
+            secs = np.repeat(secs, len(player_ids))
+
+        rows = self.player_ids.get_indexer(player_ids).astype(np.int64)
+        known = rows >= 0
+
+        out = np.full(len(player_ids), self.default, dtype=np.float64)
+        k = np.searchsorted(self.keys, rows[known] * _KEY_SHIFT + secs[known], side="left") - 1
+
+        # k must still sit inside the same player's block to count as a hit
+        hit = k >= self.offsets[rows[known]]
+        vals = np.full(len(k), self.default)
+        vals[hit] = self.post[k[hit]]
+        out[known] = vals
+        return out
+
+    def lineup_strength(self, player_ids, when, weights=None) -> float:
+        """Weighted rating sum of a (possibly hypothetical) lineup at `when`."""
+        r = self.ratings_as_of(player_ids, when)
+        w = np.ones_like(r) if weights is None else np.asarray(weights, dtype=np.float64)
+        return float((r * w).sum())
+
+    @classmethod
+    def from_rolling_csv(cls, path: Path = ROLLING_FILE, state: RatingState = None) -> "RatingHistory":
+        """Build from player_ratings_rolling.csv (pre-match snapshots).
+
+        The post rating of an appearance is the pre rating of the player's
+        next one; for the final appearance it comes from `state` (default:
+        the latest checkpoint), falling back to the pre rating.
+        """
+        df = pd.read_csv(path, usecols=["playerId", "date", "Rating"])
+        df = df.dropna(subset=["playerId", "date"])
+        df["playerId"] = df["playerId"].astype(str)
+        df["t"] = _to_unix_seconds(df["date"])
+        df = df.sort_values(["playerId", "t"], kind="stable")
+
+        post = df.groupby("playerId", sort=False)["Rating"].shift(-1)
+        last = post.isna()
+
+        if state is None:
+            state = load_latest_state()
+        if state is not None:
+            current = pd.Series(state.ratings[:len(state)], index=state.player_ids)
+            post[last] = df.loc[last, "playerId"].map(current)
+        post = post.fillna(df["Rating"])
+
+        return cls(df["playerId"].to_numpy(), df["t"].to_numpy(), post.to_numpy())
+
+    @classmethod
+    def from_delta_file(cls, path: Path = None) -> "RatingHistory":
+        return DeltaHistory(path or DELTA_FILE).rating_history()
+
+
+def save_delta_history(path, player_ids, match_ids, match_ts, team_names,
+                       match_idx, player_idx, team_idx, delta,
+                       delta_attack=None, delta_defense=None, repeat=None):
+    """Write the delta-encoded history.
+
+    One row per lineup appearance holding integer keys into the
+    match/player/team tables and the rating changes from that match (overall,
+    attack, defense). The rating before any appearance is DEFAULT_RATING plus
+    the player's earlier deltas, so nothing but the deltas needs storing.
+    A player listed twice in one match gets a `repeat` row with zero deltas,
+    so the rows line up one-to-one with player_ratings_rolling.csv.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    zeros = np.zeros(len(delta))
+    np.savez_compressed(
+        path,
+        player_ids=np.asarray(player_ids, dtype=str),
+        match_ids=np.asarray(match_ids, dtype=str),
+        match_ts=np.asarray(match_ts, dtype=np.int64),
+        team_names=np.asarray(team_names, dtype=str),
+        match_idx=np.asarray(match_idx, dtype=np.int32),
+        player_idx=np.asarray(player_idx, dtype=np.int32),
+        team_idx=np.asarray(team_idx, dtype=np.int16),
+        delta=np.asarray(delta, dtype=np.float64),
+        delta_attack=np.asarray(zeros if delta_attack is None else delta_attack, dtype=np.float64),
+        delta_defense=np.asarray(zeros if delta_defense is None else delta_defense, dtype=np.float64),
+        repeat=np.asarray(np.zeros(len(delta), dtype=bool) if repeat is None else repeat, dtype=bool),
+    )
+
+
+class DeltaHistory:
+    """Reader for save_delta_history output.
+
+    Columns are decompressed on first access and ratings are only
+    reconstructed (one grouped cumsum per rating) when something asks for them.
+    """
+
+    def __init__(self, path: Path = DELTA_FILE):
+        self.path = Path(path)
+        self._npz = np.load(self.path, allow_pickle=False)
+        self._cache = {}
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name not in self._cache:
+            if name not in self._npz.files and name in ("delta_attack", "delta_defense"):
+                # files written before the attack/defense split
+                self._cache[name] = np.zeros(len(self))
+            elif name not in self._npz.files and name == "repeat":
+                # files written before repeat appearances were kept
+                self._cache[name] = np.zeros(len(self), dtype=bool)
+            else:
+                self._cache[name] = self._npz[name]
+        return self._cache[name]
+
+    def __len__(self) -> int:
+        return len(self["delta"])
+
+    def _pre_post(self, column: str = "delta"):
+        """(pre, post) arrays for one of delta / delta_attack / delta_defense."""
+        key = ("pre_post", column)
+        if key not in self._cache:
+            player_idx = self["player_idx"]
+            delta = self[column]
+            if len(delta) == 0:
+                self._cache[key] = (delta.copy(), delta.copy())
+                return self._cache[key]
+            # rows are written chronologically, so a stable sort by player
+            # gives each player's appearances in match order
+            order = np.argsort(player_idx, kind="stable")
+            d = delta[order]
+            cs = np.cumsum(d)
+            starts = np.flatnonzero(np.r_[True, np.diff(player_idx[order]) != 0])
+            lengths = np.diff(np.r_[starts, len(order)])
+            base = np.repeat(cs[starts] - d[starts], lengths)
+            post_sorted = DEFAULT_RATING + (cs - base)
+            pre_sorted = post_sorted - d
+            # a repeat row directly follows its first appearance in the sorted
+            # order and carries that appearance's pre-match rating
+            src = np.where(self["repeat"][order], 0, np.arange(len(order)))
+            pre_sorted = pre_sorted[np.maximum.accumulate(src)]
+            pre, post = np.empty_like(delta), np.empty_like(delta)
+            pre[order], post[order] = pre_sorted, post_sorted
+            self._cache[key] = (pre, post)
+        return self._cache[key]
+
+    def to_frame(self) -> pd.DataFrame:
+        """Rows in the player_ratings_rolling.csv layout (pre-match ratings)."""
+        m = self["match_idx"]
+        # lineup rows without an id share MISSING_PLAYER_ID in the state; the CSV had them blank
+        player_ids = self["player_ids"].astype(object)
+        player_ids[player_ids == MISSING_PLAYER_ID] = np.nan
+        return pd.DataFrame({
+            "match_id": self["match_ids"][m],
+            "playerId": player_ids[self["player_idx"]],
+            "team": self["team_names"][self["team_idx"]],
+            "date": pd.to_datetime(self["match_ts"][m], unit="s", utc=True),
+            "Rating": self._pre_post("delta")[0],
+            "Attack": self._pre_post("delta_attack")[0],
+            "Defense": self._pre_post("delta_defense")[0],
+        })
+
+    def rating_history(self, column: str = "delta") -> RatingHistory:
+        """As-of index over the overall rating (or delta_attack / delta_defense)."""
+        _, post = self._pre_post(column)
+        first = ~self["repeat"]
+        return RatingHistory(
+            self["player_ids"][self["player_idx"][first]],
+            self["match_ts"][self["match_idx"][first]],
+            post[first],
+        )
+
+
+def load_rating_snapshots(delta_path: Path = DELTA_FILE, csv_path: Path = ROLLING_FILE):
+    """Pre-match ratings per appearance, in the player_ratings_rolling.csv layout.
+
+    Read from the delta history when it exists, else from an old snapshot CSV.
+    Returns None when neither is there.
+    """
+    if Path(delta_path).exists():
+        return DeltaHistory(delta_path).to_frame()
+    if Path(csv_path).exists():
+        ratings = pd.read_csv(csv_path)
+        ratings["date"] = pd.to_datetime(ratings["date"], errors="coerce", utc=True)
+        return ratings
+    return None
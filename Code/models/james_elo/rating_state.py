@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+
+# --- PATH SETUP ---
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent.parent
+
+CHECKPOINT_DIR = REPO_ROOT / "data" / "players" / "derived" / "elo_checkpoints"
+
+DEFAULT_RATING = 1500.0
+NO_TIMESTAMP = np.iinfo(np.int64).min
+
+# Lineup slots without a playerId all land on this row (str(NaN))
+MISSING_PLAYER_ID = "nan"
+
+
+class RatingState:
+    """Current Elo state for every player seen so far.
+
+    Ratings live in flat float arrays indexed by the same row: the overall
+    Elo (`ratings`) plus separate `attack` and `defense` ratings driven by
+    goals scored and conceded. `player_index` maps playerId -> row.
+    Each row also carries the player's last team and last match timestamp
+    (UTC nanoseconds). `absorbed` holds the match_id of every match the
+    engine has consumed, so a resumed build skips exactly those (a result
+    that turns up late is still rated); `last_match_ts` is the latest
+    kickoff among them.
+    """
+
+    def __init__(self, capacity: int = 256):
+        self.player_ids: list[str] = []
+        self.player_index: dict[str, int] = {}
+        self.ratings = np.full(capacity, DEFAULT_RATING, dtype=np.float64)
+        self.attack = np.full(capacity, DEFAULT_RATING, dtype=np.float64)
+        self.defense = np.full(capacity, DEFAULT_RATING, dtype=np.float64)
+        self.last_team = np.full(capacity, "", dtype=object)
+        self.last_seen = np.full(capacity, NO_TIMESTAMP, dtype=np.int64)
+        self.last_match_ts = NO_TIMESTAMP
+        self.last_match_id = ""
+        self.absorbed: set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self.player_ids)
+
+    def _grow(self, needed: int):
+        cap = len(self.ratings)
+        if needed <= cap:
+            return
+        new_cap = max(needed, cap * 2)
+        pad = new_cap - cap
+        self.ratings = np.concatenate([self.ratings, np.full(pad, DEFAULT_RATING)])
+        self.attack = np.concatenate([self.attack, np.full(pad, DEFAULT_RATING)])
+        self.defense = np.concatenate([self.defense, np.full(pad, DEFAULT_RATING)])
+        self.last_team = np.concatenate([self.last_team, np.full(pad, "", dtype=object)])
+        self.last_seen = np.concatenate([self.last_seen, np.full(pad, NO_TIMESTAMP, dtype=np.int64)])
+
+    def index_of(self, player_id) -> int:
+        """Row for player_id, registering the player at DEFAULT_RATING if new."""
+        pid = str(player_id)
+        idx = self.player_index.get(pid)
+        if idx is None:
+            idx = len(self.player_ids)
+            self._grow(idx + 1)
+            self.player_ids.append(pid)
+            self.player_index[pid] = idx
+        return idx
+
+    def rating(self, player_id) -> float:
+        idx = self.player_index.get(str(player_id))
+        return DEFAULT_RATING if idx is None else float(self.ratings[idx])
+
+    def to_frame(self) -> pd.DataFrame:
+        """One row per player: playerId, team, Rating, Attack, Defense, date (last appearance).
+
+        The MISSING_PLAYER_ID row pools every unnamed lineup slot, so it is
+        not a player and is left out (as the CSV fallback drops NaN ids).
+        """
+        n = len(self)
+        # NO_TIMESTAMP is int64 min, which numpy reads back as NaT
+        dates = pd.to_datetime(self.last_seen[:n].astype("datetime64[ns]"), utc=True)
+        frame = pd.DataFrame({
+            "playerId": self.player_ids,
+            "team": self.last_team[:n].astype(str),
+            "Rating": self.ratings[:n],
+            "Attack": self.attack[:n],
+            "Defense": self.defense[:n],
+            "date": dates,
+        })
+        return frame[frame["playerId"] != MISSING_PLAYER_ID].reset_index(drop=True)
+
+    def save(self, path: Path):
+        n = len(self)
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(
+            path,
+            player_ids=np.array(self.player_ids, dtype=str),
+            ratings=self.ratings[:n],
+            attack=self.attack[:n],
+            defense=self.defense[:n],
+            last_team=self.last_team[:n].astype(str),
+            last_seen=self.last_seen[:n],
+            last_match_ts=np.int64(self.last_match_ts),
+            last_match_id=np.array(self.last_match_id, dtype=str),
+            absorbed_ids=np.array(sorted(self.absorbed), dtype=str),
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "RatingState":
+        with np.load(path, allow_pickle=False) as data:
+            ids = data["player_ids"].tolist()
+            state = cls(capacity=max(256, len(ids)))
+            n = len(ids)
+            state.player_ids = ids
+            state.player_index = {pid: i for i, pid in enumerate(ids)}
+            state.ratings[:n] = data["ratings"]
+            # checkpoints written before the attack/defense split start them at default
+            if "attack" in data.files:
+                state.attack[:n] = data["attack"]
+                state.defense[:n] = data["defense"]
+            state.last_team[:n] = data["last_team"].astype(object)
+            state.last_seen[:n] = data["last_seen"]
+            state.last_match_ts = int(data["last_match_ts"])
+            state.last_match_id = str(data["last_match_id"])
+            state.absorbed = set(data["absorbed_ids"].tolist())
+        return state
+
+
+def matchday_checkpoint_path(day: str, checkpoint_dir: Path = CHECKPOINT_DIR) -> Path:
+    """day is 'YYYY-MM-DD'; names sort chronologically."""
+    return Path(checkpoint_dir) / f"matchday_{day}.npz"
+
+
+def season_checkpoint_path(season, checkpoint_dir: Path = CHECKPOINT_DIR) -> Path:
+    return Path(checkpoint_dir) / f"season_{season}.npz"
+
+
+def latest_checkpoint(checkpoint_dir: Path = CHECKPOINT_DIR, through_day: str = None):
+    """Path of the most recent matchday checkpoint (optionally on or before
+    'YYYY-MM-DD' through_day), or None if there are none."""
+    files = sorted(Path(checkpoint_dir).glob("matchday_*.npz"))
+    if through_day is not None:
+        files = [f for f in files if f.stem[len("matchday_"):] <= through_day]
+    return files[-1] if files else None
+
+
+def load_latest_state(checkpoint_dir: Path = CHECKPOINT_DIR, through_day: str = None):
+    path = latest_checkpoint(checkpoint_dir, through_day)
+    return RatingState.load(path) if path is not None else None
@@ -2,26 +2,38 @@ import pandas as pd
 import joblib
 from pathlib import Path
 import os
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from tree_export import load_booster
+from model_registry import load_model
 
 cwd = Path(os.getcwd())
 REPO_ROOT = cwd if cwd.name == "canpl-bet" else Path(__file__).resolve().parent.parent.parent
 
 DATA_FILE = REPO_ROOT / "data" / "matches" / "derived" / "match_model_ready.csv"
 MODEL_FILE = REPO_ROOT / "models" / "xgboost_model.pkl"
+EXPORT_FILE = REPO_ROOT / "models" / "xgboost_model.npz"
 OUT_FILE = REPO_ROOT / "data" / "matches" / "derived" / "james_ml_predictions.csv"
 
 def main():
-    if not MODEL_FILE.exists():
+    # Registry alias first, then the flattened export: neither needs xgboost
+    trees = load_model("xgboost")
+    if trees is None and EXPORT_FILE.exists():
+        trees = load_booster(EXPORT_FILE)
+    if trees is None and not MODEL_FILE.exists():
         print("Train the model first")
         return
 
     df = pd.read_csv(DATA_FILE)
-    model = joblib.load(MODEL_FILE)
-    
     features = ['diff_total', 'diff_form_pts', 'diff_form_gd']
-    
+
     # Predict
-    probs = model.predict_proba(df[features])
+    if trees is not None:
+        probs = trees.predict_proba(df[trees.features].to_numpy())
+    else:
+        model = joblib.load(MODEL_FILE)
+        probs = model.predict_proba(df[features])
     
     # Format Output
     output = df[['match_id']].copy()
@@ -4,6 +4,14 @@ import xgboost as xgb
 import joblib
 from pathlib import Path
 import os
+import sys
+import json
+import time
+from sklearn.metrics import log_loss
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from tree_export import booster_arrays, export_booster
+from model_registry import content_hash, data_fingerprint, register
 
 # --- PATH SETUP ---
 cwd = Path(os.getcwd())
@@ -12,9 +20,117 @@ REPO_ROOT = cwd if cwd.name == "canpl-bet" else Path(__file__).resolve().parent.
 DATA_FILE = REPO_ROOT / "data" / "matches" / "derived" / "match_model_ready.csv"
 MODEL_DIR = REPO_ROOT / "models"
 MODEL_DIR.mkdir(exist_ok=True)
+MODEL_FILE = MODEL_DIR / "xgboost_model.pkl"
+META_FILE = MODEL_DIR / "xgboost_model_meta.json"
+
+# --incremental: continue the production booster on newly added matches
+# instead of refitting on all history, unless the drift check fails
+INCREMENTAL = "--incremental" in sys.argv
+CONTINUE_ROUNDS = 10          # trees added per incremental update
+MAX_CONTINUED_ROUNDS = 100    # refit once this many trees were added since the last refit
+DRIFT_MIN_MATCHES = 8         # fewer matches since the last refit are too noisy to judge drift
+DRIFT_TOLERANCE = 0.05        # refit if their log loss exceeds the reference by more
+REFERENCE_HOLDOUT = 0.2       # most recent share of history scored out of sample for the reference
+
+FEATURES = ['diff_total', 'diff_form_pts', 'diff_form_gd']
+TARGET = 'label'
+
+# The "Winner" Settings
+# These are the values your tuning script found.
+# We hardcode them here so this script is always "Production Ready".
+FINAL_PARAMS = {
+    'max_depth': 2,               # Kept it simple (Best found)
+    'learning_rate': 0.01,        # Slow and steady learning
+    'n_estimators': 100,          # Number of trees
+    'subsample': 1.0,             # Use all rows
+    'colsample_bytree': 0.8,      # Use 80% of features per tree
+    'gamma': 5,                   # Conservative splitting
+    'objective': 'multi:softprob',
+    'num_class': 3,
+    'eval_metric': 'mlogloss',
+    'random_state': 42
+}
+
+
+def _load_meta():
+    if not META_FILE.exists() or not MODEL_FILE.exists():
+        return None
+    return json.loads(META_FILE.read_text(encoding="utf-8"))
+
+
+def _history_fingerprint(train_df):
+    # Row order among same-kickoff matches is not stable across sorts
+    cols = ['date', TARGET] + FEATURES
+    return data_fingerprint(train_df[cols].sort_values(cols).reset_index(drop=True))
+
+
+def _reference_log_loss(train_df):
+    """Out-of-sample log loss of FINAL_PARAMS: fit on the oldest rows, score the newest.
+
+    New matches are always scored before the booster has seen them, so the
+    drift check compares against a held-out number, not the training loss.
+    """
+    split = int(len(train_df) * (1 - REFERENCE_HOLDOUT))
+    fit_df, hold_df = train_df.iloc[:split], train_df.iloc[split:]
+    model = xgb.XGBClassifier(**FINAL_PARAMS)
+    model.fit(fit_df[FEATURES], fit_df[TARGET])
+    return float(log_loss(hold_df[TARGET], model.predict_proba(hold_df[FEATURES]), labels=[0, 1, 2]))
+
+
+def _incremental_update(train_df, meta):
+    """Continue the saved booster on matches after meta['seen_through'].
+
+    Returns (model, mode, new_df, new_log_loss); model is None when there is
+    nothing new. mode is "refit" instead of "continue" when the saved booster
+    is not the one the meta describes, the already-seen history changed, the
+    matches scored since the last refit drift from the reference log loss,
+    or too many trees were stacked on the last refit.
+    """
+    # train_xgboost.py writes the same pickle; its booster has other params
+    # and another history, so nothing in the meta applies to it
+    model = joblib.load(MODEL_FILE)
+    if content_hash("xgboost", booster_arrays(model)) != meta.get('sha'):
+        print("   Saved booster is not the one recorded in the meta -> full refit")
+        return None, "refit", train_df, None
+
+    seen_through = pd.Timestamp(meta['seen_through'])
+    seen_df = train_df[train_df['date'] <= seen_through]
+    new_df = train_df[train_df['date'] > seen_through]
+    if new_df.empty:
+        return None, None, new_df, None
+
+    new_loss = float(log_loss(new_df[TARGET], model.predict_proba(new_df[FEATURES]), labels=[0, 1, 2]))
+    print(f"   {len(new_df)} new matches since {seen_through.date()} | log loss {new_loss:.4f} "
+          f"(reference {meta['reference_log_loss']:.4f})")
+
+    if _history_fingerprint(seen_df) != meta['data_fingerprint']:
+        print("   Already-seen history changed upstream -> full refit")
+        return None, "refit", new_df, new_loss
+
+    # Matchdays are smaller than DRIFT_MIN_MATCHES, so judge every match
+    # scored out of sample since the last refit, not just this run's
+    scored = [w for w in meta['windows'] if w['mode'] == "continue"]
+    n_scored = sum(w['new_matches'] for w in scored) + len(new_df)
+    loss_sum = sum(w['new_log_loss'] * w['new_matches'] for w in scored) + new_loss * len(new_df)
+    if n_scored >= DRIFT_MIN_MATCHES and loss_sum / n_scored > meta['reference_log_loss'] + DRIFT_TOLERANCE:
+        print(f"   Drift check failed: {n_scored} matches since the last refit at "
+              f"{loss_sum / n_scored:.4f} (> +{DRIFT_TOLERANCE}) -> full refit")
+        return None, "refit", new_df, new_loss
+    if meta['rounds_since_refit'] + CONTINUE_ROUNDS > MAX_CONTINUED_ROUNDS:
+        print(f"   {meta['rounds_since_refit']} trees added since the last refit -> full refit")
+        return None, "refit", new_df, new_loss
+
+    # Boost a few more rounds over the full (appended) history
+    print(f"   Continuing booster: +{CONTINUE_ROUNDS} rounds")
+    continued = xgb.XGBClassifier(**{**FINAL_PARAMS, 'n_estimators': CONTINUE_ROUNDS})
+    continued.fit(train_df[FEATURES], train_df[TARGET], xgb_model=model.get_booster())
+    return continued, "continue", new_df, new_loss
+
+
 
 def main():
     print("--- TRAINING FINAL PRODUCTION MODEL ---")
+    t0 = time.perf_counter()
     
     if not DATA_FILE.exists():
         print(f" Missing {DATA_FILE}")
@@ -25,8 +141,8 @@ def main():
     df['date'] = pd.to_datetime(df['date'])
     df = df.sort_values('date').reset_index(drop=True)
     
-    features = ['diff_total', 'diff_form_pts', 'diff_form_gd']
-    target = 'label'
+    features = FEATURES
+    target = TARGET
     
     # Filter out future placeholder games (rows with no result yet)
     train_df = df.dropna(subset=[target])
@@ -34,35 +150,86 @@ def main():
     X = train_df[features]
     y = train_df[target]
     
-    print(f"   Training on ALL available history: {len(X)} matches")
-    
-    # 2. Configure the "Winner" Settings
-    # These are the values your tuning script found.
-    # We hardcode them here so this script is always "Production Ready".
-    final_params = {
-        'max_depth': 2,               # Kept it simple (Best found)
-        'learning_rate': 0.01,        # Slow and steady learning
-        'n_estimators': 100,          # Number of trees
-        'subsample': 1.0,             # Use all rows
-        'colsample_bytree': 0.8,      # Use 80% of features per tree
-        'gamma': 5,                   # Conservative splitting
-        'objective': 'multi:softprob',
-        'num_class': 3,
-        'eval_metric': 'mlogloss',
-        'random_state': 42
-    }
-    
+    # 2. Incremental update of the production booster, if asked for and possible
+    meta = _load_meta() if INCREMENTAL else None
+    model, mode, new_df, new_loss = None, "refit", train_df, None
+    if INCREMENTAL and meta is None:
+        print("   No production model/meta yet -> full refit")
+    elif meta is not None:
+        model, mode, new_df, new_loss = _incremental_update(train_df, meta)
+        if model is None and mode is None:
+            print(f"   No new matches since {meta['seen_through']}; model is up to date.")
+            return
+
     # 3. Train the Model
     # We removed 'use_label_encoder' to fix your warning spam
-    model = xgb.XGBClassifier(**final_params)
-    model.fit(X, y)
+    if model is None:
+        print(f"   Training on ALL available history: {len(X)} matches")
+        model = xgb.XGBClassifier(**FINAL_PARAMS)
+        model.fit(X, y)
     
     # 4. Save
-    out_path = MODEL_DIR / "xgboost_model.pkl"
+    fingerprint = _history_fingerprint(train_df)
+    out_path = MODEL_FILE
     joblib.dump(model, out_path)
+    # Flattened copy for xgboost-free batch scoring (checked against the booster on X)
+    arrays = booster_arrays(model, X)
+    npz_path = export_booster(MODEL_DIR / "xgboost_model.npz", model, arrays=arrays)
+    sha = register(
+        "xgboost",
+        arrays,
+        {
+            "features": features,
+            "classes": model.classes_.tolist(),
+            "params": FINAL_PARAMS,
+            "cutoff_date": str(train_df['date'].max()),
+            "metrics": {"n_train": int(len(X))},
+            "data_fingerprint": fingerprint,
+            "source": Path(__file__).name,
+        },
+        alias="xgboost",
+    )
+
+    # Which data the booster has seen (one window per refit/continue since its
+    # last refit), and the reference for the drift check
+    rounds_total = model.get_booster().num_boosted_rounds()
+    window = {
+        "mode": mode,
+        "sha": sha,
+        "from": str(new_df['date'].min()),
+        "to": str(train_df['date'].max()),
+        "new_matches": int(len(new_df)),
+        "n_seen": int(len(train_df)),
+        "rounds_total": int(rounds_total),
+        "new_log_loss": new_loss,
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    if mode == "refit":
+        reference = _reference_log_loss(train_df)
+        rounds_since_refit = 0
+        windows = [window]
+    else:
+        reference = meta['reference_log_loss']
+        rounds_since_refit = meta['rounds_since_refit'] + CONTINUE_ROUNDS
+        windows = meta['windows'] + [window]
+    META_FILE.write_text(json.dumps({
+        "features": features,
+        "params": FINAL_PARAMS,
+        "sha": sha,
+        "seen_through": str(train_df['date'].max()),
+        "n_seen": int(len(train_df)),
+        "data_fingerprint": fingerprint,
+        "reference_log_loss": reference,
+        "rounds_total": int(rounds_total),
+        "rounds_since_refit": rounds_since_refit,
+        "windows": windows,
+    }, indent=2), encoding="utf-8")
     
     print("-" * 30)
-    print(f"  Model saved to: {out_path}")
+    print(f"  Model saved to: {out_path} ({mode}, {rounds_total} trees, {time.perf_counter() - t0:.1f}s)")
+    print(f"  Flattened trees saved to: {npz_path}")
+    print(f"  Registered as xgboost -> {sha}")
+    print(f"  Data window recorded in: {META_FILE}")
     print("   This model is now trained on 2019-2025 data.")
     print("   It is ready to predict 2026 games.")
     print("-" * 30)
@@ -74,4 +241,4 @@ def main():
         print(f"      {f_name:<15}: {importance[i]:.4f}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
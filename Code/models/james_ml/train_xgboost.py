@@ -5,6 +5,11 @@ from sklearn.metrics import accuracy_score, log_loss
 import joblib
 from pathlib import Path
 import os
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from tree_export import booster_arrays, export_booster
+from model_registry import data_fingerprint, register
 
 # --- PATH SETUP ---
 cwd = Path(os.getcwd())
@@ -97,7 +102,25 @@ def main():
     
     out_path = MODEL_DIR / "xgboost_model.pkl"
     joblib.dump(model, out_path)
+    arrays = booster_arrays(model, full_X)
+    npz_path = export_booster(MODEL_DIR / "xgboost_model.npz", model, arrays=arrays)
+    sha = register(
+        "xgboost",
+        arrays,
+        {
+            "features": features,
+            "classes": model.classes_.tolist(),
+            "cutoff_date": split_date,
+            "metrics": {"test_accuracy": float(acc), "test_log_loss": float(loss),
+                        "n_train": int(len(full_X))},
+            "data_fingerprint": data_fingerprint(df[['date', target] + features]),
+            "source": Path(__file__).name,
+        },
+        alias="xgboost",
+    )
     print(f"   ✅ Model saved to {out_path}")
+    print(f"   ✅ Flattened trees saved to {npz_path}")
+    print(f"   ✅ Registered as xgboost -> {sha}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,104 +1,296 @@
 import pandas as pd
-import numpy as np 
-import xgboost as xgb 
+import numpy as np
+import xgboost as xgb
 from sklearn.model_selection import GridSearchCV, TimeSeriesSplit
 from sklearn.metrics import accuracy_score, log_loss
 from pathlib import Path
+import itertools
+import hashlib
+import json
 import os
+import sys
 
 cwd = Path(os.getcwd())
 REPO_ROOT = cwd if cwd.name == "canpl-bet" else Path(__file__).resolve().parent.parent.parent.parent
 
 DATA_FILE = REPO_ROOT / "data" / "matches" / "derived" / "match_model_ready.csv"
 
+# --halving: successive halving with early stopping instead of the full grid
+HALVING = "--halving" in sys.argv
+TRIALS_FILE = REPO_ROOT / "models" / "tuning" / "xgboost_halving_trials.jsonl"
+# Boosters + loss histories per (search, config, fold), so a resumed search
+# keeps boosting the same trees instead of restarting them
+BOOSTER_DIR = REPO_ROOT / "models" / "tuning" / "xgboost_halving_boosters"
+
+# settings we want to test
+param_grid = {
+    'max_depth': [2, 3, 4, 5], # complex tree
+    'learning_rate': [0.01, 0.05, 0.1], # fast model learns quicker likely better
+    'n_estimators': [50, 100, 200], #trees to build number of
+    'subsample': [0.8, 1.0], # fraction of matches to use per tree
+    'colsample_bytree': [0.8, 1.0], # fraction of features to use per tree
+    'gamma': [0, 1, 5] #minimum loss reduction required to make a split
+}
+
+# Successive halving: every config gets the first round budget, the best
+# 1/HALVING_FACTOR move on to HALVING_FACTOR x the rounds. n_estimators is
+# not searched; early stopping on each validation fold picks it.
+HALVING_BUDGETS = [20, 60, 180, 540]
+HALVING_FACTOR = 3
+EARLY_STOPPING_ROUNDS = 25
+
+BASE_PARAMS = {
+    'objective': 'multi:softprob',
+    'num_class': 3,
+    'eval_metric': 'mlogloss',
+    'seed': 42,
+}
+
+
+def run_grid_search(X_train, y_train):
+    # model setup
+    xgb_model = xgb.XGBClassifier(
+        objective='multi:softprob',
+        num_class=3,
+        eval_metric='mlogloss',
+        random_state=42,
+        use_label_encoder=False
+    )
+
+    # Cross validation setup so we dont use the future to predict the past
+    tscv = TimeSeriesSplit(n_splits=3)
+
+    grid_search = GridSearchCV(
+        estimator=xgb_model,
+        param_grid=param_grid,
+        scoring='neg_log_loss', #closer to 0 the better
+        cv=tscv,
+        verbose=1,
+        n_jobs=-1 #all CPU scores to be used
+    )
+
+    # Run the search
+    print("Running Grid Search")
+    grid_search.fit(X_train, y_train)
+    return grid_search.best_params_, -grid_search.best_score_
+
+
+class _FoldState:
+    """Booster and validation-loss history for one (config, fold)."""
+
+    def __init__(self):
+        self.booster = None
+        self.history = []
+        self.stopped = False
+
+    def save(self, path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if self.booster is not None:
+            self.booster.save_model(path.with_suffix(".ubj"))
+        tmp = path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps({"history": self.history, "stopped": self.stopped}), encoding="utf-8")
+        os.replace(tmp, path.with_suffix(".json"))  # written last: marks the booster file as complete
+
+    @classmethod
+    def load(cls, path):
+        state = cls()
+        meta = path.with_suffix(".json")
+        if meta.exists():
+            d = json.loads(meta.read_text(encoding="utf-8"))
+            state.history, state.stopped = d["history"], d["stopped"]
+            if state.history:
+                state.booster = xgb.Booster(model_file=str(path.with_suffix(".ubj")))
+        return state
+
+
+def _state_path(search_key, config_key, fold):
+    config_id = hashlib.sha256(config_key.encode()).hexdigest()[:12]
+    return BOOSTER_DIR / search_key / f"{config_id}_fold{fold}"
+
+
+def _advance(state, params, dtrain, dval, budget):
+    """Boost `state` up to `budget` total rounds, stopping early on dval."""
+    requested = budget - len(state.history)
+    if state.stopped or requested <= 0:
+        return 0
+    evals_result = {}
+    # Continue from a serialized copy: an in-memory booster carries its
+    # sampling RNG along, a reloaded one restarts it from the seed. Always
+    # round-tripping makes a resumed search boost exactly the same trees.
+    start = None if state.booster is None else xgb.Booster(model_file=bytearray(state.booster.save_raw()))
+    state.booster = xgb.train(
+        params, dtrain,
+        num_boost_round=requested,
+        xgb_model=start,
+        evals=[(dval, 'val')],
+        evals_result=evals_result,
+        callbacks=[xgb.callback.EarlyStopping(rounds=EARLY_STOPPING_ROUNDS, data_name='val')],
+        verbose_eval=False,
+    )
+    new = evals_result['val']['mlogloss']
+    state.history.extend(new)
+    # Stopped inside this call, or no improvement over the last rounds of the history
+    best = int(np.argmin(state.history))
+    state.stopped = len(new) < requested or best < len(state.history) - EARLY_STOPPING_ROUNDS
+    return len(new)
+
+
+def _load_trials(search_key):
+    """Finished (rung, config) results from earlier runs of the same search."""
+    done = {}
+    if TRIALS_FILE.exists():
+        for line in TRIALS_FILE.read_text(encoding="utf-8").splitlines():
+            rec = json.loads(line)
+            if rec.get("search") == search_key:
+                done[(rec["rung"], rec["config"])] = rec
+    return done
+
+
+def run_successive_halving(X_train, y_train):
+    space = {k: v for k, v in param_grid.items() if k != 'n_estimators'}
+    configs = [dict(zip(space, values)) for values in itertools.product(*space.values())]
+
+    # Folds are built once and shared by every config
+    folds = []
+    for tr, va in TimeSeriesSplit(n_splits=3).split(X_train):
+        folds.append((xgb.DMatrix(X_train.iloc[tr], label=y_train.iloc[tr]),
+                      xgb.DMatrix(X_train.iloc[va], label=y_train.iloc[va])))
+
+    # Trials are only reused for the same data, space and schedule
+    fingerprint = hashlib.sha256(pd.util.hash_pandas_object(pd.concat([X_train, y_train], axis=1), index=False).values.tobytes())
+    fingerprint.update(json.dumps([space, HALVING_BUDGETS, HALVING_FACTOR, EARLY_STOPPING_ROUNDS, BASE_PARAMS], sort_keys=True).encode())
+    search_key = fingerprint.hexdigest()[:16]
+    done = _load_trials(search_key)
+    if done:
+        print(f"Resuming: {len(done)} trials already in {TRIALS_FILE}")
+    TRIALS_FILE.parent.mkdir(parents=True, exist_ok=True)
+
+    states = {}
+    alive = [json.dumps(c, sort_keys=True) for c in configs]
+    fits = rounds = 0
+    scores = {}
+
+    for rung, budget in enumerate(HALVING_BUDGETS):
+        print(f"   Rung {rung}: {len(alive)} configs x {len(folds)} folds, up to {budget} rounds")
+        scores = {}
+        for key in alive:
+            if (rung, key) in done:
+                scores[key] = done[(rung, key)]
+                continue
+            params = {**BASE_PARAMS, **json.loads(key)}
+            if key not in states:
+                states[key] = [_FoldState.load(_state_path(search_key, key, f)) for f in range(len(folds))]
+            fold_states = states[key]
+            for f, (state, (dtrain, dval)) in enumerate(zip(fold_states, folds)):
+                n = _advance(state, params, dtrain, dval, budget)
+                fits += n > 0
+                rounds += n
+                if n:
+                    state.save(_state_path(search_key, key, f))
+            rec = {
+                "search": search_key,
+                "rung": rung,
+                "budget": budget,
+                "config": key,
+                # A reloaded booster may already be past this rung (trials log cut
+                # short); score it on this rung's rounds only
+                "log_loss": float(np.mean([min(s.history[:budget]) for s in fold_states])),
+                "best_rounds": [int(np.argmin(s.history[:budget])) + 1 for s in fold_states],
+            }
+            with TRIALS_FILE.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(rec) + "\n")
+            scores[key] = rec
+
+        ranked = sorted(alive, key=lambda k: scores[k]["log_loss"])
+        alive = ranked[:max(1, len(ranked) // HALVING_FACTOR)]
+        if len(ranked) == 1:
+            break
+
+    best = scores[alive[0]]
+    best_params = json.loads(best["config"])
+    best_params['n_estimators'] = int(round(np.mean(best["best_rounds"])))
+
+    grid_rounds = int(np.prod([len(v) for v in space.values()]) * sum(param_grid['n_estimators']) * len(folds))
+    print(f"   Boosting calls: {fits} | rounds trained: {rounds} (full grid: {grid_rounds})")
+
+    # The rung scores pick each fold's best round on that same fold, so they
+    # are optimistic; report plain CV at the chosen n_estimators instead
+    cv_loss = _cv_log_loss(best_params, folds)
+    print(f"   Selection log loss (best round per fold): {best['log_loss']:.4f} | "
+          f"CV log loss at n_estimators={best_params['n_estimators']}: {cv_loss:.4f}")
+    return best_params, cv_loss
+
+
+def _cv_log_loss(best_params, folds):
+    """Mean validation log loss over folds with a fixed number of rounds."""
+    params = {**BASE_PARAMS, **{k: v for k, v in best_params.items() if k != 'n_estimators'}}
+    losses = []
+    for dtrain, dval in folds:
+        booster = xgb.train(params, dtrain, num_boost_round=best_params['n_estimators'])
+        losses.append(log_loss(dval.get_label(), booster.predict(dval), labels=[0, 1, 2]))
+    return float(np.mean(losses))
+
+
 def main():
     print("Tuning XGBoost Factors")
-    
+
     if not DATA_FILE.exists():
         print(f"File not Found: {DATA_FILE}")
         return
-    
+
     df = pd.read_csv(DATA_FILE)
     df['date'] = pd.to_datetime(df['date'])
     df = df.sort_values('date').reset_index(drop=True)
-    
+
     # 1. Feature selection (Add more???)
     features = [
         'diff_total', # ELO gap
-        'diff_form_pts', 
+        'diff_form_pts',
         'diff_form_gd'
     ]
     target = 'label'
-    
+
     # 2. Split data (should make moving date current)
     split_date = '2025-01-01'
     train_df = df[df['date'] < split_date].copy().dropna(subset=[target])
-    
+
     X_train = train_df[features]
     y_train = train_df[target]
-    
+
     print(f"Tuning on {len(X_train)} matches before 2025")
-    
-    # 3. settings we want to test
-    param_grid = {
-        'max_depth': [2, 3, 4, 5], # complex tree
-        'learning_rate': [0.01, 0.05, 0.1], # fast model learns quicker likely better
-        'n_estimators': [50, 100, 200], #trees to build number of
-        'subsample': [0.8, 1.0], # fraction of matches to use per tree
-        'colsample_bytree': [0.8, 1.0], # fraction of features to use per tree
-        'gamma': [0, 1, 5] #minimum loss reduction required to make a split
-    }
-    
-    # 4. model setup
-    xgb_model = xgb.XGBClassifier(
-        objective='multi:softprob',
-        num_class=3,
-        eval_metric='mlogloss',
-        random_state=42,
-        use_label_encoder=False
-    )
-    
-    # Cross validation setup so we dont use the future to predict the past
-    tscv = TimeSeriesSplit(n_splits=3)
-    
-    grid_search = GridSearchCV(
-        estimator=xgb_model,
-        param_grid=param_grid,
-        scoring='neg_log_loss', #closer to 0 the better
-        cv=tscv,
-        verbose=1,
-        n_jobs=-1 #all CPU scores to be used
-    )
-    
-    # 6. Run the search
-    print("Running Grid Search")
-    grid_search.fit(X_train, y_train)
-    
-    # 7. output results
+
+    # 3. Run the search
+    if HALVING:
+        best_params, best_score = run_successive_halving(X_train, y_train)
+    else:
+        best_params, best_score = run_grid_search(X_train, y_train)
+
+    # 4. output results
     print("\n" + '=' * 40)
     print("Best Paramteres Found")
-    best_params = grid_search.best_params_
     for param, value in best_params.items():
         print(f"   {param:<20}: {value}")
-        
+
     print("-" * 40)
-    print(f"   Best Log Loss Score: {-grid_search.best_score_:.4f}")
-    
-    # 8. Verification (Test on 2025 Data)
+    print(f"   Best Log Loss Score: {best_score:.4f}")
+
+    # 5. Verification (Test on 2025 Data)
     print("\n VERIFICATION ON 2025 DATA")
     test_df = df[df['date'] >= split_date].copy().dropna(subset=[target])
     X_test = test_df[features]
     y_test = test_df[target]
-    
-    best_model = grid_search.best_estimator_
+
+    best_model = xgb.XGBClassifier(objective='multi:softprob', num_class=3, eval_metric='mlogloss',
+                                   random_state=42, **best_params)
+    best_model.fit(X_train, y_train)
     preds = best_model.predict(X_test)
     probs = best_model.predict_proba(X_test)
-    
+
     acc = accuracy_score(y_test, preds)
     loss = log_loss(y_test, probs)
-    
+
     print(f"   Accuracy: {acc:.1%}")
     print(f"   Log Loss: {loss:.4f}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
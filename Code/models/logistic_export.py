@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+
+
+class NumpyScaler:
+    """StandardScaler.transform from exported mean/scale."""
+
+    def __init__(self, mean, scale):
+        self.mean_ = np.asarray(mean, dtype=np.float64)
+        self.scale_ = np.asarray(scale, dtype=np.float64)
+
+    def transform(self, X) -> np.ndarray:
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+
+class NumpyLogistic:
+    """LogisticRegression.predict_proba from exported coef/intercept.
+
+    Multinomial models use a softmax over the class scores; a binary model
+    (one coefficient row) uses the logistic sigmoid, as sklearn does.
+    """
+
+    def __init__(self, coef, intercept, classes):
+        self.coef_ = np.atleast_2d(np.asarray(coef, dtype=np.float64))
+        self.intercept_ = np.atleast_1d(np.asarray(intercept, dtype=np.float64))
+        self.classes_ = np.asarray(classes)
+
+    def decision_function(self, X) -> np.ndarray:
+        return np.asarray(X, dtype=np.float64) @ self.coef_.T + self.intercept_
+
+    def predict_proba(self, X) -> np.ndarray:
+        z = self.decision_function(X)
+        if z.shape[1] == 1:
+            p = 1.0 / (1.0 + np.exp(-z[:, 0]))
+            return np.column_stack([1.0 - p, p])
+        z = z - z.max(axis=1, keepdims=True)
+        e = np.exp(z)
+        return e / e.sum(axis=1, keepdims=True)
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+class LogisticExport:
+    """Scaler + logistic model + feature order, loaded from export_logistic output."""
+
+    def __init__(self, features, scaler: NumpyScaler, model: NumpyLogistic):
+        self.features = list(features)
+        self.scaler = scaler
+        self.model = model
+        self.classes_ = model.classes_
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Probabilities for raw (unscaled) X with columns in `features` order."""
+        return self.model.predict_proba(self.scaler.transform(X))
+
+
+def logistic_arrays(clf, scaler=None, features=None) -> dict:
+    """Plain arrays for a fitted LogisticRegression (plus optional StandardScaler).
+
+    Without a scaler the exported one is the identity (mean 0, scale 1).
+    """
+    n = clf.coef_.shape[1]
+    mean = np.zeros(n) if scaler is None or scaler.mean_ is None else scaler.mean_
+    scale = np.ones(n) if scaler is None or scaler.scale_ is None else scaler.scale_
+    if features is None:
+        features = getattr(clf, "feature_names_in_", [f"x{i}" for i in range(n)])
+
+    return {
+        "mean": np.asarray(mean, dtype=np.float64),
+        "scale": np.asarray(scale, dtype=np.float64),
+        "coef": np.asarray(clf.coef_, dtype=np.float64),
+        "intercept": np.asarray(clf.intercept_, dtype=np.float64),
+        "classes": np.asarray(clf.classes_),
+        "features": np.asarray(list(features), dtype=str),
+    }
+
+
+def logistic_from_arrays(arrays) -> LogisticExport:
+    return LogisticExport(
+        np.asarray(arrays["features"]).tolist(),
+        NumpyScaler(arrays["mean"], arrays["scale"]),
+        NumpyLogistic(arrays["coef"], arrays["intercept"], arrays["classes"]),
+    )
+
+
+def export_logistic(path, clf, scaler=None, features=None) -> Path:
+    """Write logistic_arrays() to .npz; loading it back needs NumPy alone."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(path, **logistic_arrays(clf, scaler, features))
+    return path
+
+
+def load_logistic(path) -> LogisticExport:
+    with np.load(path, allow_pickle=False) as data:
+        return logistic_from_arrays(data)
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sys
+import time
+from collections.abc import Mapping
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from logistic_export import logistic_from_arrays
+from tree_export import TreeEnsemble
+
+
+# --- PATH SETUP ---
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+
+# models/registry/<sha>/{metadata.json, <array>.npy}; aliases.json maps names to shas
+REGISTRY_DIR = REPO_ROOT / "models" / "registry"
+ALIASES_FILE = REGISTRY_DIR / "aliases.json"
+
+# Hex digits of the sha256 content hash used as the version id
+SHA_LEN = 16
+
+# How each kind of artifact turns its arrays back into a scorer
+LOADERS = {
+    "logistic": logistic_from_arrays,
+    "xgboost": TreeEnsemble,
+}
+
+
+def data_fingerprint(data) -> str:
+    """Stable hash of a training frame/array, recorded with each version."""
+    if isinstance(data, (pd.DataFrame, pd.Series)):
+        row_hashes = pd.util.hash_pandas_object(data, index=False).to_numpy()
+        cols = ",".join(map(str, data.columns)) if isinstance(data, pd.DataFrame) else str(data.name)
+        payload = cols.encode("utf-8") + row_hashes.tobytes()
+    else:
+        arr = np.ascontiguousarray(data)
+        payload = f"{arr.dtype}{arr.shape}".encode("utf-8") + arr.tobytes()
+    return hashlib.sha256(payload).hexdigest()[:SHA_LEN]
+
+
+def content_hash(kind: str, arrays: dict) -> str:
+    """Version id: hash of the kind and every array's name, dtype, shape and bytes."""
+    h = hashlib.sha256(kind.encode("utf-8"))
+    for name in sorted(arrays):
+        arr = np.ascontiguousarray(arrays[name])
+        h.update(f"{name}|{arr.dtype.str}|{arr.shape}|".encode("utf-8"))
+        h.update(arr.tobytes())
+    return h.hexdigest()[:SHA_LEN]
+
+
+def _write_json_atomic(path: Path, payload: dict):
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(payload, indent=2, default=str), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def read_aliases(registry_dir: Path = REGISTRY_DIR) -> dict:
+    path = Path(registry_dir) / ALIASES_FILE.name
+    return json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+
+
+def set_alias(alias: str, sha: str, registry_dir: Path = REGISTRY_DIR):
+    registry_dir = Path(registry_dir)
+    if not (registry_dir / sha / "metadata.json").exists():
+        raise KeyError(f"No registered model {sha!r} under {registry_dir}")
+    aliases = read_aliases(registry_dir)
+    aliases[alias] = sha
+    _write_json_atomic(registry_dir / ALIASES_FILE.name, aliases)
+
+
+def register(kind: str, arrays: dict, metadata: dict | None = None, alias: str | None = None,
+             registry_dir: Path = REGISTRY_DIR) -> str:
+    """Store one trained model under its content hash; returns the sha.
+
+    Arrays are written as individual .npy files so readers can memory-map
+    them. Re-registering identical arrays reuses the existing version but
+    atomically replaces its metadata.json with the new metadata (keeping the
+    original created_at). The version directory is built under a temp name
+    and renamed into place, so concurrent readers never see a half-written
+    model.
+    """
+    if kind not in LOADERS:
+        raise ValueError(f"Unknown model kind {kind!r}; expected one of {sorted(LOADERS)}")
+    registry_dir = Path(registry_dir)
+    registry_dir.mkdir(parents=True, exist_ok=True)
+
+    arrays = {name: np.asarray(a) for name, a in arrays.items()}
+    sha = content_hash(kind, arrays)
+    target = registry_dir / sha
+    meta = {
+        "sha": sha,
+        "kind": kind,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "arrays": {name: {"dtype": arr.dtype.str, "shape": list(arr.shape)} for name, arr in arrays.items()},
+        **(metadata or {}),
+    }
+
+    if not target.exists():
+        tmp = registry_dir / f".{sha}.{os.getpid()}.tmp"
+        tmp.mkdir()
+        for name, arr in arrays.items():
+            np.save(tmp / f"{name}.npy", arr, allow_pickle=False)
+        _write_json_atomic(tmp / "metadata.json", meta)
+        try:
+            os.rename(tmp, target)
+            meta = None
+        except OSError:  # another process registered the same version first
+            for f in tmp.iterdir():
+                f.unlink()
+            tmp.rmdir()
+
+    if meta is not None:
+        # Same weights, possibly new metadata (cutoff, data fingerprint, ...)
+        old = json.loads((target / "metadata.json").read_text(encoding="utf-8"))
+        meta["created_at"] = old.get("created_at", meta["created_at"])
+        meta["updated_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        _write_json_atomic(target / "metadata.json", meta)
+        _OPEN.pop((str(registry_dir), sha), None)
+
+    if alias:
+        set_alias(alias, sha, registry_dir)
+    return sha
+
+
+class LazyArrays(Mapping):
+    """Read-only {name: array} view over a version directory.
+
+    Each array is memory-mapped on first access, so a process only touches
+    the pages it scores with and every worker shares the OS page cache.
+    """
+
+    def __init__(self, directory: Path, names):
+        self.directory = Path(directory)
+        self.names = list(names)
+        self._loaded = {}
+
+    def __getitem__(self, name):
+        if name not in self.names:
+            raise KeyError(name)
+        if name not in self._loaded:
+            self._loaded[name] = np.load(self.directory / f"{name}.npy", mmap_mode="r", allow_pickle=False)
+        return self._loaded[name]
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+
+class RegisteredModel:
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.metadata = json.loads((self.directory / "metadata.json").read_text(encoding="utf-8"))
+        self.sha = self.metadata["sha"]
+        self.kind = self.metadata["kind"]
+        self.arrays = LazyArrays(self.directory, self.metadata["arrays"])
+        self._scorer = None
+
+    @property
+    def features(self) -> list:
+        return list(self.metadata.get("features") or np.asarray(self.arrays["features"]).tolist())
+
+    def scorer(self):
+        """LogisticExport / TreeEnsemble over the mapped arrays (built once)."""
+        if self._scorer is None:
+            self._scorer = LOADERS[self.kind](self.arrays)
+        return self._scorer
+
+
+# Per-process cache: a version's arrays are immutable, so it is opened once
+# (register() drops the entry when it rewrites that version's metadata)
+_OPEN = {}
+
+
+def resolve(name: str, registry_dir: Path = REGISTRY_DIR) -> RegisteredModel:
+    """Model for an alias (or a sha). Aliases are re-read on every call, so
+    a repointed alias is picked up without reopening versions already seen."""
+    registry_dir = Path(registry_dir)
+    sha = read_aliases(registry_dir).get(name, name)
+    key = (str(registry_dir), sha)
+    if key not in _OPEN:
+        directory = registry_dir / sha
+        if not (directory / "metadata.json").exists():
+            raise KeyError(f"{name!r} is neither an alias nor a registered version in {registry_dir}")
+        _OPEN[key] = RegisteredModel(directory)
+    return _OPEN[key]
+
+
+def load_model(name: str, registry_dir: Path = REGISTRY_DIR):
+    """Scorer for an alias; None if the registry has no such alias."""
+    try:
+        return resolve(name, registry_dir).scorer()
+    except KeyError:
+        return None
+
+
+def list_models(registry_dir: Path = REGISTRY_DIR) -> pd.DataFrame:
+    registry_dir = Path(registry_dir)
+    aliases = read_aliases(registry_dir)
+    rows = []
+    for meta_path in sorted(registry_dir.glob("*/metadata.json")):
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        rows.append({
+            "sha": meta["sha"],
+            "kind": meta["kind"],
+            "created_at": meta.get("created_at"),
+            "cutoff_date": meta.get("cutoff_date"),
+            "data_fingerprint": meta.get("data_fingerprint"),
+            "aliases": ",".join(sorted(a for a, s in aliases.items() if s == meta["sha"])),
+        })
+    return pd.DataFrame(rows, columns=["sha", "kind", "created_at", "cutoff_date", "data_fingerprint", "aliases"])
+
+
+def main():
+    # python model_registry.py                -> list versions
+    # python model_registry.py alias NAME SHA -> point NAME at SHA
+    if len(sys.argv) == 4 and sys.argv[1] == "alias":
+        set_alias(sys.argv[2], sys.argv[3])
+        print(f"{sys.argv[2]} -> {sys.argv[3]}")
+        return
+
+    models = list_models()
+    if models.empty:
+        print(f"No models registered under {REGISTRY_DIR}")
+        return
+    print(models.sort_values("created_at").to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
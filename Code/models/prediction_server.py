@@ -0,0 +1,333 @@
+from __future__ import annotations
+
+import json
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from logistic_export import load_logistic
+from tree_export import load_booster
+from model_registry import resolve
+
+# --- PATH SETUP ---
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+
+MODEL_DIR = REPO_ROOT / "models"
+PRIOR_GAP_MODEL = REPO_ROOT / "data" / "analysis" / "cpl_ml_model.pkl"
+PRIOR_GAP_EXPORT = REPO_ROOT / "data" / "analysis" / "cpl_ml_model.npz"
+
+HOST = "127.0.0.1"
+PORT = int(sys.argv[sys.argv.index("--port") + 1]) if "--port" in sys.argv else 8765
+
+# Micro-batching: a batch closes at MAX_BATCH rows or MAX_WAIT_MS after its first row
+MAX_BATCH = 256
+MAX_WAIT_MS = 2.0
+
+# Requests kept for the latency percentiles in /metrics
+LATENCY_WINDOW = 10000
+
+OUTCOMES = ("home", "draw", "away")
+
+# Label convention of each served model (also its registry alias).
+# james_elo / james_ml use 2=home, 1=draw, 0=away; code/analysis the reverse.
+OUTCOME_OF_CLASS = {
+    "logistic": {2: "home", 1: "draw", 0: "away"},
+    "xgboost": {2: "home", 1: "draw", 0: "away"},
+    "prior_gap": {0: "home", 1: "draw", 2: "away"},
+}
+
+
+class ServedModel:
+    """A loaded model plus what the server needs to feed it.
+
+    `predict` maps an (n, k) float array in `features` order to (n, 3)
+    probabilities already reordered to OUTCOMES.
+    """
+
+    def __init__(self, name, features, predict, version=None):
+        self.name = name
+        self.features = list(features)
+        self.predict = predict
+        self.version = version
+
+
+def _class_order(classes, outcome_of_class):
+    """Column indices that put predict_proba output in OUTCOMES order."""
+    classes = list(classes)
+    return [classes.index(next(c for c, o in outcome_of_class.items() if o == out)) for out in OUTCOMES]
+
+
+def _served(name, scorer, features, version=None) -> ServedModel:
+    """ServedModel around anything with predict_proba(X) and classes_."""
+    order = _class_order(scorer.classes_, OUTCOME_OF_CLASS[name])
+    return ServedModel(name, features, lambda X, m=scorer, order=order: m.predict_proba(X)[:, order], version)
+
+
+def load_models() -> dict:
+    """Load every model artifact present, once.
+
+    Registry aliases win; the fixed-path exports and pickles are fallbacks
+    for models trained before the registry existed.
+    """
+    models = {}
+
+    for name in OUTCOME_OF_CLASS:
+        try:
+            registered = resolve(name)
+        except KeyError:
+            continue
+        models[name] = _served(name, registered.scorer(), registered.features, registered.sha)
+
+    exports = {
+        "logistic": (MODEL_DIR / "logistic_model.npz", load_logistic),
+        "xgboost": (MODEL_DIR / "xgboost_model.npz", load_booster),
+        "prior_gap": (PRIOR_GAP_EXPORT, load_logistic),
+    }
+    for name, (path, loader) in exports.items():
+        if name not in models and path.exists():
+            scorer = loader(path)
+            models[name] = _served(name, scorer, scorer.features)
+
+    # james_elo logistic pickles
+    meta_path = MODEL_DIR / "probability_model_meta.json"
+    if "logistic" not in models and (MODEL_DIR / "logistic_model.pkl").exists() and meta_path.exists():
+        clf = joblib.load(MODEL_DIR / "logistic_model.pkl")
+        scaler = joblib.load(MODEL_DIR / "scaler.pkl")
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        order = _class_order(clf.classes_, OUTCOME_OF_CLASS["logistic"])
+        models["logistic"] = ServedModel(
+            "logistic", meta["features"],
+            lambda X, clf=clf, scaler=scaler, order=order: clf.predict_proba(scaler.transform(X))[:, order],
+        )
+
+    # james_ml XGBoost pickle
+    if "xgboost" not in models and (MODEL_DIR / "xgboost_model.pkl").exists():
+        xgb_model = joblib.load(MODEL_DIR / "xgboost_model.pkl")
+        features = ["diff_total", "diff_form_pts", "diff_form_gd"]
+        order = _class_order(xgb_model.classes_, OUTCOME_OF_CLASS["xgboost"])
+        models["xgboost"] = ServedModel(
+            "xgboost", features,
+            lambda X, m=xgb_model, f=features, order=order: m.predict_proba(pd.DataFrame(X, columns=f))[:, order],
+        )
+
+    # code/analysis prior-gap pickle
+    if "prior_gap" not in models and PRIOR_GAP_MODEL.exists():
+        gap_model = joblib.load(PRIOR_GAP_MODEL)
+        order = _class_order(gap_model.classes_, OUTCOME_OF_CLASS["prior_gap"])
+        models["prior_gap"] = ServedModel(
+            "prior_gap", ["Prior_Gap"],
+            lambda X, m=gap_model, order=order: m.predict_proba(pd.DataFrame(X, columns=["Prior_Gap"]))[:, order],
+        )
+
+    return models
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-row requests into one predict call.
+
+    Handlers submit rows and block on their own event; a worker thread
+    drains the queue into batches and writes each row's result back.
+    """
+
+    def __init__(self, model: ServedModel, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = queue.Queue()
+        self.batches = 0
+        self.rows = 0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, X: np.ndarray) -> np.ndarray:
+        """Score an (n, k) block; returns (n, 3). Blocks until its batch ran."""
+        job = {"X": X, "done": threading.Event(), "out": None, "error": None}
+        self.queue.put(job)
+        job["done"].wait()
+        if job["error"] is not None:
+            raise job["error"]
+        return job["out"]
+
+    def _run(self):
+        while True:
+            jobs = [self.queue.get()]
+            n = len(jobs[0]["X"])
+            deadline = time.perf_counter() + self.max_wait
+            while n < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    job = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                jobs.append(job)
+                n += len(job["X"])
+
+            try:
+                probs = self.model.predict(np.vstack([j["X"] for j in jobs]))
+                start = 0
+                for j in jobs:
+                    j["out"] = probs[start:start + len(j["X"])]
+                    start += len(j["X"])
+            except Exception as exc:  # hand the failure to every waiting request
+                for j in jobs:
+                    j["error"] = exc
+
+            self.batches += 1
+            self.rows += n
+            for j in jobs:
+                j["done"].set()
+
+
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.latencies_ms = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.predictions = 0
+        self.errors = 0
+
+    def record(self, seconds: float, n_rows: int):
+        with self.lock:
+            self.latencies_ms.append(seconds * 1000.0)
+            self.requests += 1
+            self.predictions += n_rows
+
+    def snapshot(self, batchers: dict) -> dict:
+        with self.lock:
+            lat = np.array(self.latencies_ms) if self.latencies_ms else np.zeros(1)
+            uptime = max(time.time() - self.started, 1e-9)
+            return {
+                "uptime_s": round(uptime, 1),
+                "requests": self.requests,
+                "predictions": self.predictions,
+                "errors": self.errors,
+                "latency_ms_p50": round(float(np.percentile(lat, 50)), 3),
+                "latency_ms_p99": round(float(np.percentile(lat, 99)), 3),
+                "throughput_rps": round(self.requests / uptime, 2),
+                "throughput_pred_per_s": round(self.predictions / uptime, 2),
+                "batches": {
+                    name: {"batches": b.batches, "rows": b.rows,
+                           "mean_batch_rows": round(b.rows / b.batches, 2) if b.batches else 0.0}
+                    for name, b in batchers.items()
+                },
+            }
+
+
+class PredictionHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # listen backlog; the default of 5 resets bursts of clients
+
+
+def _rows_to_matrix(rows, features) -> np.ndarray:
+    """List of {feature: value} dicts -> (n, k) in model order.
+
+    Every row must carry exactly the model's features: a missing or
+    misspelled key raises ValueError (a 400) naming it, rather than being
+    scored as 0.
+    """
+    expected = set(features)
+    for i, r in enumerate(rows):
+        if not isinstance(r, dict):
+            raise TypeError(f"row {i}: expected an object of features, got {type(r).__name__}")
+        missing, unknown = sorted(expected - r.keys()), sorted(r.keys() - expected)
+        if missing or unknown:
+            raise ValueError(f"row {i}: missing features {missing}, unknown features {unknown}; expected {list(features)}")
+    return np.array([[float(r[f]) for f in features] for r in rows], dtype=np.float64).reshape(-1, len(features))
+
+
+def _format(probs: np.ndarray) -> list:
+    return [dict(zip(OUTCOMES, map(float, p))) for p in probs]
+
+
+def make_handler(models: dict, batchers: dict, metrics: Metrics, default_model: str):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload: dict):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):  # keep the console quiet under load
+            pass
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                self._send(200, metrics.snapshot(batchers))
+            elif self.path == "/health":
+                self._send(200, {"status": "ok", "models": {
+                    n: {"features": m.features, "version": m.version} for n, m in models.items()}})
+            else:
+                self._send(404, {"error": f"unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path not in ("/predict", "/predict_batch"):
+                self._send(404, {"error": f"unknown path {self.path}"})
+                return
+            t0 = time.perf_counter()
+            try:
+                req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                name = req.get("model", default_model)
+                if name not in batchers:
+                    raise KeyError(f"unknown model {name!r}; available: {sorted(batchers)}")
+                rows = [req.get("features", {})] if self.path == "/predict" else req.get("matches", [])
+                X = _rows_to_matrix(rows, models[name].features)
+                probs = batchers[name].submit(X) if len(X) else np.zeros((0, 3))
+            except (KeyError, ValueError, TypeError) as exc:
+                with metrics.lock:
+                    metrics.errors += 1
+                self._send(400, {"error": str(exc)})
+                return
+            except Exception as exc:
+                with metrics.lock:
+                    metrics.errors += 1
+                self._send(500, {"error": f"{type(exc).__name__}: {exc}"})
+                return
+
+            out = _format(probs)
+            metrics.record(time.perf_counter() - t0, len(out))
+            if self.path == "/predict":
+                self._send(200, {"model": name, **out[0]})
+            else:
+                self._send(200, {"model": name, "predictions": out})
+
+    return Handler
+
+
+def main():
+    print("--- STARTING PREDICTION SERVER ---")
+    models = load_models()
+    if not models:
+        print(f"No model artifacts found under {MODEL_DIR}. Train a model first.")
+        return
+
+    batchers = {name: MicroBatcher(m) for name, m in models.items()}
+    default_model = "logistic" if "logistic" in models else next(iter(models))
+    metrics = Metrics()
+
+    server = PredictionHTTPServer((HOST, PORT), make_handler(models, batchers, metrics, default_model))
+    for name, m in models.items():
+        print(f"   Loaded {name:<10s} version={m.version or 'unregistered'} features={m.features}")
+    print(f"   POST /predict {{\"features\": {{...}}}} | POST /predict_batch {{\"matches\": [...]}} | GET /metrics")
+    print(f"Serving on http://{HOST}:{PORT} (default model: {default_model})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
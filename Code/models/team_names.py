@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+
+# Canonical short names (the keys of external_factors/cpl_stadiums.STADIUMS)
+CANONICAL_TEAMS = (
+    "Atlético", "Cavalry", "Edmonton", "Forge", "Pacific",
+    "Valour", "Vancouver", "Wanderers", "York",
+)
+
+# Every spelling seen across the scraped tables, keyed by canonical name.
+# Lookups go through team_key(), so case, accents, underscores and a
+# leading/trailing "FC" never need their own entry.
+_ALIASES = {
+    "Atlético":  ["Atlético Ottawa", "Atletico Ottawa", "Atletico"],
+    "Cavalry":   ["Cavalry FC"],
+    "Edmonton":  ["FC Edmonton", "Edmonton FC"],
+    "Forge":     ["Forge FC"],
+    "Pacific":   ["Pacific FC"],
+    "Valour":    ["Valour FC"],
+    "Vancouver": ["Vancouver FC"],
+    "Wanderers": ["HFX Wanderers", "Halifax Wanderers", "HFX Wanderers FC"],
+    "York":      ["York United", "York United FC", "York9", "York9 FC", "Inter Toronto"],
+}
+
+
+@lru_cache(maxsize=None)
+def team_key(name) -> str:
+    """Comparison key: ASCII, lowercase, no 'fc', words split on any punctuation."""
+    s = unicodedata.normalize("NFKD", str(name))
+    s = "".join(ch for ch in s if not unicodedata.combining(ch)).lower()
+    s = re.sub(r"[^a-z0-9]+", " ", s)
+    return " ".join(w for w in s.split() if w != "fc")
+
+
+TEAM_ALIASES = {
+    team_key(alias): canon
+    for canon, aliases in _ALIASES.items()
+    for alias in [canon, *aliases]
+}
+
+
+@lru_cache(maxsize=None)
+def canonical_team(name) -> str:
+    """Canonical name for `name`; unknown teams come back stripped but unchanged."""
+    return TEAM_ALIASES.get(team_key(name), str(name).strip())
+
+
+def canonicalize(values) -> pd.Series:
+    """Vectorized canonical_team.
+
+    Values are factorized first (categoricals reuse their own codes), so the
+    normalizer runs once per distinct spelling and the result is a single
+    take over the codes. Missing values stay missing.
+    """
+    s = values if isinstance(values, pd.Series) else pd.Series(values)
+    codes, uniques = pd.factorize(s, use_na_sentinel=True)
+    mapped = np.array([canonical_team(u) for u in uniques] + [np.nan], dtype=object)
+    return pd.Series(mapped[codes], index=s.index, name=s.name)
+
+
+def team_codes(values) -> np.ndarray:
+    """1-based position in CANONICAL_TEAMS per value; 0 for teams not in the table."""
+    canon = canonicalize(values)
+    lookup = {t: i + 1 for i, t in enumerate(CANONICAL_TEAMS)}
+    return canon.map(lookup).fillna(0).to_numpy(dtype=np.int64)
+
+
+def match_key(dates, home, away) -> pd.Series:
+    """Integer join key YYYYMMDD * 10000 + home code * 100 + away code.
+
+    Dates are taken as UTC calendar days, the convention every match_id in
+    the pipeline uses. Rows with an unparseable date or a team outside
+    CANONICAL_TEAMS get <NA>, so they can never collide in a merge.
+    """
+    d = pd.to_datetime(pd.Series(dates).reset_index(drop=True), errors="coerce", utc=True)
+    ymd = (d.dt.year * 10000 + d.dt.month * 100 + d.dt.day).to_numpy(dtype=np.float64)
+    h = team_codes(pd.Series(home).reset_index(drop=True))
+    a = team_codes(pd.Series(away).reset_index(drop=True))
+
+    key = pd.array(ymd * 10000 + h * 100 + a, dtype="Float64").astype("Int64")
+    key[np.isnan(ymd) | (h == 0) | (a == 0)] = pd.NA
+    index = dates.index if isinstance(dates, pd.Series) else None
+    return pd.Series(key, index=index, name="match_key")
+
+
+def check_match_keys(keys, home, away, labelled=None, source: str = "matches") -> None:
+    """Report rows that match_key left without a key because of a team name.
+
+    Such rows fall out of every join on match_key. If any of them is
+    labelled (has a result), ValueError is raised naming the unknown teams.
+    Otherwise a warning with the count is printed. Unknown teams belong in
+    _ALIASES or CANONICAL_TEAMS.
+    """
+    keys = pd.Series(keys).reset_index(drop=True)
+    teams = pd.concat([
+        canonicalize(pd.Series(home).reset_index(drop=True)),
+        canonicalize(pd.Series(away).reset_index(drop=True)),
+    ], axis=1)
+    unknown = ~teams.isin(CANONICAL_TEAMS) & teams.notna()
+    missing = keys.isna() & unknown.any(axis=1)
+    if not missing.any():
+        return
+
+    names = pd.concat([teams.iloc[:, 0][unknown.iloc[:, 0] & missing],
+                       teams.iloc[:, 1][unknown.iloc[:, 1] & missing]]).value_counts()
+    listed = ", ".join(f"{t!r} ({n})" for t, n in names.items())
+    if labelled is not None:
+        lost = int((missing & pd.Series(labelled).reset_index(drop=True).astype(bool)).sum())
+        if lost:
+            raise ValueError(f"{lost} labelled {source} have no match_key; unknown teams: {listed}")
+    print(f"   Warning: {int(missing.sum())} {source} have no match_key and are dropped; unknown teams: {listed}")
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+
+# Rows scored per pass; bounds the (rows, trees) node-index buffer
+CHUNK_ROWS = 16384
+
+# Largest threshold grid compiled into a lookup table (cells x classes margins)
+MAX_TABLE_CELLS = 1 << 20
+
+# Objectives the evaluator knows how to turn margins into probabilities for
+_OBJECTIVES = ("multi:softprob", "multi:softmax", "binary:logistic")
+
+
+def _parse_floats(value) -> np.ndarray:
+    """base_score is stored as "0.5" or, for multi-class models, "[a,b,c]"."""
+    return np.array(json.loads(value) if str(value).startswith("[") else [float(value)], dtype=np.float64)
+
+
+def _tree_depth(left, right) -> int:
+    depth, frontier = 0, [0]
+    while True:
+        frontier = [c for n in frontier for c in (left[n], right[n]) if c != -1]
+        if not frontier:
+            return depth
+        depth += 1
+
+
+def flatten_booster(model) -> dict:
+    """Contiguous arrays for every node of every tree in an XGBoost model.
+
+    Child pointers are global indices into the flattened arrays; a leaf points
+    at itself, so walking max_depth steps from the roots lands every row on
+    its leaf no matter how deep each individual tree is.
+    """
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    learner = json.loads(booster.save_raw("json"))["learner"]
+    objective = learner["objective"]["name"]
+    if objective not in _OBJECTIVES:
+        raise ValueError(f"Unsupported objective {objective!r}; expected one of {_OBJECTIVES}")
+
+    gbm = learner["gradient_booster"]
+    if gbm["name"] != "gbtree":
+        raise ValueError(f"Only gbtree boosters can be flattened, got {gbm['name']!r}")
+    trees = gbm["model"]["trees"]
+
+    feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+    depth, offset = 0, 0
+    for t in trees:
+        lc = np.asarray(t["left_children"], dtype=np.int64)
+        rc = np.asarray(t["right_children"], dtype=np.int64)
+        leaf = lc == -1
+        own = np.arange(len(lc)) + offset
+        roots.append(offset)
+        feature.append(np.where(leaf, -1, t["split_indices"]))
+        threshold.append(t["split_conditions"])
+        left.append(np.where(leaf, own, lc + offset))
+        right.append(np.where(leaf, own, rc + offset))
+        default_left.append(t["default_left"])
+        value.append(np.where(leaf, t["split_conditions"], 0.0))
+        depth = max(depth, _tree_depth(lc, rc))
+        offset += len(lc)
+
+    params = learner["learner_model_param"]
+    n_class = max(int(params.get("num_class", 0)), 1)
+    base_score = _parse_floats(params["base_score"])
+    if objective == "binary:logistic":
+        # Stored as a probability; the trees add to its logit
+        base_margin = np.log(base_score / (1.0 - base_score))
+    else:
+        base_margin = np.broadcast_to(base_score, (n_class,)).copy()
+
+    names = booster.feature_names or [f"f{i}" for i in range(int(params["num_feature"]))]
+    classes = getattr(model, "classes_", None)
+    if classes is None:
+        classes = np.arange(max(n_class, 2))
+
+    return {
+        "objective": np.array(objective),
+        "features": np.asarray(names, dtype=str),
+        "classes": np.asarray(classes),
+        "base_margin": base_margin,
+        "max_depth": np.array(depth),
+        "roots": np.asarray(roots, dtype=np.int32),
+        "tree_class": np.asarray(gbm["model"]["tree_info"], dtype=np.int32),
+        "feature": np.concatenate(feature).astype(np.int32),
+        "threshold": np.concatenate(threshold).astype(np.float32),
+        "left": np.concatenate(left).astype(np.int32),
+        "right": np.concatenate(right).astype(np.int32),
+        "default_left": np.concatenate(default_left).astype(bool),
+        "value": np.concatenate(value).astype(np.float32),
+    }
+
+
+class TreeEnsemble:
+    """Vectorized scorer over flatten_booster() arrays; needs NumPy only.
+
+    With a compiled table (see compile_table) a batch is scored with one
+    searchsorted per feature and a single gather; otherwise every row walks
+    all trees at once, max_depth steps deep.
+    """
+
+    def __init__(self, arrays: dict):
+        self.objective = str(arrays["objective"])
+        self.features = list(arrays["features"])
+        self.classes_ = np.asarray(arrays["classes"])
+        self.base_margin = np.asarray(arrays["base_margin"], dtype=np.float64)
+        self.max_depth = int(arrays["max_depth"])
+        self.roots = np.asarray(arrays["roots"], dtype=np.int32)
+        self.feature = np.asarray(arrays["feature"], dtype=np.int32)
+        self.threshold = np.asarray(arrays["threshold"], dtype=np.float32)
+        self.left = np.asarray(arrays["left"], dtype=np.int32)
+        self.right = np.asarray(arrays["right"], dtype=np.int32)
+        self.default_left = np.asarray(arrays["default_left"], dtype=bool)
+        self.value = np.asarray(arrays["value"], dtype=np.float64)
+
+        tree_class = np.asarray(arrays["tree_class"], dtype=np.int64)
+        self.n_margin = len(self.base_margin)
+        # (trees, margins) one-hot: summing leaves per class is one matmul
+        self.class_onehot = np.zeros((len(self.roots), self.n_margin))
+        self.class_onehot[np.arange(len(self.roots)), tree_class] = 1.0
+
+        self.table = None
+        if "table" in arrays:
+            offsets = np.asarray(arrays["edge_offsets"], dtype=np.int64)
+            edges = np.asarray(arrays["edges"], dtype=np.float32)
+            self.edges = [edges[offsets[j]:offsets[j + 1]] for j in range(len(self.features))]
+            self.strides = np.asarray(arrays["strides"], dtype=np.int64)
+            self.table = np.asarray(arrays["table"], dtype=np.float64)
+
+    def _leaves(self, X: np.ndarray) -> np.ndarray:
+        """(rows, trees) leaf node index for each row."""
+        split_feature = np.maximum(self.feature, 0)
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        rows = np.arange(len(X))[:, None]
+        for _ in range(self.max_depth):
+            x = X[rows, split_feature[node]]
+            go_left = np.where(np.isnan(x), self.default_left[node], x < self.threshold[node])
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def _walk_margin(self, X: np.ndarray) -> np.ndarray:
+        out = np.empty((len(X), self.n_margin))
+        for start in range(0, len(X), CHUNK_ROWS):
+            leaves = self._leaves(X[start:start + CHUNK_ROWS])
+            out[start:start + CHUNK_ROWS] = self.value[leaves] @ self.class_onehot + self.base_margin
+        return out
+
+    def compile_table(self) -> dict | None:
+        """Margins for every cell of the per-feature threshold grid.
+
+        A row's path through every tree depends only on which pair of
+        consecutive thresholds each feature falls between (plus a NaN bin),
+        so one representative row per cell reproduces the ensemble exactly.
+        Returns the arrays to store, or None if the grid is too large.
+        """
+        edges = [np.unique(self.threshold[self.feature == j]) for j in range(len(self.features))]
+        sizes = np.array([len(e) + 2 for e in edges], dtype=np.int64)
+        if np.prod(sizes) > MAX_TABLE_CELLS:
+            return None
+
+        # Bin 0 is below every threshold, bin b sits on threshold b-1, the last bin is NaN
+        reps = [np.concatenate([[-np.inf], e, [np.nan]]).astype(np.float32) for e in edges]
+        grid = np.stack([g.ravel() for g in np.meshgrid(*reps, indexing="ij")], axis=1)
+        strides = np.concatenate([np.cumprod(sizes[::-1])[::-1][1:], [1]])
+        return {
+            "edges": np.concatenate(edges).astype(np.float32),
+            "edge_offsets": np.concatenate([[0], np.cumsum([len(e) for e in edges])]),
+            "strides": strides,
+            "table": self._walk_margin(grid),
+        }
+
+    def margin(self, X) -> np.ndarray:
+        # XGBoost compares float32 feature values against float32 thresholds
+        X = np.asarray(X, dtype=np.float32).reshape(-1, len(self.features))
+        if self.table is None:
+            return self._walk_margin(X)
+
+        cell = np.zeros(len(X), dtype=np.int64)
+        for j, e in enumerate(self.edges):
+            x = X[:, j]
+            b = np.where(np.isnan(x), len(e) + 1, np.searchsorted(e, x, side="right"))
+            cell += b * self.strides[j]
+        return self.table[cell]
+
+    def predict_proba(self, X) -> np.ndarray:
+        z = self.margin(X)
+        if self.objective == "binary:logistic":
+            p = 1.0 / (1.0 + np.exp(-z[:, 0]))
+            return np.column_stack([1.0 - p, p])
+        z = z - z.max(axis=1, keepdims=True)
+        e = np.exp(z)
+        return e / e.sum(axis=1, keepdims=True)
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def booster_arrays(model, check_X=None, atol: float = 1e-5) -> dict:
+    """flatten_booster() plus, when small enough, the compiled table.
+
+    The margins (base_score included) are compared with the booster's own
+    output_margin predictions on check_X, or on random probe rows when none
+    is given; a mismatch raises instead of producing a silently wrong export.
+    """
+    import xgboost as xgb
+
+    arrays = flatten_booster(model)
+    table = TreeEnsemble(arrays).compile_table()
+    if table is not None:
+        arrays.update(table)
+    ensemble = TreeEnsemble(arrays)
+
+    if check_X is None:
+        check_X = np.random.default_rng(0).normal(0.0, 50.0, (512, len(ensemble.features)))
+    check_X = np.asarray(check_X, dtype=np.float32)
+
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    native = booster.predict(xgb.DMatrix(check_X, feature_names=booster.feature_names), output_margin=True)
+    diff = np.abs(native.reshape(len(check_X), -1) - ensemble.margin(check_X)).max()
+    if diff > atol:
+        raise ValueError(f"Flattened booster disagrees with XGBoost by {diff:.3g} (atol {atol})")
+    return arrays
+
+
+def export_booster(path, model, check_X=None, atol: float = 1e-5, arrays: dict = None) -> Path:
+    """Write booster_arrays() to .npz; pass `arrays` when they are already built."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(path, **(arrays if arrays is not None else booster_arrays(model, check_X, atol)))
+    return path
+
+
+def load_booster(path) -> TreeEnsemble:
+    with np.load(path, allow_pickle=False) as data:
+        return TreeEnsemble({k: data[k] for k in data.files})
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import log_loss
+
+from feature_store import FeatureStore, training_frame
+
+
+# --- PATH SETUP ---
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+
+OUT_FILE = REPO_ROOT / "data" / "matches" / "derived" / "walk_forward_predictions.csv"
+
+FEATURES = ["diff_total", "diff_form_pts", "diff_form_gd"]
+LABEL = "label"  # 2=home, 1=draw, 0=away
+
+# Seasons used only for training before the first out-of-sample matchday
+MIN_TRAIN_SEASONS = 1
+
+# A matchday is one week of a season, counted from the season's first kickoff
+MATCHDAY_DAYS = 7
+
+# build_probability_model's classifier, refit from the previous step's coefficients
+LOGISTIC_PARAMS = {"solver": "lbfgs", "C": 1.0, "max_iter": 1000, "warm_start": True}
+
+# train_final_model's production settings, in xgb.train form
+XGB_PARAMS = {
+    "max_depth": 2,
+    "eta": 0.01,
+    "subsample": 1.0,
+    "colsample_bytree": 0.8,
+    "gamma": 5,
+    "objective": "multi:softprob",
+    "num_class": 3,
+    "eval_metric": "mlogloss",
+    "seed": 42,
+}
+# Full refit at each season start, then a few trees per matchday on top
+XGB_SEASON_ROUNDS = 100
+XGB_STEP_ROUNDS = 5
+
+
+def assign_matchdays(dates: pd.Series, seasons: pd.Series) -> np.ndarray:
+    """1-based week of the season for every match."""
+    day = pd.to_datetime(dates, utc=True).dt.normalize()
+    first = day.groupby(seasons).transform("min")
+    return ((day - first).dt.days // MATCHDAY_DAYS + 1).to_numpy(dtype=np.int64)
+
+
+class PrefixScaler:
+    """StandardScaler fitted on X[:n] for any n, from cumulative sums.
+
+    Built once per backtest, so each step's scaling is O(k) instead of a
+    pass over the growing training window.
+    """
+
+    def __init__(self, X: np.ndarray):
+        # Shifting by a constant leaves the variance unchanged but keeps
+        # the sum-of-squares subtraction well conditioned
+        self.shift = X.mean(axis=0)
+        Xc = X - self.shift
+        zero = np.zeros((1, X.shape[1]))
+        self.s1 = np.vstack([zero, np.cumsum(Xc, axis=0)])
+        self.s2 = np.vstack([zero, np.cumsum(Xc * Xc, axis=0)])
+
+    def at(self, n: int):
+        mean_c = self.s1[n] / n
+        var = np.maximum(self.s2[n] / n - mean_c ** 2, 0.0)
+        scale = np.sqrt(var)
+        scale[scale == 0.0] = 1.0  # same guard as StandardScaler
+        return mean_c + self.shift, scale
+
+
+def load_matches(store: FeatureStore = None) -> pd.DataFrame:
+    """Labelled matches with FEATURES, projected from the feature store."""
+    df = training_frame(FEATURES, LABEL, extra=["match_id", "season", "date"], store=store)
+    df = df.dropna(subset=["date"])
+    df = df.sort_values("date", kind="mergesort").reset_index(drop=True)
+    df["matchday"] = assign_matchdays(df["date"], df["season"])
+    return df
+
+
+def walk_forward(df: pd.DataFrame) -> pd.DataFrame:
+    """Out-of-sample H/D/A probabilities for every matchday after the warm-up.
+
+    Feature matrices are built once; each step trains on the rows before
+    its first match (a prefix of the date-sorted arrays) and scores its own
+    rows. The logistic model warm-starts from the previous coefficients;
+    the booster keeps boosting from the previous step within a season.
+    """
+    X = df[FEATURES].to_numpy(dtype=np.float64)
+    y = df[LABEL].to_numpy(dtype=np.int64)
+    scaler = PrefixScaler(X)
+    full = xgb.DMatrix(X, label=y, feature_names=FEATURES)
+
+    step_key = df["season"].to_numpy() * 1000 + df["matchday"].to_numpy()
+    starts = np.flatnonzero(np.r_[True, step_key[1:] != step_key[:-1]])
+    stops = np.r_[starts[1:], len(df)]
+    seasons = sorted(df["season"].unique())
+    if len(seasons) <= MIN_TRAIN_SEASONS:
+        raise ValueError(
+            f"Walk-forward needs more than MIN_TRAIN_SEASONS={MIN_TRAIN_SEASONS} season(s) of matches "
+            f"to have one left to test on; got {len(seasons)}: {[int(s) for s in seasons]}"
+        )
+    first_season = seasons[MIN_TRAIN_SEASONS]
+
+    logit = LogisticRegression(**LOGISTIC_PARAMS)
+    booster, booster_season = None, None
+    out = []
+
+    for start, stop in zip(starts, stops):
+        season = df["season"].iat[start]
+        if season < first_season:
+            continue
+
+        mean, scale = scaler.at(start)
+        with warnings.catch_warnings():
+            # warm-started lbfgs may stop at max_iter early on
+            warnings.simplefilter("ignore", ConvergenceWarning)
+            logit.fit((X[:start] - mean) / scale, y[:start])
+        p_log = logit.predict_proba((X[start:stop] - mean) / scale)
+
+        train = full.slice(np.arange(start))
+        if season != booster_season:
+            booster = xgb.train(XGB_PARAMS, train, num_boost_round=XGB_SEASON_ROUNDS)
+            booster_season = season
+        else:
+            booster = xgb.train(XGB_PARAMS, train, num_boost_round=XGB_STEP_ROUNDS, xgb_model=booster)
+        p_xgb = booster.predict(full.slice(np.arange(start, stop))).astype(np.float64)
+        p_xgb /= p_xgb.sum(axis=1, keepdims=True)  # float32 softmax rows drift off 1
+
+        for model, probs in (("logistic", p_log), ("xgboost", p_xgb)):
+            out.append(pd.DataFrame({
+                "match_id": df["match_id"].iloc[start:stop].to_numpy(),
+                "season": season,
+                "matchday": df["matchday"].iat[start],
+                "date": df["date"].iloc[start:stop].to_numpy(),
+                "model": model,
+                "n_train": start,
+                "p_home": probs[:, 2],
+                "p_draw": probs[:, 1],
+                "p_away": probs[:, 0],
+                "label": y[start:stop],
+            }))
+
+    return pd.concat(out, ignore_index=True)
+
+
+def summarize(preds: pd.DataFrame) -> pd.DataFrame:
+    rows = []
+    for (model, season), g in preds.groupby(["model", "season"]):
+        probs = g[["p_away", "p_draw", "p_home"]].to_numpy()
+        rows.append({
+            "model": model,
+            "season": season,
+            "matches": len(g),
+            "log_loss": log_loss(g["label"], probs, labels=[0, 1, 2]),
+            "accuracy": float((probs.argmax(axis=1) == g["label"].to_numpy()).mean()),
+        })
+    return pd.DataFrame(rows)
+
+
+def main():
+    print("--- WALK-FORWARD BACKTEST ---")
+    t0 = time.perf_counter()
+    df = load_matches()
+    preds = walk_forward(df)
+    elapsed = time.perf_counter() - t0
+
+    steps = preds.groupby(["season", "matchday"]).ngroups
+    print(f"   {steps} matchdays, {preds['match_id'].nunique()} matches scored out of sample in {elapsed:.1f}s")
+    print(summarize(preds).to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+
+    OUT_FILE.parent.mkdir(parents=True, exist_ok=True)
+    preds.to_csv(OUT_FILE, index=False)
+    print(f"Saved walk-forward predictions to: {OUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
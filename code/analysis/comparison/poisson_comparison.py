@@ -1,8 +1,12 @@
 import pandas as pd
 import numpy as np
-from scipy.stats import poisson
+import os
+import sys
 from sklearn.metrics import log_loss, accuracy_score, confusion_matrix
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from poisson_engine import poisson_probs
+
 # 1. SETUP & DATA LOADING
 TARGET_YEAR = 2025
 MATCHES_PATH = 'data/matches/combined/matches_combined.csv'
@@ -23,55 +27,28 @@ actual_avg_goals = total_goals / (len(df_matches) * 2)
 strength_col = f"Historical Prior for {TARGET_YEAR} Season"
 team_strengths = dict(zip(df_teams['Team'], df_teams[strength_col]))
 
-def get_actual_result(row):
-    if row['Homescore'] > row['Awayscore']: return 0 # Home
-    if row['Homescore'] == row['Awayscore']: return 1 # Draw
-    return 2 # Away
+print(f"--- Evaluating Poisson Model: 2025 Season ---")
 
-results = []
+# Teams without a strength prior are skipped
+h_vals = df_2025['Hometeam'].map(team_strengths)
+a_vals = df_2025['Awayteam'].map(team_strengths)
+known = (h_vals.notna() & a_vals.notna()).to_numpy()
+df_2025 = df_2025[known]
 
-print(f"--- Evaluating Poisson Model: 2025 Season ---")
+# --- POISSON LOGIC --- (all score grids as one (n, 9, 9) tensor)
+# Raw grid sums, not renormalized: the same probabilities the metrics were always computed on
+probs = poisson_probs(h_vals[known].to_numpy(), a_vals[known].to_numpy(), actual_avg_goals, normalize=False)
 
-for idx, row in df_2025.iterrows():
-    home_team = row['Hometeam']
-    away_team = row['Awayteam']
-    
-    try:
-        # Get strengths
-        h_val = team_strengths[home_team]
-        a_val = team_strengths[away_team]
-        
-        # --- POISSON LOGIC ---
-        gap = (h_val - a_val) / 50
-        lambda_h = actual_avg_goals + (gap / 2)
-        lambda_a = actual_avg_goals - (gap / 2)
-        
-        # Calculate goal probabilities (up to 8 goals)
-        h_chances = [poisson.pmf(i, lambda_h) for i in range(9)]
-        a_chances = [poisson.pmf(i, lambda_a) for i in range(9)]
-        
-        # Create score matrix
-        matrix = np.outer(h_chances, a_chances)
-        
-        # Calculate Win/Draw/Loss Probabilities
-        prob_h = np.sum(np.tril(matrix, -1))
-        prob_d = np.sum(np.diag(matrix))
-        prob_a = np.sum(np.triu(matrix, 1))
-        
-        actual = get_actual_result(row)
-        
-        results.append({
-            'Prob_H': prob_h,
-            'Prob_D': prob_d,
-            'Prob_A': prob_a,
-            'Predicted_Class': np.argmax([prob_h, prob_d, prob_a]),
-            'Actual_Class': actual
-        })
-    except KeyError:
-        continue
+home_goals, away_goals = df_2025['Homescore'].to_numpy(), df_2025['Awayscore'].to_numpy()
+eval_df = pd.DataFrame({
+    'Prob_H': probs[:, 0],
+    'Prob_D': probs[:, 1],
+    'Prob_A': probs[:, 2],
+    'Predicted_Class': probs.argmax(axis=1),
+    'Actual_Class': np.where(home_goals > away_goals, 0, np.where(home_goals == away_goals, 1, 2)),  # 0=Home, 1=Draw, 2=Away
+})
 
 # 3. COMPUTE METRICS
-eval_df = pd.DataFrame(results)
 acc = accuracy_score(eval_df['Actual_Class'], eval_df['Predicted_Class'])
 ll = log_loss(eval_df['Actual_Class'], eval_df[['Prob_H', 'Prob_D', 'Prob_A']].values, labels=[0,1,2])
 
@@ -5,8 +5,8 @@ import os
 from sklearn.metrics import log_loss
 
 # 1. IMPORT YOUR "EXPERT" FUNCTIONS
-from pre_match_odds_poisson import calculate_poisson_probs
-from pre_match_odds_ml import calculate_ml_probs
+from pre_match_odds_poisson import calculate_poisson_probs, calculate_poisson_probs_batch
+from pre_match_odds_ml import calculate_ml_probs, calculate_ml_probs_batch
 
 # 2. CONFIGURATION
 team_ids = {
@@ -33,18 +33,17 @@ def find_optimal_weights(validation_year, matches_df, avg_goals):
     
     df_val_matches = matches_df[matches_df['Season'] == validation_year].copy()
     
-    poi_probs, ml_probs, actual_results = [], [], []
+    # Whole validation season in one batch per model; unknown teams are skipped
+    h_v = df_val_matches['Hometeam'].map(val_strengths)
+    a_v = df_val_matches['Awayteam'].map(val_strengths)
+    known = (h_v.notna() & a_v.notna()).to_numpy()
+    h_v, a_v = h_v[known].to_numpy(), a_v[known].to_numpy()
+    df_val_matches = df_val_matches[known]
 
-    for _, row in df_val_matches.iterrows():
-        try:
-            h_v, a_v = val_strengths[row['Hometeam']], val_strengths[row['Awayteam']]
-            poi_probs.append(calculate_poisson_probs(h_v, a_v, avg_goals))
-            ml_probs.append(calculate_ml_probs(h_v, a_v))
-            actual = 0 if row['Homescore'] > row['Awayscore'] else (1 if row['Homescore'] == row['Awayscore'] else 2)
-            actual_results.append(actual)
-        except KeyError: continue
-
-    P, M, Y = np.array(poi_probs), np.array(ml_probs), np.array(actual_results)
+    P = calculate_poisson_probs_batch(h_v, a_v, avg_goals)
+    M = calculate_ml_probs_batch(h_v, a_v)
+    home_goals, away_goals = df_val_matches['Homescore'].to_numpy(), df_val_matches['Awayscore'].to_numpy()
+    Y = np.where(home_goals > away_goals, 0, np.where(home_goals == away_goals, 1, 2))
     
     # Calculate individual baseline losses
     loss_poi = log_loss(Y, P, labels=[0, 1, 2])
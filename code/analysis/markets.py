@@ -0,0 +1,164 @@
+import sys
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from poisson_engine import MAX_GOALS, goal_lambdas, score_matrix
+
+# Lines priced for each market
+TOTAL_LINES = [1.5, 2.5, 3.5]
+HANDICAP_LINES = [h / 4 for h in range(-8, 9)]  # -2.00 .. +2.00 in quarter-goal steps
+
+# Correct-score columns run 0-0 .. CORRECT_SCORE_MAX-CORRECT_SCORE_MAX; the rest is cs_other
+CORRECT_SCORE_MAX = 4
+
+
+def _handicap_parts(line):
+    """A quarter line is half the stake on each neighbouring half/whole line."""
+    if (line * 4) % 2:
+        return [line - 0.25, line + 0.25]
+    return [line]
+
+
+@lru_cache(maxsize=None)
+def _functionals(size):
+    """
+    Every market below is linear in the score grid, so all of them are one
+    (G*G, k) weight matrix: 1X2, the total-goals and goal-difference
+    distributions, BTTS and the correct scores. Returns (names, weights).
+    """
+    i, j = np.indices((size, size))
+    names, cols = ['mass', 'home', 'draw', 'away', 'btts_yes'], [
+        np.ones_like(i), i > j, i == j, i < j, (i > 0) & (j > 0)]
+
+    for t in range(2 * size - 1):
+        names.append(f'total_{t}')
+        cols.append(i + j == t)
+    for d in range(-(size - 1), size):
+        names.append(f'diff_{d}')
+        cols.append(i - j == d)
+    for h in range(CORRECT_SCORE_MAX + 1):
+        for a in range(CORRECT_SCORE_MAX + 1):
+            names.append(f'cs_{h}_{a}')
+            cols.append((i == h) & (j == a))
+
+    weights = np.stack([np.asarray(c, dtype=float).ravel() for c in cols], axis=1)
+    return names, weights
+
+
+@lru_cache(maxsize=None)
+def _handicap_weights(size):
+    """
+    Per goal difference d (home minus away) and HANDICAP_LINES entry h:
+    how many stake parts the home bet wins (d + h > 0), the away bet wins
+    (d + h < 0) and push (d + h == 0). Returns those three (2G-1, L)
+    matrices and the number of parts per line.
+    """
+    margin = np.arange(-(size - 1), size)
+    parts = [_handicap_parts(line) for line in HANDICAP_LINES]
+    win_h = np.stack([sum((margin + p > 0) for p in ps) for ps in parts], axis=1).astype(float)
+    win_a = np.stack([sum((margin + p < 0) for p in ps) for ps in parts], axis=1).astype(float)
+    push = np.stack([sum((margin + p == 0) for p in ps) for ps in parts], axis=1).astype(float)
+    return win_h, win_a, push, np.array([len(ps) for ps in parts], dtype=float)
+
+
+def market_table(matrix, index=None):
+    """
+    Prices every market from an (n, G, G) score tensor in one pass.
+    Returns a DataFrame with one row per fixture. Every column is a fair
+    implied probability (1 / fair decimal odds). For markets with a push
+    (draw-no-bet, whole and quarter Asian lines) that is the
+    break-even probability, not the chance of winning.
+    """
+    n, size = matrix.shape[0], matrix.shape[-1]
+    names, weights = _functionals(size)
+    col = {name: k for k, name in enumerate(names)}
+
+    # The single pass: every linear market for every fixture in one matmul
+    agg = matrix.reshape(n, size * size) @ weights
+    agg = agg / agg[:, [col['mass']]]  # renormalize the mass cut off by the grid
+
+    out = {
+        'home': agg[:, col['home']],
+        'draw': agg[:, col['draw']],
+        'away': agg[:, col['away']],
+    }
+
+    totals = agg[:, col['total_0']:col['total_0'] + 2 * size - 1]
+    cum_totals = np.cumsum(totals, axis=1)
+    for line in TOTAL_LINES:
+        under = cum_totals[:, int(np.floor(line))]
+        out[f'over_{line}'] = 1.0 - under
+        out[f'under_{line}'] = under
+
+    out['btts_yes'] = agg[:, col['btts_yes']]
+    out['btts_no'] = 1.0 - out['btts_yes']
+
+    # Draw no bet: stake returned on a draw
+    out['dnb_home'] = out['home'] / (out['home'] + out['away'])
+    out['dnb_away'] = out['away'] / (out['home'] + out['away'])
+
+    # Asian handicap: fair odds o solve mean over parts of (P_win * o + P_push) = 1
+    diffs = agg[:, col[f'diff_{-(size - 1)}']:col[f'diff_{-(size - 1)}'] + 2 * size - 1]
+    win_h, win_a, push, n_parts = _handicap_weights(size)
+    win_h, win_a, push = diffs @ win_h, diffs @ win_a, diffs @ push
+    for k, line in enumerate(HANDICAP_LINES):
+        out[f'ah_home_{line:+.2f}'] = win_h[:, k] / (n_parts[k] - push[:, k])
+        out[f'ah_away_{-line:+.2f}'] = win_a[:, k] / (n_parts[k] - push[:, k])
+
+    cs = [f'cs_{h}_{a}' for h in range(CORRECT_SCORE_MAX + 1) for a in range(CORRECT_SCORE_MAX + 1)]
+    for name in cs:
+        out[name] = agg[:, col[name]]
+    out['cs_other'] = 1.0 - agg[:, [col[c] for c in cs]].sum(axis=1)
+
+    # One 2-D block -> one DataFrame, rather than a column-by-column build
+    return pd.DataFrame(np.column_stack(list(out.values())), columns=list(out), index=index)
+
+
+def price_markets(lambda_h, lambda_a, max_goals=MAX_GOALS, index=None):
+    """
+    Market table for fixtures given as expected-goals pairs.
+    """
+    table = market_table(score_matrix(lambda_h, lambda_a, max_goals), index=index)
+    table.insert(0, 'lambda_away', np.ravel(lambda_a))
+    table.insert(0, 'lambda_home', np.ravel(lambda_h))
+    return table
+
+
+def markets_from_strengths(home_vals, away_vals, avg_goals, max_goals=MAX_GOALS, index=None):
+    """
+    Market table from strength priors, using the same lambdas as
+    calculate_poisson_probs.
+    """
+    lambda_h, lambda_a = goal_lambdas(home_vals, away_vals, avg_goals)
+    return price_markets(lambda_h, lambda_a, max_goals, index=index)
+
+
+# --- THIS PART RUNS ONLY IF YOU EXECUTE THIS FILE DIRECTLY ---
+if __name__ == "__main__":
+    team_ids = {1: 'Cavalry', 2: 'Forge', 3: 'Atlético Ottawa', 4: 'HFX Wanderers',
+                5: 'Inter Toronto', 6: 'Pacific', 7: 'Vancouver FC', 8: 'FC Supra du Québec'}
+
+    if len(sys.argv) < 4:
+        print("Usage: python3 markets.py <YEAR> <HOME_ID> <AWAY_ID>")
+        sys.exit(1)
+
+    df_matches = pd.read_csv('data/matches/combined/matches_combined.csv')
+    df_matches.columns = df_matches.columns.str.strip().str.title()
+    total_goals = df_matches['Homescore'].sum() + df_matches['Awayscore'].sum()
+    actual_avg_goals = total_goals / (len(df_matches) * 2)
+
+    TARGET_YEAR = sys.argv[1]
+    HOME_TEAM = team_ids[int(sys.argv[2])]
+    AWAY_TEAM = team_ids[int(sys.argv[3])]
+
+    df_teams = pd.read_csv(f'data/analysis/predict_{TARGET_YEAR}_from_historic.csv')
+    strengths = dict(zip(df_teams['Team'], df_teams[f"Historical Prior for {TARGET_YEAR} Season"]))
+
+    row = markets_from_strengths([strengths[HOME_TEAM]], [strengths[AWAY_TEAM]], actual_avg_goals).iloc[0]
+
+    print(f"--- Poisson Markets: {HOME_TEAM} vs {AWAY_TEAM} ---")
+    print(f"Expected goals: {row['lambda_home']:.2f} - {row['lambda_away']:.2f}")
+    for name, p in row.drop(['lambda_home', 'lambda_away']).items():
+        print(f"{name:<16} {p:7.2%}   fair odds {1 / p:7.2f}")
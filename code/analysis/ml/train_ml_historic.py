@@ -1,6 +1,12 @@
 import pandas as pd
 from sklearn.linear_model import LogisticRegression
 import joblib
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3] / 'Code' / 'models'))
+from logistic_export import export_logistic, logistic_arrays
+from model_registry import data_fingerprint, register
 
 # 1. Load the training set you just created
 df = pd.read_csv('data/analysis/ml_training_priors.csv')
@@ -24,7 +30,16 @@ model.fit(X, y)
 # 4. Save the "Brain"
 # This saves the trained mathematical weights so you don't have to retrain every time
 joblib.dump(model, 'data/analysis/cpl_ml_model.pkl')
+# Plain-array copy for NumPy-only scoring (no scaler: the gap goes in raw)
+export_logistic('data/analysis/cpl_ml_model.npz', model, None, ['Prior_Gap'])
+sha = register('logistic', logistic_arrays(model, None, ['Prior_Gap']),
+               {'features': ['Prior_Gap'], 'classes': model.classes_.tolist(),
+                'metrics': {'n_train': int(len(df))},
+                'data_fingerprint': data_fingerprint(df[['Prior_Gap', 'Result']]),
+                'source': 'train_ml_historic.py'},
+               alias='prior_gap')
 
 print("--- ML MODEL TRAINED ---")
 print(f"Studied {len(df)} historical matches.")
-print("Model saved to: data/analysis/cpl_ml_model.pkl")
\ No newline at end of file
+print("Model saved to: data/analysis/cpl_ml_model.pkl (+ cpl_ml_model.npz)")
+print(f"Registered as prior_gap -> {sha}")
\ No newline at end of file
@@ -1,33 +1,48 @@
 import pandas as pd
 import sys
+import os
 import joblib
 import numpy as np
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Code', 'models'))
+from logistic_export import load_logistic
+from model_registry import load_model
+
 # Load the model once at the top level when the module is imported
 # This makes subsequent function calls much faster.
+# The registry's 'prior_gap' alias and the NumPy export (both written by
+# train_ml_historic.py) are preferred: they load without sklearn.
 MODEL_PATH = 'data/analysis/cpl_ml_model.pkl'
+EXPORT_PATH = 'data/analysis/cpl_ml_model.npz'
 try:
-    model = joblib.load(MODEL_PATH)
+    model = load_model('prior_gap') or load_logistic(EXPORT_PATH)
 except FileNotFoundError:
-    model = None
+    try:
+        model = joblib.load(MODEL_PATH)
+    except FileNotFoundError:
+        model = None
 
-def calculate_ml_probs(home_val, away_val):
+def calculate_ml_probs_batch(home_vals, away_vals):
     """
-    Core engine for ML Prediction.
-    Returns probabilities as [home_p, draw_p, away_p] (0.0 to 1.0)
+    Vectorized calculate_ml_probs for many fixtures at once.
+    Returns an (n, 3) array of [home_p, draw_p, away_p] rows.
     """
     if model is None:
         raise FileNotFoundError(f"ML Model not found at {MODEL_PATH}")
 
-    # Calculate the gap
-    gap = home_val - away_val
-    
-    # ML expects a DataFrame with the correct feature name
+    gaps = np.asarray(home_vals, dtype=float) - np.asarray(away_vals, dtype=float)
+
+    # One DataFrame and one predict_proba call for the whole batch
     # Result order: 0=Home Win, 1=Draw, 2=Away Win
-    gap_df = pd.DataFrame([[gap]], columns=['Prior_Gap'])
-    probs = model.predict_proba(gap_df)[0]
-    
-    return probs
+    gap_df = pd.DataFrame({'Prior_Gap': gaps.ravel()})
+    return model.predict_proba(gap_df)
+
+def calculate_ml_probs(home_val, away_val):
+    """
+    Core engine for ML Prediction.
+    Returns probabilities as [home_p, draw_p, away_p] (0.0 to 1.0)
+    """
+    return calculate_ml_probs_batch([home_val], [away_val])[0]
 
 # --- THIS PART RUNS ONLY IF YOU EXECUTE THIS FILE DIRECTLY ---
 if __name__ == "__main__":
@@ -1,34 +1,23 @@
 import pandas as pd
 import sys
-from scipy.stats import poisson
 import numpy as np
 
+from poisson_engine import poisson_probs
+
+def calculate_poisson_probs_batch(home_vals, away_vals, actual_avg_goals):
+    """
+    Vectorized calculate_poisson_probs for many fixtures at once.
+    Returns an (n, 3) array of [home_p, draw_p, away_p] rows.
+    """
+    # Every score grid comes from one (n, 9, 9) tensor in poisson_engine
+    return poisson_probs(np.ravel(home_vals), np.ravel(away_vals), actual_avg_goals)
+
 def calculate_poisson_probs(home_val, away_val, actual_avg_goals):
     """
     Core math engine for Poisson. 
     Returns probabilities as [home_p, draw_p, away_p] (0.0 to 1.0)
     """
-    # 1. Get the gap
-    gap = (home_val - away_val) / 50
-
-    # 2. Give each team their 'Target Goals' (Lambda)
-    lambda_h = actual_avg_goals + (gap / 2)
-    lambda_a = actual_avg_goals - (gap / 2)
-
-    # 3. Probability distribution for 0-8 goals
-    home_chances = [poisson.pmf(i, lambda_h) for i in range(9)]
-    away_chances = [poisson.pmf(i, lambda_a) for i in range(9)]
-
-    # 4. Create the grid
-    matrix = np.outer(home_chances, away_chances)
-
-    # 5. Sum the 'buckets' and normalize to sum to 1.0
-    home_p = np.sum(np.tril(matrix, -1)) 
-    draw_p = np.sum(np.diag(matrix))      
-    away_p = np.sum(np.triu(matrix, 1))  
-    
-    total = home_p + draw_p + away_p
-    return np.array([home_p/total, draw_p/total, away_p/total])
+    return calculate_poisson_probs_batch([home_val], [away_val], actual_avg_goals)[0]
 
 # --- THIS PART RUNS ONLY IF YOU EXECUTE THIS FILE DIRECTLY ---
 if __name__ == "__main__":
@@ -9,22 +9,26 @@ MODELS_DIR = REPO_ROOT / "Code" / "models"
 
 # The strictly ordered sequence for 2026 Season Readiness
 PIPELINE = [
-    # 1. Player Ratings 
+    # 1. Lineups (the rating pass reads them, so they come first)
+    MODELS_DIR / "build_assumed_lineups.py",
+
+    # 2. Player Ratings 
     MODELS_DIR / "james_elo" / "build_player_ratings_rolling.py",
     
-    # 2. Match Setup (Shared logic)
-    MODELS_DIR / "build_assumed_lineups.py",
+    # 3. Match Setup (Shared logic)
     MODELS_DIR / "build_match_team_strength.py",
     
-    # 3. Feature Engineering
+    # 4. Feature Engineering
     MODELS_DIR / "build_match_features.py", 
     MODELS_DIR / "james_elo" / "build_rolling_features.py", 
+    MODELS_DIR / "james_elo" / "build_form_feature_bank.py",
 
-    # 4. Model Training
+    # 5. Model Training
     MODELS_DIR / "build_targets.py",          
     MODELS_DIR / "james_elo" / "build_probability_model.py", 
+    MODELS_DIR / "james_elo" / "online_probability_model.py",
     
-    # 5. Validation 
+    # 6. Validation 
     REPO_ROOT / "validate_team_strength.py"    
 ]
 